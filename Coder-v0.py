@@ -1,1431 +1,506 @@
 import sys
 import os
 import re
+import array
+import time
+import zlib
+import bisect
+import functools
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QPlainTextEdit, QFileDialog,
                              QAction, QToolBar, QWidget, QHBoxLayout, QVBoxLayout,
                              QTextEdit, QTabWidget, QLineEdit, QPushButton, QLabel,
-                             QMessageBox, QStatusBar, QMenu)
+                             QMessageBox, QStatusBar, QMenu, QProgressBar, QAbstractScrollArea,
+                             QInputDialog)
 from PyQt5.QtGui import (QColor, QFont, QTextCharFormat,
                          QTextCursor, QPainter, QTextFormat, QFontDatabase, QKeySequence,
                          QSyntaxHighlighter, QTextDocument)
-from PyQt5.QtCore import Qt, QSize, QUrl, QDateTime, QPoint, QTimer, pyqtSignal, QRegExp
+from PyQt5.QtCore import Qt, QSize, QUrl, QDateTime, QPoint, QTimer, QObject, pyqtSignal
 from PyQt5.QtWidgets import QApplication
+from PyQt5 import QtCore, QtGui
+
+from documents import DocumentRegistry, load_session, save_session
+from file_io import (FileFormat, HexDump, MappedFile, OpenBatchJob,
+                     MMAP_VIEW_MIN_BYTES, STREAM_LOAD_MIN_BYTES, file_stamp, read_file)
+from file_tasks import file_tasks
+from grammars import GRAMMARS
+from highlighting import HighlightJob, line_cache
+from journal import RecoveryJournal, format_meta, meta_format, recover
+from search import ReplaceJob, SearchCache, SearchJob, compile_query, expand_match
+
+
+# Documents with at least this many lines are highlighted in a background thread
+BACKGROUND_HIGHLIGHT_MIN_BLOCKS = 5000
+# Seconds spent applying background highlighting per event loop iteration
+HIGHLIGHT_TIME_SLICE = 0.008
+# Documents with at least this many lines are only highlighted around the viewport
+LAZY_HIGHLIGHT_MIN_BLOCKS = 100000
+# Blocks highlighted above and below the viewport in lazy mode
+LAZY_HIGHLIGHT_LOOKAHEAD = 200
+# Blocks further than this from the viewport lose their formats in lazy mode
+LAZY_HIGHLIGHT_RETENTION = 1000
+# Memory the open editors may use before the least recently used tabs are hibernated
+HIBERNATE_MEMORY_BUDGET = 256 * 1024 * 1024
+# Rough memory an editor needs per character and per line, layout and formats included
+EDITOR_BYTES_PER_CHAR = 2
+EDITOR_BYTES_PER_BLOCK = 600
+# Milliseconds after the last edit before a long recovery journal is compacted
+JOURNAL_IDLE_MS = 2000
+# Milliseconds between checks for search results coming in
+SEARCH_POLL_MS = 10
 
 
 # ------------------ Syntax Highlighter ------------------ #
-class PythonHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        
-        self.highlightingRules = []
-
-        # Formats for different token types
-        formats = {
-            "keyword": self.create_format("#569CD6", is_bold=True),       # Blue
-            "operator": self.create_format("#D4D4D4", is_bold=True),      # White/Light Gray
-            "string": self.create_format("#CE9178"),                      # Orange
-            "comment": self.create_format("#6A9955"),                     # Green
-            "class": self.create_format("#C678DD", is_bold=True),         # Purple
-            "function": self.create_format("#DCDCAA"),                    # Yellow
-            "numbers": self.create_format("#B5CEA8"),                     # Light Green
-        }
-
-        # Python Keywords
-        keywords = [
-            'False', 'None', 'True', 'and', 'as', 'assert', 'async', 'await',
-            'break', 'class', 'continue', 'def', 'del', 'elif', 'else',
-            'except', 'finally', 'for', 'from', 'global', 'if', 'import',
-            'in', 'is', 'lambda', 'nonlocal', 'not', 'or', 'pass', 'raise',
-            'return', 'try', 'while', 'with', 'yield'
-        ]
-        self.add_rules(keywords, formats["keyword"])
-
-        # Add rules for built-in functions, types and constants
-        builtins = [
-            'print', 'len', 'range', 'list', 'dict', 'tuple', 'set', 'str',
-            'int', 'float', 'bool', 'type', 'open', 'range', 'dir',
-            'abs', 'id', 'sum'
-        ]
-        self.add_rules(builtins, formats["function"])
-
-        # Rules for Class definition
-        self.highlightingRules.append((r'\bclass\b\s+([A-Za-z_][A-Za-z0-9_]*)', formats["class"]))
-        
-        # Rules for Function definition
-        self.highlightingRules.append((r'\bdef\b\s+([A-Za-z_][A-Za-z0-9_]*)', formats["function"]))
-        
-        # Operators
-        operators = [
-            '=', '==', '!=', '<', '<=', '>', '>=', '\\+', '-', '\\*', '/', '//',
-            '\\%', '\\*\\*', '\\+=', '-=', '\\*=', '/=', '%=', '//=', '\\*\\*='
-        ]
-        self.add_rules([r'\\' + op for op in operators], formats["operator"])
-
-        # String literals (single and double quotes)
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        self.highlightingRules.append((r'\'[^\']*\'', formats["string"]))
-
-        # Numbers
-        self.highlightingRules.append((r'\b[0-9]+\b', formats["numbers"]))
-
-        # Comments
-        self.highlightingRules.append((r'#.*', formats["comment"]))
-
-    def create_format(self, color_hex, is_bold=False):
-        """Helper to create a QTextCharFormat."""
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-        
-    def add_rules(self, keywords, format):
-        """Helper to add rules for a list of keywords."""
-        for keyword in keywords:
-            self.highlightingRules.append((r'\b' + re.escape(keyword) + r'\b', format))
-
-    def highlightBlock(self, text):
-        # A more efficient way to highlight based on a list of rules
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                start, end = match.span()
-                self.setFormat(start, end - start, format)
-
-
-class JavaScriptHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "keyword": self.create_format("#C586C0"),       # Purple
-            "control_flow": self.create_format("#C586C0"),  # Purple
-            "built_in": self.create_format("#569CD6"),      # Blue
-            "string": self.create_format("#CE9178"),        # Orange
-            "comment": self.create_format("#6A9955"),       # Green
-            "numbers": self.create_format("#B5CEA8"),       # Light Green
-            "class_function": self.create_format("#DCDCAA"), # Yellow
-        }
-
-        keywords = [
-            'var', 'let', 'const', 'function', 'class', 'import', 'export', 'of',
-            'from', 'as', 'await', 'async'
-        ]
-        self.add_rules(keywords, formats["keyword"])
-
-        control_flow = [
-            'if', 'else', 'for', 'while', 'do', 'switch', 'case', 'break',
-            'continue', 'return', 'try', 'catch', 'finally', 'with'
-        ]
-        self.add_rules(control_flow, formats["control_flow"])
-
-        builtins = [
-            'this', 'window', 'document', 'console', 'log', 'new', 'null', 'undefined',
-            'true', 'false'
-        ]
-        self.add_rules(builtins, formats["built_in"])
-
-        # Rules for class/function names
-        self.highlightingRules.append((r'\b(?:class|function)\s+([A-Za-z_][A-Za-z0-9_]*)', formats["class_function"]))
-        self.highlightingRules.append((r'\b([A-Za-z_][A-Za-z0-9_]*)\s*\(', formats["class_function"]))
-
-        # String literals
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        self.highlightingRules.append((r'\'[^\']*\'', formats["string"]))
-        self.highlightingRules.append((r'`[^`]*`', formats["string"]))  # Backticks for template literals
-
-        # Numbers
-        self.highlightingRules.append((r'\b[0-9]+\b', formats["numbers"]))
-
-        # Single-line comments
-        self.highlightingRules.append((r'//.*', formats["comment"]))
-        
-        # Multi-line comments - this needs a different approach in highlightBlock
-        self.comment_format = formats["comment"]
-        self.comment_start_expression = QRegExp("/\\*")
-        self.comment_end_expression = QRegExp("\\*/")
-
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-
-    def add_rules(self, keywords, format):
-        for keyword in keywords:
-            self.highlightingRules.append((r'\b' + re.escape(keyword) + r'\b', format))
-
-    def highlightBlock(self, text):
-        # Single-line highlighting
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                start, end = match.span()
-                self.setFormat(start, end - start, format)
-        
-        # Multi-line comment highlighting
-        self.setCurrentBlockState(0)
-        start_index = 0
-        if self.previousBlockState() != 1:
-            start_index = self.comment_start_expression.indexIn(text)
-        
-        while start_index >= 0:
-            end_index = self.comment_end_expression.indexIn(text, start_index)
-            if end_index == -1:
-                self.setCurrentBlockState(1)
-                comment_length = len(text) - start_index
-            else:
-                comment_length = end_index - start_index + self.comment_end_expression.matchedLength()
-            
-            self.setFormat(start_index, comment_length, self.comment_format)
-            start_index = self.comment_start_expression.indexIn(text, start_index + comment_length)
-
-
-class CppHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "keyword": self.create_format("#C586C0", is_bold=True),  # Purple
-            "type": self.create_format("#569CD6"),                   # Blue
-            "string": self.create_format("#CE9178"),                 # Orange
-            "comment": self.create_format("#6A9955"),                # Green
-            "numbers": self.create_format("#B5CEA8"),                # Light Green
-        }
-        
-        keywords = [
-            'alignas', 'alignof', 'and', 'and_eq', 'asm', 'auto', 'bitand', 'bitor', 'bool', 'break',
-            'case', 'catch', 'char', 'char16_t', 'char32_t', 'class', 'const', 'constexpr', 'const_cast',
-            'continue', 'decltype', 'default', 'delete', 'do', 'double', 'dynamic_cast', 'else', 'enum',
-            'explicit', 'export', 'extern', 'false', 'final', 'float', 'for', 'friend', 'goto', 'if',
-            'inline', 'int', 'long', 'mutable', 'namespace', 'new', 'noexcept', 'not', 'not_eq', 'nullptr',
-            'operator', 'or', 'or_eq', 'private', 'protected', 'public', 'register', 'reinterpret_cast',
-            'return', 'short', 'signed', 'sizeof', 'static', 'static_assert', 'static_cast', 'struct',
-            'switch', 'template', 'this', 'thread_local', 'throw', 'true', 'try', 'typedef', 'typeid',
-            'typename', 'union', 'unsigned', 'using', 'virtual', 'void', 'volatile', 'wchar_t', 'while',
-            'xor', 'xor_eq'
-        ]
-        self.add_rules(keywords, formats["keyword"])
-
-        types = [
-            'int', 'long', 'short', 'double', 'float', 'char', 'bool', 'void',
-            'string', 'vector', 'map', 'set', 'pair'
-        ]
-        self.add_rules(types, formats["type"])
+class RuleTokenizer:
+    """
+    Single-pass tokenizer shared by the rule highlighters.
 
-        # String literals (double quotes)
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        
-        # Numbers
-        self.highlightingRules.append((r'\b[0-9]+\b', formats["numbers"]))
-        
-        # Single-line comments
-        self.highlightingRules.append((r'//.*', formats["comment"]))
+    All rules of a language are merged into one alternation and the line is
+    scanned once from left to right, so every character belongs to at most
+    one token: a keyword inside a string or a comment is never colored.
+    When several rules match at the same position, the rule added last wins,
+    which keeps the precedence the old overwrite-based highlighters had.
 
-        # Multi-line comment highlighting
-        self.comment_format = formats["comment"]
-        self.comment_start_expression = QRegExp("/\\*")
-        self.comment_end_expression = QRegExp("\\*/")
+    Keywords are not separate patterns: a single identifier alternative is
+    matched and looked up in a keyword table. Multi-line block comments are
+    tracked through the block state (IN_BLOCK_COMMENT).
 
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-        
-    def add_rules(self, keywords, format):
-        for keyword in keywords:
-            self.highlightingRules.append((r'\b' + re.escape(keyword) + r'\b', format))
+    Tokens are returned as (start, length, format_name) tuples, which keeps
+    the tokenizer free of Qt objects.
+    """
+    # Placeholder pattern for the identifier scan + keyword lookup
+    WORD = object()
+    IDENTIFIER = r'[A-Za-z_][A-Za-z0-9_]*'
+    NORMAL = 0
+    IN_BLOCK_COMMENT = 1
 
-    def highlightBlock(self, text):
-        # Single-line highlighting
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                start, end = match.span()
-                self.setFormat(start, end - start, format)
-        
-        # Multi-line comment highlighting
-        self.setCurrentBlockState(0)
-        start_index = 0
-        if self.previousBlockState() != 1:
-            start_index = self.comment_start_expression.indexIn(text)
-        
-        while start_index >= 0:
-            end_index = self.comment_end_expression.indexIn(text, start_index)
-            if end_index == -1:
-                self.setCurrentBlockState(1)
-                comment_length = len(text) - start_index
+    def __init__(self, rules, keywords=None, block_comment=None, flags=0):
+        """
+        rules: list of (pattern, format_name, group) in increasing priority.
+        keywords: mapping of keyword to format_name used for WORD matches.
+        block_comment: optional (start_pattern, end_pattern, format_name).
+        """
+        self.ignore_case = bool(flags & re.IGNORECASE)
+        self.keywords = {}
+        for word, name in (keywords or {}).items():
+            self.keywords[word.lower() if self.ignore_case else word] = name
+
+        # Alternatives are tried in order, so the highest priority comes first
+        alternatives = []
+        if block_comment:
+            alternatives.append((block_comment[0], 'block_comment', block_comment[2], 0))
+        for pattern, name, group in reversed(rules):
+            if pattern is self.WORD:
+                alternatives.append((r'\b' + self.IDENTIFIER + r'\b', 'word', None, 0))
             else:
-                comment_length = end_index - start_index + self.comment_end_expression.matchedLength()
-            
-            self.setFormat(start_index, comment_length, self.comment_format)
-            start_index = self.comment_start_expression.indexIn(text, start_index + comment_length)
-
-
-class HtmlHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "tag": self.create_format("#569CD6"),        # Blue for tags like <html>
-            "attribute": self.create_format("#9CDCFE"),  # Light Blue for attributes like href
-            "string": self.create_format("#CE9178"),     # Orange for attribute values
-            "comment": self.create_format("#6A9955"),    # Green for comments
-        }
-        
-        # Tag names: e.g., <p>, <div>, <h1>
-        self.highlightingRules.append((r'<([a-zA-Z0-9]+)', formats["tag"]))
-        self.highlightingRules.append((r'</([a-zA-Z0-9]+)>', formats["tag"]))
-        
-        # Attribute names: e.g., href, class, id
-        self.highlightingRules.append((r'([a-zA-Z0-9]+)=', formats["attribute"]))
-        
-        # String literals for attribute values
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        self.highlightingRules.append((r'\'[^\']*\'', formats["string"]))
-
-        # HTML Comments
-        self.highlightingRules.append((r'<!--.*-->', formats["comment"]))
-
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-
-    def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                start, end = match.span()
-                self.setFormat(start, end - start, format)
-
-
-class CssHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "selector": self.create_format("#D7BA7D"),       # Yellow
-            "property": self.create_format("#9CDCFE"),       # Light Blue
-            "value": self.create_format("#CE9178"),          # Orange
-            "string": self.create_format("#CE9178"),         # Orange
-            "comment": self.create_format("#6A9955"),        # Green
-            "at_rule": self.create_format("#C586C0"),        # Purple
-        }
-
-        # Selectors (classes and IDs)
-        self.highlightingRules.append((r'\.[a-zA-Z0-9_-]+', formats["selector"]))
-        self.highlightingRules.append((r'#[a-zA-Z0-9_-]+', formats["selector"]))
-        
-        # Property names
-        self.highlightingRules.append((r'\b[a-zA-Z-]+(?=:)', formats["property"]))
-        
-        # Values (not strings)
-        self.highlightingRules.append((r':\s*([^;]+);', formats["value"]))
-        
-        # String literals
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        self.highlightingRules.append((r'\'[^\']*\'', formats["string"]))
-        
-        # At-rules like @media, @import
-        self.highlightingRules.append((r'@[a-zA-Z]+', formats["at_rule"]))
-
-        # Multi-line comments
-        self.comment_format = formats["comment"]
-        self.comment_start_expression = QRegExp("/\\*")
-        self.comment_end_expression = QRegExp("\\*/")
-
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-    
-    def highlightBlock(self, text):
-        # Single-line highlighting
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                self.setFormat(match.start(), match.end() - match.start(), format)
-        
-        # Multi-line comment highlighting
-        self.setCurrentBlockState(0)
-        start_index = 0
-        if self.previousBlockState() != 1:
-            start_index = self.comment_start_expression.indexIn(text)
-        
-        while start_index >= 0:
-            end_index = self.comment_end_expression.indexIn(text, start_index)
-            if end_index == -1:
-                self.setCurrentBlockState(1)
-                comment_length = len(text) - start_index
+                alternatives.append((pattern, 'rule', name, group))
+
+        parts = []
+        self.alternatives = {}
+        group_index = 1
+        for pattern, kind, name, group in alternatives:
+            inner_groups = re.compile(pattern, flags).groups
+            parts.append('(' + self._shift_backreferences(pattern, group_index) + ')')
+            self.alternatives[group_index] = (kind, name, group_index + group if group else group_index)
+            group_index += 1 + inner_groups
+
+        self.expression = re.compile('|'.join(parts), flags) if parts else None
+        self.block_comment_end = None
+        self.block_comment_format = None
+        if block_comment:
+            self.block_comment_end = re.compile(block_comment[1], flags)
+            self.block_comment_format = block_comment[2]
+
+    @staticmethod
+    def _shift_backreferences(pattern, offset):
+        """Renumber \\N backreferences for the position inside the alternation."""
+        def shift(match):
+            if match.group(1):
+                return '\\' + str(int(match.group(1)) + offset)
+            return match.group(0)
+        return re.sub(r'\\(\d+)|\\.', shift, pattern)
+
+    def tokenize(self, text, state=NORMAL):
+        """Return (tokens, end_state) for one line of text."""
+        tokens = []
+        pos = 0
+        length = len(text)
+
+        if state == self.IN_BLOCK_COMMENT and self.block_comment_end:
+            match = self.block_comment_end.search(text)
+            if match is None:
+                if length:
+                    tokens.append((0, length, self.block_comment_format))
+                return tokens, self.IN_BLOCK_COMMENT
+            tokens.append((0, match.end(), self.block_comment_format))
+            pos = match.end()
+
+        if self.expression is None:
+            return tokens, self.NORMAL
+        return tokens, self._scan(text, pos, length, tokens)
+
+    def _scan(self, text, pos, endpos, tokens):
+        """Append the tokens of text[pos:endpos] to tokens and return the end state."""
+        expression = self.expression
+        keywords = self.keywords
+        alternatives = self.alternatives
+
+        while pos <= endpos:
+            match = expression.search(text, pos, endpos)
+            if match is None:
+                break
+            kind, name, group = alternatives[match.lastindex]
+            start, end = match.span()
+
+            if kind == 'word':
+                word = match.group()
+                name = keywords.get(word.lower() if self.ignore_case else word)
+                if name:
+                    tokens.append((start, end - start, name))
+            elif kind == 'block_comment':
+                close = self.block_comment_end.search(text, end, endpos)
+                if close is None:
+                    tokens.append((start, endpos - start, name))
+                    return self.IN_BLOCK_COMMENT
+                end = close.end()
+                tokens.append((start, end - start, name))
             else:
-                comment_length = end_index - start_index + self.comment_end_expression.matchedLength()
-            
-            self.setFormat(start_index, comment_length, self.comment_format)
-            start_index = self.comment_start_expression.indexIn(text, start_index + comment_length)
+                group_start, group_end = match.span(group)
+                if group_start >= 0 and group_end > group_start:
+                    # A rule only colors its group; the rest of the match is
+                    # scanned on its own, so fn in fn main() is still a keyword
+                    if group_start > start:
+                        self._scan(text, start, group_start, tokens)
+                    tokens.append((group_start, group_end - group_start, name))
+                    if end > group_end:
+                        self._scan(text, group_end, end, tokens)
 
+            pos = end if end > start else end + 1
 
-class JsonHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
+        return self.NORMAL
 
-        formats = {
-            "key": self.create_format("#9CDCFE"),          # Light Blue
-            "string_value": self.create_format("#CE9178"), # Orange
-            "number_value": self.create_format("#B5CEA8"), # Light Green
-            "boolean_null": self.create_format("#569CD6"), # Blue
-        }
-        
-        # Keys in double quotes followed by a colon
-        self.highlightingRules.append((r'\"[^\"]+\"\s*:', formats["key"]))
-        
-        # String values
-        self.highlightingRules.append((r':\s*\"[^\"]*\"', formats["string_value"]))
-        
-        # Number values
-        self.highlightingRules.append((r'\b[0-9.]+\b', formats["number_value"]))
-        
-        # Boolean and null values
-        self.highlightingRules.append((r'\b(true|false|null)\b', formats["boolean_null"]))
 
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
+class LanguageRegistry:
+    """
+    Maps file extensions to the language grammars in grammars.py.
 
-    def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                # For keys and strings, adjust the start position to not include the colon or quotes
-                start = match.start()
-                if pattern.startswith('\"'):
-                    start += 1
-                if pattern.endswith(':'):
-                    end = match.end() - 1
+    A grammar is only compiled into formats and a RuleTokenizer the first
+    time a file of that language is opened; every later highlighter for the
+    language shares the compiled rule table.
+    """
+    def __init__(self, grammars):
+        self.grammars = grammars
+        self.extensions = {}
+        for language, grammar in grammars.items():
+            for ext in grammar['extensions']:
+                self.extensions[ext] = language
+        self._rule_tables = {}
+
+    def language_for_extension(self, ext):
+        """Returns the language registered for a file extension, or None."""
+        return self.extensions.get(ext)
+
+    def highlighter_factory(self, language):
+        """Returns a callable that creates a highlighter for the language on a document."""
+        return functools.partial(RuleHighlighter, language=language)
+
+    def highlighter_factories(self):
+        """Returns a mapping of file extension to highlighter factory."""
+        return {ext: self.highlighter_factory(language) for ext, language in self.extensions.items()}
+
+    def rule_table(self, language):
+        """Returns the (formats, tokenizer) of a language, compiling its grammar on first use."""
+        table = self._rule_tables.get(language)
+        if table is None:
+            table = self.compile(self.grammars[language])
+            self._rule_tables[language] = table
+        return table
+
+    def compile(self, grammar):
+        """Build the formats and the RuleTokenizer of a grammar."""
+        formats = {name: self.create_format(spec) for name, spec in grammar['formats'].items()}
+
+        rules = []
+        keywords = {}
+        for rule in grammar.get('rules', ()):
+            pattern, name = rule[0], rule[1]
+            if isinstance(pattern, str):
+                rules.append((pattern, name, rule[2] if len(rule) > 2 else 0))
+                continue
+            for keyword in pattern:
+                if re.fullmatch(RuleTokenizer.IDENTIFIER, keyword):
+                    # Plain words are found by the tokenizer's identifier scan
+                    if not any(existing[0] is RuleTokenizer.WORD for existing in rules):
+                        rules.append((RuleTokenizer.WORD, None, 0))
+                    keywords[keyword] = name
                 else:
-                    end = match.end()
-                
-                self.setFormat(start, end - start, format)
+                    rules.append((r'\b' + re.escape(keyword) + r'\b', name, 0))
 
+        flags = re.IGNORECASE if grammar.get('ignore_case') else 0
+        tokenizer = RuleTokenizer(rules, keywords, grammar.get('block_comment'), flags)
+        return formats, tokenizer
 
-class BashHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "keyword": self.create_format("#C586C0"),       # Purple
-            "command": self.create_format("#569CD6"),       # Blue
-            "variable": self.create_format("#9CDCFE"),      # Light Blue
-            "string": self.create_format("#CE9178"),        # Orange
-            "comment": self.create_format("#6A9955"),       # Green
-            "numbers": self.create_format("#B5CEA8"),       # Light Green
-        }
-
-        # Keywords (control flow)
-        keywords = [
-            'if', 'then', 'else', 'elif', 'fi', 'for', 'while', 'do', 'done',
-            'case', 'esac', 'in', 'until', 'function'
-        ]
-        self.add_rules(keywords, formats["keyword"])
-
-        # Common shell commands
-        commands = [
-            'ls', 'cd', 'pwd', 'echo', 'cat', 'grep', 'find', 'sudo', 'apt-get', 'yum', 'git'
-        ]
-        self.add_rules(commands, formats["command"])
-
-        # Variables
-        self.highlightingRules.append((r'\$\b[a-zA-Z_][a-zA-Z0-9_]*\b', formats["variable"]))
-        
-        # String literals (single and double quotes)
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        self.highlightingRules.append((r'\'[^\']*\'', formats["string"]))
-        
-        # Numbers
-        self.highlightingRules.append((r'\b[0-9]+\b', formats["numbers"]))
-        
-        # Comments
-        self.highlightingRules.append((r'#.*', formats["comment"]))
-
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-
-    def add_rules(self, keywords, format):
-        for keyword in keywords:
-            self.highlightingRules.append((r'\b' + re.escape(keyword) + r'\b', format))
-
-    def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                self.setFormat(match.start(), match.end() - match.start(), format)
-
-
-class MarkdownHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "header": self.create_format("#569CD6", is_bold=True),      # Blue
-            "bold": self.create_format("#DCDCAA", is_bold=True),        # Yellow
-            "italic": self.create_format("#CE9178", is_italic=True),    # Orange
-            "link": self.create_format("#4EC9B0", is_underline=True),   # Teal
-            "list_item": self.create_format("#B5CEA8"),                 # Light Green
-        }
-        
-        # Headers: #, ##, ###, etc.
-        self.highlightingRules.append((r'^(#+)\s+.*', formats["header"]))
-        
-        # Bold text: **text** or __text__
-        self.highlightingRules.append((r'(\*\*|__)(.*?)\1', formats["bold"]))
-        
-        # Italic text: *text* or _text_
-        self.highlightingRules.append((r'(\*|_)(.*?)\1', formats["italic"]))
-
-        # Links: [text](link)
-        self.highlightingRules.append((r'\[(.*?)\]\((.*?)\)', formats["link"]))
-
-        # List items: *, -, +
-        self.highlightingRules.append((r'^\s*([*-]|\d+\.)\s+.*', formats["list_item"]))
-
-    def create_format(self, color_hex, is_bold=False, is_italic=False, is_underline=False):
+    @staticmethod
+    def create_format(spec):
+        """Create a QTextCharFormat from a "#color [bold] [italic] [underline]" spec."""
+        color_hex, *styles = spec.split()
         text_format = QTextCharFormat()
         text_format.setForeground(QColor(color_hex))
-        if is_bold:
+        if 'bold' in styles:
             text_format.setFontWeight(QFont.Bold)
-        if is_italic:
+        if 'italic' in styles:
             text_format.setFontItalic(True)
-        if is_underline:
+        if 'underline' in styles:
             text_format.setFontUnderline(True)
         return text_format
 
-    def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                # Apply format to the matched group (e.g., the text inside **bold**)
-                if match.groups():
-                    start, end = match.span(2)  # Get the span of the content
-                    self.setFormat(start, end - start, format)
-                else:
-                    start, end = match.span(0)  # For full match
-                    self.setFormat(start, end - start, format)
-
-
-class XmlHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "tag": self.create_format("#569CD6"),        # Blue
-            "attribute": self.create_format("#9CDCFE"),  # Light Blue
-            "string": self.create_format("#CE9178"),     # Orange
-            "comment": self.create_format("#6A9955"),    # Green
-        }
-        
-        # Tag names
-        self.highlightingRules.append((r'<([a-zA-Z0-9_.-:]+)', formats["tag"]))
-        self.highlightingRules.append((r'</([a-zA-Z0-9_.-:]+)>', formats["tag"]))
-        
-        # Attribute names
-        self.highlightingRules.append((r'([a-zA-Z0-9_.-]+)=', formats["attribute"]))
-        
-        # String literals for attribute values
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        self.highlightingRules.append((r'\'[^\']*\'', formats["string"]))
-
-        # XML Comments
-        self.highlightingRules.append((r'<!--.*-->', formats["comment"]))
-
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-
-    def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                self.setFormat(match.start(), match.end() - match.start(), format)
-
-
-class JavaHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "keyword": self.create_format("#C586C0"),       # Purple
-            "type": self.create_format("#569CD6"),          # Blue
-            "string": self.create_format("#CE9178"),        # Orange
-            "comment": self.create_format("#6A9955"),       # Green
-            "numbers": self.create_format("#B5CEA8"),       # Light Green
-            "class_name": self.create_format("#DCDCAA"),    # Yellow
-        }
-        
-        keywords = [
-            'abstract', 'assert', 'break', 'case', 'catch', 'class', 'const', 'continue',
-            'default', 'do', 'else', 'enum', 'extends', 'final', 'finally', 'for',
-            'goto', 'if', 'implements', 'import', 'instanceof', 'interface', 'native',
-            'new', 'package', 'private', 'protected', 'public', 'return', 'static',
-            'strictfp', 'super', 'switch', 'synchronized', 'this', 'throw', 'throws',
-            'transient', 'try', 'void', 'volatile', 'while'
-        ]
-        self.add_rules(keywords, formats["keyword"])
-
-        types = [
-            'boolean', 'byte', 'char', 'double', 'float', 'int', 'long', 'short'
-        ]
-        self.add_rules(types, formats["type"])
-
-        # Class names
-        self.highlightingRules.append((r'\bclass\s+([A-Za-z_][A-Za-z0-9_]*)', formats["class_name"]))
-        
-        # String literals
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        
-        # Numbers
-        self.highlightingRules.append((r'\b[0-9]+\b', formats["numbers"]))
-        
-        # Single-line comments
-        self.highlightingRules.append((r'//.*', formats["comment"]))
-
-        # Multi-line comment highlighting
-        self.comment_format = formats["comment"]
-        self.comment_start_expression = QRegExp("/\\*")
-        self.comment_end_expression = QRegExp("\\*/")
-
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-        
-    def add_rules(self, keywords, format):
-        for keyword in keywords:
-            self.highlightingRules.append((r'\b' + re.escape(keyword) + r'\b', format))
-
-    def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                self.setFormat(match.start(), match.end() - match.start(), format)
-        
-        # Multi-line comment highlighting
-        self.setCurrentBlockState(0)
-        start_index = 0
-        if self.previousBlockState() != 1:
-            start_index = self.comment_start_expression.indexIn(text)
-        
-        while start_index >= 0:
-            end_index = self.comment_end_expression.indexIn(text, start_index)
-            if end_index == -1:
-                self.setCurrentBlockState(1)
-                comment_length = len(text) - start_index
-            else:
-                comment_length = end_index - start_index + self.comment_end_expression.matchedLength()
-            
-            self.setFormat(start_index, comment_length, self.comment_format)
-            start_index = self.comment_start_expression.indexIn(text, start_index + comment_length)
-
-
-class RubyHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "keyword": self.create_format("#C586C0"),        # Purple
-            "method": self.create_format("#DCDCAA"),         # Yellow
-            "variable": self.create_format("#9CDCFE"),       # Light Blue
-            "string": self.create_format("#CE9178"),         # Orange
-            "comment": self.create_format("#6A9955"),        # Green
-            "symbol": self.create_format("#4EC9B0"),         # Teal
-        }
-        
-        keywords = [
-            'BEGIN', 'END', 'alias', 'and', 'begin', 'break', 'case', 'class', 'def', 'do',
-            'else', 'elsif', 'end', 'ensure', 'for', 'if', 'in', 'module', 'next', 'nil',
-            'not', 'or', 'redo', 'rescue', 'retry', 'return', 'self', 'super', 'then',
-            'unless', 'until', 'when', 'while', 'yield'
-        ]
-        self.add_rules(keywords, formats["keyword"])
-
-        # Method names
-        self.highlightingRules.append((r'\bdef\s+([a-zA-Z_][a-zA-Z0-9_]*)', formats["method"]))
-
-        # Instance and class variables
-        self.highlightingRules.append((r'(@[a-zA-Z_][a-zA-Z0-9_]*)', formats["variable"]))
-        self.highlightingRules.append((r'(@@[a-zA-Z_][a-zA-Z0-9_]*)', formats["variable"]))
-        
-        # Global variables
-        self.highlightingRules.append((r'(\$[a-zA-Z_][a-zA-Z0-9_]*)', formats["variable"]))
-        
-        # Symbols
-        self.highlightingRules.append((r':([a-zA-Z_][a-zA-Z0-9_]*)', formats["symbol"]))
-        
-        # String literals (single and double quotes)
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        self.highlightingRules.append((r'\'[^\']*\'', formats["string"]))
-        
-        # Comments
-        self.highlightingRules.append((r'#.*', formats["comment"]))
-
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-        
-    def add_rules(self, keywords, format):
-        for keyword in keywords:
-            self.highlightingRules.append((r'\b' + re.escape(keyword) + r'\b', format))
-
-    def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                self.setFormat(match.start(), match.end() - match.start(), format)
-
-
-class PhpHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "keyword": self.create_format("#C586C0"),       # Purple
-            "builtin": self.create_format("#569CD6"),       # Blue
-            "variable": self.create_format("#9CDCFE"),      # Light Blue
-            "string": self.create_format("#CE9178"),        # Orange
-            "comment": self.create_format("#6A9955"),       # Green
-            "numbers": self.create_format("#B5CEA8"),       # Light Green
-        }
-
-        # PHP keywords
-        keywords = [
-            '__halt_compiler', 'abstract', 'and', 'array', 'as', 'break', 'callable', 'case', 'catch',
-            'class', 'clone', 'const', 'continue', 'declare', 'default', 'die', 'do', 'echo', 'else',
-            'elseif', 'empty', 'enddeclare', 'endfor', 'endforeach', 'endif', 'endswitch', 'endwhile',
-            'eval', 'exit', 'extends', 'final', 'for', 'foreach', 'function', 'global', 'goto', 'if',
-            'implements', 'include', 'include_once', 'instanceof', 'interface', 'isset', 'list',
-            'namespace', 'new', 'or', 'print', 'private', 'protected', 'public', 'require',
-            'require_once', 'return', 'static', 'switch', 'throw', 'trait', 'try', 'unset', 'use',
-            'var', 'while', 'xor', 'yield'
-        ]
-        self.add_rules(keywords, formats["keyword"])
-
-        # Built-in functions
-        builtins = [
-            'printf', 'strlen', 'count', 'isset', 'empty', 'define', 'header', 'session_start'
-        ]
-        self.add_rules(builtins, formats["builtin"])
-
-        # Variables
-        self.highlightingRules.append((r'\$[a-zA-Z_][a-zA-Z0-9_]*', formats["variable"]))
-        
-        # String literals (single and double quotes)
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        self.highlightingRules.append((r'\'[^\']*\'', formats["string"]))
-        
-        # Numbers
-        self.highlightingRules.append((r'\b[0-9]+\b', formats["numbers"]))
-        
-        # Single-line comments
-        self.highlightingRules.append((r'//.*', formats["comment"]))
-
-        # Multi-line comment highlighting
-        self.comment_format = formats["comment"]
-        self.comment_start_expression = QRegExp("/\\*")
-        self.comment_end_expression = QRegExp("\\*/")
-
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-
-    def add_rules(self, keywords, format):
-        for keyword in keywords:
-            self.highlightingRules.append((r'\b' + re.escape(keyword) + r'\b', format))
-
-    def highlightBlock(self, text):
-        # Single-line highlighting
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                self.setFormat(match.start(), match.end() - match.start(), format)
-        
-        # Multi-line comment highlighting
-        self.setCurrentBlockState(0)
-        start_index = 0
-        if self.previousBlockState() != 1:
-            start_index = self.comment_start_expression.indexIn(text)
-        
-        while start_index >= 0:
-            end_index = self.comment_end_expression.indexIn(text, start_index)
-            if end_index == -1:
-                self.setCurrentBlockState(1)
-                comment_length = len(text) - start_index
-            else:
-                comment_length = end_index - start_index + self.comment_end_expression.matchedLength()
-            
-            self.setFormat(start_index, comment_length, self.comment_format)
-            start_index = self.comment_start_expression.indexIn(text, start_index + comment_length)
-
-
-class SqlHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "keyword": self.create_format("#C586C0"),       # Purple
-            "function": self.create_format("#DCDCAA"),      # Yellow
-            "string": self.create_format("#CE9178"),        # Orange
-            "comment": self.create_format("#6A9955"),       # Green
-            "numbers": self.create_format("#B5CEA8"),       # Light Green
-        }
-        
-        # SQL Keywords
-        keywords = [
-            'ADD', 'ALTER', 'AND', 'AS', 'ASC', 'BETWEEN', 'BY', 'CASE', 'CAST', 'COLUMN',
-            'CREATE', 'DATABASE', 'DEFAULT', 'DELETE', 'DESC', 'DISTINCT', 'DROP', 'EXISTS',
-            'FROM', 'GROUP', 'HAVING', 'IN', 'INDEX', 'INSERT', 'INTO', 'IS', 'JOIN', 'LIKE',
-            'LIMIT', 'NOT', 'NULL', 'ON', 'OR', 'ORDER', 'OUTER', 'SELECT', 'SET', 'TABLE',
-            'UNION', 'UPDATE', 'VALUES', 'WHERE'
-        ]
-        self.add_rules(keywords, formats["keyword"])
-
-        # Built-in functions
-        functions = [
-            'COUNT', 'AVG', 'SUM', 'MIN', 'MAX', 'LOWER', 'UPPER', 'TRIM', 'CONCAT'
-        ]
-        self.add_rules(functions, formats["function"])
-        
-        # String literals (single quotes)
-        self.highlightingRules.append((r'\'[^\']*\'', formats["string"]))
-        
-        # Numbers
-        self.highlightingRules.append((r'\b[0-9]+\b', formats["numbers"]))
-        
-        # Single-line comments
-        self.highlightingRules.append((r'--.*', formats["comment"]))
-
-        # Multi-line comment highlighting
-        self.comment_format = formats["comment"]
-        self.comment_start_expression = QRegExp("/\\*")
-        self.comment_end_expression = QRegExp("\\*/")
-
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-        
-    def add_rules(self, keywords, format):
-        for keyword in keywords:
-            self.highlightingRules.append((r'\b' + re.escape(keyword) + r'\b', format))
-
-    def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern, re.IGNORECASE)
-            for match in expression.finditer(text):
-                self.setFormat(match.start(), match.end() - match.start(), format)
-        
-        self.setCurrentBlockState(0)
-        start_index = 0
-        if self.previousBlockState() != 1:
-            start_index = self.comment_start_expression.indexIn(text)
-        
-        while start_index >= 0:
-            end_index = self.comment_end_expression.indexIn(text, start_index)
-            if end_index == -1:
-                self.setCurrentBlockState(1)
-                comment_length = len(text) - start_index
-            else:
-                comment_length = end_index - start_index + self.comment_end_expression.matchedLength()
-            
-            self.setFormat(start_index, comment_length, self.comment_format)
-            start_index = self.comment_start_expression.indexIn(text, start_index + comment_length)
-
-
-class SwiftHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "keyword": self.create_format("#C586C0"),       # Purple
-            "type": self.create_format("#569CD6"),          # Blue
-            "string": self.create_format("#CE9178"),        # Orange
-            "comment": self.create_format("#6A9955"),       # Green
-            "numbers": self.create_format("#B5CEA8"),       # Light Green
-        }
-        
-        keywords = [
-            'as', 'async', 'await', 'break', 'case', 'catch', 'class', 'continue', 'convenience',
-            'default', 'defer', 'deinit', 'didSet', 'do', 'dynamic', 'else', 'enum', 'extension',
-            'fallthrough', 'false', 'final', 'for', 'func', 'if', 'import', 'in', 'init', 'inout',
-            'internal', 'is', 'lazy', 'let', 'mutating', 'nonmutating', 'nil', 'open', 'optional',
-            'override', 'private', 'protocol', 'public', 'required', 'return', 'self', 'static',
-            'struct', 'subscript', 'super', 'switch', 'throw', 'throws', 'true', 'try', 'typealias',
-            'var', 'weak', 'where', 'while', 'willSet'
-        ]
-        self.add_rules(keywords, formats["keyword"])
-
-        types = [
-            'Int', 'Double', 'Float', 'String', 'Bool', 'Character', 'Array', 'Dictionary'
-        ]
-        self.add_rules(types, formats["type"])
-        
-        # String literals
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        
-        # Numbers
-        self.highlightingRules.append((r'\b[0-9]+\b', formats["numbers"]))
-        
-        # Single-line comments
-        self.highlightingRules.append((r'//.*', formats["comment"]))
-
-        # Multi-line comment highlighting
-        self.comment_format = formats["comment"]
-        self.comment_start_expression = QRegExp("/\\*")
-        self.comment_end_expression = QRegExp("\\*/")
-
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-        
-    def add_rules(self, keywords, format):
-        for keyword in keywords:
-            self.highlightingRules.append((r'\b' + re.escape(keyword) + r'\b', format))
-
-    def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                self.setFormat(match.start(), match.end() - match.start(), format)
-        
-        self.setCurrentBlockState(0)
-        start_index = 0
-        if self.previousBlockState() != 1:
-            start_index = self.comment_start_expression.indexIn(text)
-        
-        while start_index >= 0:
-            end_index = self.comment_end_expression.indexIn(text, start_index)
-            if end_index == -1:
-                self.setCurrentBlockState(1)
-                comment_length = len(text) - start_index
-            else:
-                comment_length = end_index - start_index + self.comment_end_expression.matchedLength()
-            
-            self.setFormat(start_index, comment_length, self.comment_format)
-            start_index = self.comment_start_expression.indexIn(text, start_index + comment_length)
-
-
-class GoHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "keyword": self.create_format("#C586C0"),       # Purple
-            "builtin_func": self.create_format("#DCDCAA"),  # Yellow
-            "type": self.create_format("#569CD6"),          # Blue
-            "string": self.create_format("#CE9178"),        # Orange
-            "comment": self.create_format("#6A9955"),       # Green
-            "numbers": self.create_format("#B5CEA8"),       # Light Green
-        }
-        
-        keywords = [
-            'break', 'case', 'chan', 'const', 'continue', 'default', 'defer', 'else',
-            'fallthrough', 'for', 'func', 'go', 'goto', 'if', 'import', 'interface',
-            'map', 'package', 'range', 'return', 'select', 'struct', 'switch', 'type',
-            'var'
-        ]
-        self.add_rules(keywords, formats["keyword"])
-
-        builtin_functions = [
-            'make', 'new', 'len', 'cap', 'append', 'copy', 'close', 'delete', 'panic',
-            'print', 'println', 'recover'
-        ]
-        self.add_rules(builtin_functions, formats["builtin_func"])
-
-        types = [
-            'bool', 'byte', 'complex64', 'complex128', 'error', 'float32', 'float64',
-            'int', 'int8', 'int16', 'int32', 'int64', 'rune', 'string', 'uint',
-            'uint8', 'uint16', 'uint32', 'uint64', 'uintptr'
-        ]
-        self.add_rules(types, formats["type"])
-        
-        # String literals (double quotes)
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        
-        # Raw string literals (backticks)
-        self.highlightingRules.append((r'`[^`]*`', formats["string"]))
-
-        # Numbers
-        self.highlightingRules.append((r'\b[0-9.]+\b', formats["numbers"]))
-        
-        # Single-line comments
-        self.highlightingRules.append((r'//.*', formats["comment"]))
-
-        # Multi-line comment highlighting
-        self.comment_format = formats["comment"]
-        self.comment_start_expression = QRegExp("/\\*")
-        self.comment_end_expression = QRegExp("\\*/")
-
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-        
-    def add_rules(self, keywords, format):
-        for keyword in keywords:
-            self.highlightingRules.append((r'\b' + re.escape(keyword) + r'\b', format))
-
-    def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                self.setFormat(match.start(), match.end() - match.start(), format)
-        
-        self.setCurrentBlockState(0)
-        start_index = 0
-        if self.previousBlockState() != 1:
-            start_index = self.comment_start_expression.indexIn(text)
-        
-        while start_index >= 0:
-            end_index = self.comment_end_expression.indexIn(text, start_index)
-            if end_index == -1:
-                self.setCurrentBlockState(1)
-                comment_length = len(text) - start_index
-            else:
-                comment_length = end_index - start_index + self.comment_end_expression.matchedLength()
-            
-            self.setFormat(start_index, comment_length, self.comment_format)
-            start_index = self.comment_start_expression.indexIn(text, start_index + comment_length)
-
-
-class CsharpHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        # Color palette inspired by VS Code Dark+ theme
-        formats = {
-            "keyword": self.create_format("#C586C0", is_bold=True),      # Purple: for, if, class, return
-            "type_name": self.create_format("#4EC9B0", is_bold=True),    # Teal: string, int, List
-            "method_name": self.create_format("#DCDCAA"),                # Yellow: MyFunction(), Console.WriteLine()
-            "string": self.create_format("#CE9178"),                     # Orange: "Hello, World!"
-            "comment": self.create_format("#6A9955"),                    # Green: // This is a comment
-            "numbers": self.create_format("#B5CEA8"),                    # Light Green: 123, 45.6
-            "class_struct": self.create_format("#569CD6", is_bold=True), # Blue: class, struct
-            "attribute": self.create_format("#9CDCFE"),                  # Light Blue: [Test]
-        }
-        
-        # Keywords
-        keywords = [
-            'abstract', 'as', 'async', 'await', 'base', 'break', 'case', 'catch', 'checked',
-            'const', 'continue', 'default', 'delegate', 'do', 'else', 'enum', 'event', 
-            'explicit', 'extern', 'false', 'finally', 'fixed', 'for', 'foreach',
-            'goto', 'if', 'implicit', 'in', 'is', 'lock', 'new', 'null', 'out', 'override', 
-            'params', 'private', 'protected', 'public', 'readonly', 'ref', 'return', 
-            'sealed', 'sizeof', 'stackalloc', 'static', 'this', 'throw', 'true', 'try', 
-            'typeof', 'unchecked', 'unsafe', 'using', 'virtual', 'void', 'volatile', 'while', 
-            'yield'
-        ]
-        self.add_rules(keywords, formats["keyword"])
-
-        # Class/Struct/Interface keywords
-        class_struct_keywords = [
-            'class', 'struct', 'interface'
-        ]
-        self.add_rules(class_struct_keywords, formats["class_struct"])
-
-        # Built-in types
-        types = [
-            'bool', 'byte', 'char', 'decimal', 'double', 'float', 'int', 'long', 'object',
-            'sbyte', 'short', 'string', 'uint', 'ulong', 'ushort'
-        ]
-        self.add_rules(types, formats["type_name"])
-        
-        # String literals (double quotes)
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        
-        # Verbatim strings
-        self.highlightingRules.append((r'@\"[^\"]*\"', formats["string"]))
-
-        # Numbers
-        self.highlightingRules.append((r'\b[0-9.]+\b', formats["numbers"]))
-        
-        # Attributes: [Test], [Serializable]
-        self.highlightingRules.append((r'\[.*?\]', formats["attribute"]))
-
-        # Method names (words followed by parentheses)
-        self.highlightingRules.append((r'\b[a-zA-Z_][a-zA-Z0-9_]*\s*(?=\()', formats["method_name"]))
-
-        # Single-line comments
-        self.highlightingRules.append((r'//.*', formats["comment"]))
-
-        # Multi-line comment highlighting
-        self.comment_format = formats["comment"]
-        self.comment_start_expression = QRegExp("/\\*")
-        self.comment_end_expression = QRegExp("\\*/")
-
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-        
-    def add_rules(self, keywords, format):
-        for keyword in keywords:
-            self.highlightingRules.append((r'\b' + re.escape(keyword) + r'\b', format))
-
-    def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                start, end = match.span()
-                self.setFormat(start, end - start, format)
-        
-        self.setCurrentBlockState(0)
-        start_index = 0
-        if self.previousBlockState() != 1:
-            start_index = self.comment_start_expression.indexIn(text)
-        
-        while start_index >= 0:
-            end_index = self.comment_end_expression.indexIn(text, start_index)
-            if end_index == -1:
-                self.setCurrentBlockState(1)
-                comment_length = len(text) - start_index
-            else:
-                comment_length = end_index - start_index + self.comment_end_expression.matchedLength()
-            
-            self.setFormat(start_index, comment_length, self.comment_format)
-            start_index = self.comment_start_expression.indexIn(text, start_index + comment_length)
-
-
-class RustHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "keyword": self.create_format("#C586C0", is_bold=True),
-            "type": self.create_format("#569CD6"),
-            "function": self.create_format("#DCDCAA"),
-            "string": self.create_format("#CE9178"),
-            "comment": self.create_format("#6A9955"),
-            "numbers": self.create_format("#B5CEA8"),
-        }
-        
-        keywords = [
-            'as', 'async', 'await', 'break', 'const', 'continue', 'crate', 'dyn', 'else', 'enum',
-            'extern', 'false', 'fn', 'for', 'if', 'impl', 'in', 'let', 'loop', 'match',
-            'mod', 'move', 'mut', 'pub', 'ref', 'return', 'self', 'static', 'struct',
-            'super', 'trait', 'true', 'type', 'union', 'unsafe', 'use', 'where', 'while'
-        ]
-        self.add_rules(keywords, formats["keyword"])
-
-        types = [
-            'bool', 'char', 'f32', 'f64', 'i8', 'i16', 'i32', 'i64', 'isize', 'str',
-            'u8', 'u16', 'u32', 'u64', 'usize'
-        ]
-        self.add_rules(types, formats["type"])
-
-        # Function names
-        self.highlightingRules.append((r'\bfn\s+([a-zA-Z_][a-zA-Z0-9_]*)', formats["function"]))
-
-        # String literals (double quotes)
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        
-        # Numbers
-        self.highlightingRules.append((r'\b[0-9.]+\b', formats["numbers"]))
-        
-        # Single-line comments
-        self.highlightingRules.append((r'//.*', formats["comment"]))
-
-        # Multi-line comment highlighting
-        self.comment_format = formats["comment"]
-        self.comment_start_expression = QRegExp("/\\*")
-        self.comment_end_expression = QRegExp("\\*/")
-
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-        
-    def add_rules(self, keywords, format):
-        for keyword in keywords:
-            self.highlightingRules.append((r'\b' + re.escape(keyword) + r'\b', format))
-
-    def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                if pattern == r'\bfn\s+([a-zA-Z_][a-zA-Z0-9_]*)':
-                    start, end = match.span(1)
-                    self.setFormat(start, end - start, format)
-                else:
-                    start, end = match.span(0)
-                    self.setFormat(start, end - start, format)
-        
-        self.setCurrentBlockState(0)
-        start_index = 0
-        if self.previousBlockState() != 1:
-            start_index = self.comment_start_expression.indexIn(text)
-        
-        while start_index >= 0:
-            end_index = self.comment_end_expression.indexIn(text, start_index)
-            if end_index == -1:
-                self.setCurrentBlockState(1)
-                comment_length = len(text) - start_index
-            else:
-                comment_length = end_index - start_index + self.comment_end_expression.matchedLength()
-            
-            self.setFormat(start_index, comment_length, self.comment_format)
-            start_index = self.comment_start_expression.indexIn(text, start_index + comment_length)
-
 
-class KotlinHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
+class RuleHighlighter(QSyntaxHighlighter):
+    """
+    Highlights a document with the grammar of one language.
+
+    The grammar is looked up in LANGUAGES, which compiles it into formats
+    and a RuleTokenizer the first time the language is used, so opening a
+    tab does not rebuild the formats or recompile the patterns.
+
+    Large documents can be tokenized in a background thread with
+    start_background_highlighting(); the results are then applied in short
+    time slices, visible blocks first, so the window stays responsive. An
+    edit meanwhile restarts the job from the edited block.
+
+    In lazy mode (set_lazy_highlighting()) only the blocks within lookahead
+    blocks of the viewport are highlighted, and blocks further than
+    retention blocks away lose their formats again. Blocks that were never
+    highlighted keep no state, so a multi-line comment that starts above
+    the highlighted range is only picked up once that part is scrolled
+    through.
+    """
+    def __init__(self, parent=None, language=None):
         super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "keyword": self.create_format("#C586C0", is_bold=True),       # Purple
-            "type": self.create_format("#569CD6"),                        # Blue
-            "function": self.create_format("#DCDCAA"),                    # Yellow
-            "string": self.create_format("#CE9178"),                      # Orange
-            "comment": self.create_format("#6A9955"),                     # Green
-            "numbers": self.create_format("#B5CEA8"),                     # Light Green
-        }
-        
-        keywords = [
-            'as', 'as?', 'break', 'by', 'catch', 'class', 'continue', 'do', 'else', 'false',
-            'for', 'fun', 'if', 'in', 'is', 'null', 'object', 'package', 'return', 'super',
-            'this', 'throw', 'true', 'try', 'typealias', 'var', 'val', 'when', 'while'
-        ]
-        self.add_rules(keywords, formats["keyword"])
-
-        types = [
-            'Any', 'Boolean', 'Byte', 'Char', 'Double', 'Float', 'Int', 'Long', 'Short', 'String'
-        ]
-        self.add_rules(types, formats["type"])
+        self.language = language
+        self.formats, self.tokenizer = LANGUAGES.rule_table(language)
+
+        # Background highlighting state
+        self.visible_blocks = (0, 100)
+        self.background_job = None
+        self.background_results = None
+        self.background_order = []
+        # First block number the job has not handed over yet
+        self.background_next = 0
+        self.background_document = None
+        self.background_timer = QTimer(self)
+        self.background_timer.timeout.connect(self.apply_background_results)
+
+        # Lazy highlighting state
+        self.lookahead = LAZY_HIGHLIGHT_LOOKAHEAD
+        self.retention = LAZY_HIGHLIGHT_RETENTION
+        self.lazy_blocks = None
+        self.last_lazy_block = -1
+
+    def tokenize_line(self, text, state):
+        """Tokenize one line through the shared line cache, returns (tokens, end_state)."""
+        return line_cache.tokenize(self.language, self.tokenizer.tokenize, text, state)
+
+    def set_visible_blocks(self, first, last):
+        """Tell the highlighter which block numbers are on screen."""
+        self.visible_blocks = (first, last)
+        if self.lazy_blocks is not None:
+            self.update_lazy_blocks()
+
+    def set_lazy_highlighting(self, enabled):
+        """Only highlight the blocks around the viewport, or go back to highlighting everything."""
+        if enabled == (self.lazy_blocks is not None):
+            return
+        if enabled:
+            self.stop_background_highlighting()
+            # Nothing is highlighted until the viewport is known
+            self.lazy_blocks = (0, -1)
+        else:
+            self.lazy_blocks = None
+            self.rehighlight()
 
-        # Function names
-        self.highlightingRules.append((r'\bfun\s+([a-zA-Z_][a-zA-Z0-9_]*)', formats["function"]))
-        
-        # String literals
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        self.highlightingRules.append((r'\"\"\"[\s\S]*?\"\"\"', formats["string"]))
-        
-        # Numbers
-        self.highlightingRules.append((r'\b[0-9.]+\b', formats["numbers"]))
-        
-        # Single-line comments
-        self.highlightingRules.append((r'//.*', formats["comment"]))
+    def update_lazy_blocks(self):
+        """Highlight the blocks near the viewport and drop the formats of blocks far from it."""
+        document = self.document()
+        if document is None:
+            return
+        first, last = self.visible_blocks
+        start = max(0, first - self.lookahead)
+        end = min(document.blockCount() - 1, last + self.lookahead)
+        old_start, old_end = self.lazy_blocks
+        # Keep the part of the old range that is still within the retention window
+        kept_start = max(old_start, first - self.retention)
+        kept_end = min(old_end, last + self.retention)
+        if kept_start <= kept_end and kept_start <= end + 1 and start <= kept_end + 1:
+            start, end = min(start, kept_start), max(end, kept_end)
+        self.lazy_blocks = (start, end)
+
+        # Blocks outside the new range are re-highlighted without formats
+        self.rehighlight_blocks(document, old_start, min(old_end, start - 1))
+        self.rehighlight_blocks(document, max(old_start, end + 1), old_end)
+        if old_start > old_end:
+            self.rehighlight_blocks(document, start, end)
+        else:
+            self.rehighlight_blocks(document, start, min(end, old_start - 1))
+            self.rehighlight_blocks(document, max(start, old_end + 1), end)
+
+    def rehighlight_blocks(self, document, first, last):
+        """Re-highlight the blocks numbered first to last."""
+        number = first
+        while number <= last:
+            block = document.findBlockByNumber(number)
+            if not block.isValid():
+                break
+            self.last_lazy_block = number
+            self.rehighlightBlock(block)
+            # Qt carries on into the next blocks while their state changes
+            number = max(number, self.last_lazy_block) + 1
+
+    def start_background_highlighting(self):
+        """Tokenize a snapshot of the document in a worker thread."""
+        self.stop_background_highlighting()
+        document = self.document()
+        if document is None:
+            return
+        self.background_results = {}
+        self.background_order = []
+        self.start_background_job(0, RuleTokenizer.NORMAL)
+        self.background_document = document
+        document.contentsChange.connect(self.restart_background_highlighting)
+
+    def start_background_job(self, first, state):
+        """Tokenize the blocks from number first on, entered in state."""
+        self.background_job = HighlightJob(None, self.tokenize_line, state, first)
+        self.background_next = first
+        # The job is started from the first timer tick, after the pass Qt
+        # schedules when a highlighter is attached; that pass only tokenizes
+        # the visible blocks and should not compete with the worker. The
+        # snapshot is taken then too, so edits until then cost nothing.
+        self.background_timer.start(0)
+
+    def stop_background_highlighting(self):
+        """Cancel a running background job and drop its pending results."""
+        if self.background_job:
+            self.background_job.cancel()
+        if self.background_document is not None:
+            try:
+                self.background_document.contentsChange.disconnect(self.restart_background_highlighting)
+            except (TypeError, RuntimeError):
+                pass
+            self.background_document = None
+        self.background_job = None
+        self.background_results = None
+        self.background_order = []
+        self.background_timer.stop()
+
+    def restart_background_highlighting(self, position, removed, added):
+        """
+        Start the background job over from the first edited block. The
+        results from there on follow the old text and the states it led to,
+        so they are dropped even for blocks whose own text is unchanged.
+        """
+        job = self.background_job
+        document = self.document()
+        if job is None or document is None:
+            return
+        job.cancel()
+        self.take_background_results(job)
+        first = min(document.findBlock(position).blockNumber(), self.background_next)
+        results = self.background_results
+        for number in [number for number in results if number >= first]:
+            del results[number]
+        self.background_order = [number for number in self.background_order if number < first]
+        # The blocks before first are highlighted or have their result waiting
+        if first == 0:
+            state = RuleTokenizer.NORMAL
+        elif first - 1 in results:
+            state = results[first - 1][2]
+        else:
+            state = max(document.findBlockByNumber(first - 1).userState(), 0)
+        self.start_background_job(first, state)
+
+    def take_background_results(self, job):
+        for number, text, tokens, state in job.take_results():
+            self.background_results[number] = (text, tokens, state)
+            self.background_order.append(number)
+            self.background_next = number + 1
+
+    def apply_background_results(self):
+        """Apply finished background results for one time slice, visible blocks first."""
+        job = self.background_job
+        document = self.document()
+        if job is None or document is None:
+            self.stop_background_highlighting()
+            return
 
-        # Multi-line comment highlighting
-        self.comment_format = formats["comment"]
-        self.comment_start_expression = QRegExp("/\\*")
-        self.comment_end_expression = QRegExp("\\*/")
+        if not job.started:
+            # toPlainText() would also break lines at U+2028, out of step with the blocks
+            job.lines = document.toRawText().replace('\u2029', '\n').split('\n')[job.first:]
+            job.start()
+            return
 
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-        
-    def add_rules(self, keywords, format):
-        for keyword in keywords:
-            self.highlightingRules.append((r'\b' + re.escape(keyword) + r'\b', format))
+        results = self.background_results
+        self.take_background_results(job)
+
+        deadline = time.perf_counter() + HIGHLIGHT_TIME_SLICE
+        first, last = self.visible_blocks
+        for number in range(first, last + 1):
+            if number in results:
+                self.apply_background_result(document, number)
+
+        order = self.background_order
+        applied = 0
+        while applied < len(order) and time.perf_counter() < deadline:
+            number = order[applied]
+            applied += 1
+            if number in results:
+                self.apply_background_result(document, number)
+        del order[:applied]
+
+        if job.done and not results:
+            self.stop_background_highlighting()
+
+    def apply_background_result(self, document, number):
+        """Re-highlight one block from its background result."""
+        block = document.findBlockByNumber(number)
+        if not block.isValid():
+            self.background_results.pop(number, None)
+            return
+        # Store the final state first so Qt does not cascade into the next block
+        block.setUserState(self.background_results[number][2])
+        self.rehighlightBlock(block)
+        self.background_results.pop(number, None)
 
     def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                if pattern == r'\bfun\s+([a-zA-Z_][a-zA-Z0-9_]*)':
-                    start, end = match.span(1)
-                    self.setFormat(start, end - start, format)
-                else:
-                    start, end = match.span(0)
-                    self.setFormat(start, end - start, format)
-        
-        self.setCurrentBlockState(0)
-        start_index = 0
-        if self.previousBlockState() != 1:
-            start_index = self.comment_start_expression.indexIn(text)
-        
-        while start_index >= 0:
-            end_index = self.comment_end_expression.indexIn(text, start_index)
-            if end_index == -1:
-                self.setCurrentBlockState(1)
-                comment_length = len(text) - start_index
-            else:
-                comment_length = end_index - start_index + self.comment_end_expression.matchedLength()
-            
-            self.setFormat(start_index, comment_length, self.comment_format)
-            start_index = self.comment_start_expression.indexIn(text, start_index + comment_length)
-
-
-class TypeScriptHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "keyword": self.create_format("#C586C0", is_bold=True),       # Purple
-            "type": self.create_format("#569CD6"),                        # Blue
-            "string": self.create_format("#CE9178"),                      # Orange
-            "comment": self.create_format("#6A9955"),                     # Green
-            "numbers": self.create_format("#B5CEA8"),                     # Light Green
-        }
-        
-        keywords = [
-            'async', 'await', 'break', 'case', 'catch', 'class', 'const', 'continue', 'do',
-            'else', 'enum', 'export', 'extends', 'finally', 'for', 'if', 'import', 'in',
-            'instanceof', 'new', 'return', 'super', 'switch', 'this', 'throw', 'true',
-            'try', 'typeof', 'var', 'void', 'while', 'let', 'interface', 'type', 'implements'
-        ]
-        self.add_rules(keywords, formats["keyword"])
-
-        types = [
-            'string', 'number', 'boolean', 'any', 'void', 'null', 'undefined'
-        ]
-        self.add_rules(types, formats["type"])
-
-        # String literals (double and single quotes, and backticks for templates)
-        self.highlightingRules.append((r'\"[^\"]*\"', formats["string"]))
-        self.highlightingRules.append((r'\'[^\']*\'', formats["string"]))
-        self.highlightingRules.append((r'`[^`]*`', formats["string"]))
-        
-        # Numbers
-        self.highlightingRules.append((r'\b[0-9.]+\b', formats["numbers"]))
-        
-        # Single-line comments
-        self.highlightingRules.append((r'//.*', formats["comment"]))
-
-        # Multi-line comment highlighting
-        self.comment_format = formats["comment"]
-        self.comment_start_expression = QRegExp("/\\*")
-        self.comment_end_expression = QRegExp("\\*/")
-
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
-        
-    def add_rules(self, keywords, format):
-        for keyword in keywords:
-            self.highlightingRules.append((r'\b' + re.escape(keyword) + r'\b', format))
+        if self.lazy_blocks is not None:
+            number = self.currentBlock().blockNumber()
+            self.last_lazy_block = number
+            first, last = self.lazy_blocks
+            if not first <= number <= last:
+                # Far from the viewport: no formats, and the stored state is kept
+                return
 
-    def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                start, end = match.span()
-                self.setFormat(start, end - start, format)
-        
-        self.setCurrentBlockState(0)
-        start_index = 0
-        if self.previousBlockState() != 1:
-            start_index = self.comment_start_expression.indexIn(text)
-        
-        while start_index >= 0:
-            end_index = self.comment_end_expression.indexIn(text, start_index)
-            if end_index == -1:
-                self.setCurrentBlockState(1)
-                comment_length = len(text) - start_index
-            else:
-                comment_length = end_index - start_index + self.comment_end_expression.matchedLength()
-            
-            self.setFormat(start_index, comment_length, self.comment_format)
-            start_index = self.comment_start_expression.indexIn(text, start_index + comment_length)
+        result = None
+        if self.background_results is not None:
+            number = self.currentBlock().blockNumber()
+            result = self.background_results.pop(number, None)
+            first, last = self.visible_blocks
+            if result is None and not first <= number <= last:
+                # Not tokenized yet; the background job will get here
+                return
 
+        if result is not None and result[0] == text:
+            tokens, state = result[1], result[2]
+        else:
+            tokens, state = self.tokenize_line(text, max(self.previousBlockState(), 0))
 
-class YamlHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.highlightingRules = []
-
-        formats = {
-            "key": self.create_format("#9CDCFE"),          # Light Blue
-            "string_value": self.create_format("#CE9178"), # Orange
-            "number_value": self.create_format("#B5CEA8"), # Light Green
-            "boolean_null": self.create_format("#569CD6"), # Blue
-            "comment": self.create_format("#6A9955"),      # Green
-        }
-        
-        # Keys (words followed by a colon)
-        self.highlightingRules.append((r'\b[a-zA-Z0-9_-]+\s*:', formats["key"]))
-        
-        # String values (in quotes or not)
-        self.highlightingRules.append((r'(\'|").*?(\'|")', formats["string_value"]))
-        
-        # Number values
-        self.highlightingRules.append((r'\b[0-9.]+\b', formats["number_value"]))
-        
-        # Boolean and null values
-        self.highlightingRules.append((r'\b(true|false|null)\b', formats["boolean_null"]))
-        
-        # Comments
-        self.highlightingRules.append((r'#.*', formats["comment"]))
+        formats = self.formats
+        for start, length, name in tokens:
+            self.setFormat(start, length, formats[name])
+        self.setCurrentBlockState(state)
 
-    def create_format(self, color_hex, is_bold=False):
-        text_format = QTextCharFormat()
-        text_format.setForeground(QColor(color_hex))
-        if is_bold:
-            text_format.setFontWeight(QFont.Bold)
-        return text_format
 
-    def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = re.compile(pattern)
-            for match in expression.finditer(text):
-                self.setFormat(match.start(), match.end() - match.start(), format)
+# Languages with a grammar in grammars.py
+LANGUAGES = LanguageRegistry(GRAMMARS)
 
 
 # ------------------ Line Numbers ------------------ #
@@ -1457,7 +532,7 @@ class LineNumberArea(QWidget):
         Calculates the required width for the line number area.
         """
         # حساب عدد الأرقام المطلوبة بناءً على عدد الأسطر
-        max_lines = max(1, self.code_editor.blockCount())
+        max_lines = max(1, self.code_editor.line_count())
         digits = 1
         while max_lines >= 10:
             max_lines //= 10
@@ -1535,7 +610,9 @@ class EditorWidget(QWidget):
         """Update the width of the line number area."""
         # حساب العرض المطلوب وتحديث الهوامش
         width = self.line_number_area.lineNumberAreaWidth()
-        self.editor.setViewportMargins(width, 0, 0, 0)
+        # Only relayout when the width changes; this runs for every repainted block
+        if self.editor.viewportMargins().left() != width:
+            self.editor.setViewportMargins(width, 0, 0, 0)
         
         # إعادة رسم منطقة الأرقام
         self.line_number_area.update()
@@ -1593,7 +670,33 @@ class AutoIndentPlainTextEdit(QPlainTextEdit):
         self.document().contentsChanged.connect(self._handle_contents_changed)
         self.is_modified = False
         self.syntax_highlighter = None
+        # Set while a FileLoader streams the file into the editor
+        self.loader = None
+        # Set while a FileSaver writes the file
+        self.saver = None
+        # Set while a FileReloader rereads the file after it changed on disk
+        self.reloader = None
+        # Set while a Replacer works out a Replace All
+        self.replacer = None
+        # Line to go to once the loader gets there
+        self.pending_line = None
+        # Keep the highlighter informed about what is on screen
+        self.verticalScrollBar().valueChanged.connect(self._update_highlight_viewport)
+        self.blockCountChanged.connect(self._handle_block_count_changed)
         self.file_path = None  # مسار الملف المرتبط بهذا المحرر
+        # How the file is stored on disk; saving keeps it
+        self.file_format = FileFormat()
+        # Recovery journal of the text, set by the main window
+        self.journal = None
+        self.document().contentsChange.connect(self._journal_change)
+        # Recent searches of the text, patched through its edits
+        self.search_cache = SearchCache()
+        self.document().contentsChange.connect(self.search_cache.edit)
+        # Long journals are compacted once typing pauses
+        self.journal_timer = QTimer(self)
+        self.journal_timer.setSingleShot(True)
+        self.journal_timer.setInterval(JOURNAL_IDLE_MS)
+        self.journal_timer.timeout.connect(self.compact_journal)
 
         # Mapping of opening brackets to their closing counterparts
         self.bracket_pairs = {
@@ -1691,16 +794,17 @@ class AutoIndentPlainTextEdit(QPlainTextEdit):
 
     def can_paste(self):
         """التحقق إذا كان اللصق متاحًا"""
-        clipboard = QApplication.clipboard()
-        return clipboard.mimeData().hasText() and not self.isReadOnly()
+        # mimeData() is None on platforms without a clipboard, e.g. offscreen
+        mime_data = QApplication.clipboard().mimeData()
+        return mime_data is not None and mime_data.hasText() and not self.isReadOnly()
 
     def isUndoAvailable(self):
         """التحقق إذا كان التراجع متاحًا"""
-        return self.document().isUndoAvailable()
+        return self.document().isUndoAvailable() and not self.isReadOnly()
 
     def isRedoAvailable(self):
         """التحقق إذا كان الإعادة متاحًا"""
-        return self.document().isRedoAvailable()
+        return self.document().isRedoAvailable() and not self.isReadOnly()
 
     def contextMenuEvent(self, event):
         """تجاوز حدث قائمة السياق لعرض القائمة المخصصة"""
@@ -1737,32 +841,186 @@ class AutoIndentPlainTextEdit(QPlainTextEdit):
         """
         Internal handler to mark the document as modified and emit the signal.
         """
+        # Text appended by a loader is not a modification, and highlighting
+        # emits contentsChanged without setting the document's modified flag
+        if self.loader or not self.document().isModified():
+            return
         if not self.is_modified:
             self.is_modified = True
             self.modified_state_changed.emit()
 
+    def _journal_change(self, position, removed, added):
+        """Logs an edit to the recovery journal; text appended by a loader is already on disk."""
+        if self.journal is None or self.loader:
+            return
+        text = ''
+        if added:
+            document = self.document()
+            cursor = QTextCursor(document)
+            cursor.setPosition(position)
+            # Changes of the whole text count the end of the last block too
+            cursor.setPosition(min(position + added, document.characterCount() - 1), QTextCursor.KeepAnchor)
+            text = cursor.selectedText().replace('\u2029', '\n')
+        self.journal.record(position, removed, text)
+        if self.journal.needs_compaction:
+            self.journal_timer.start()
+
+    def raw_text(self):
+        """Returns the text with '\\n' between blocks and, unlike toPlainText(), nothing else replaced."""
+        return self.document().toRawText().replace('\u2029', '\n')
+
+    def compact_journal(self):
+        """Starts the recovery journal over from a snapshot of the text."""
+        if self.journal:
+            self.journal.snapshot(self.raw_text())
+
+    def begin_loading(self, loader):
+        """Makes the editor read-only while a loader appends the file to it."""
+        self.loader = loader
+        self.setReadOnly(True)
+        # Appending in chunks should not fill the undo stack
+        self.document().setUndoRedoEnabled(False)
+        # nor drag the cursor along to the end of the text
+        self.set_keep_cursor_position(True)
+
+    def end_loading(self):
+        """Makes the editor editable again once loading is over."""
+        self.loader = None
+        self.document().setUndoRedoEnabled(True)
+        self.set_keep_cursor_position(False)
+        self.setReadOnly(False)
+        if self.pending_line:
+            self.go_to_line(self.pending_line)
+
+    def set_keep_cursor_position(self, keep):
+        cursor = self.textCursor()
+        cursor.setKeepPositionOnInsert(keep)
+        if not keep:
+            # Only the position stays, the anchor moved along and would
+            # select the whole text
+            cursor.clearSelection()
+        self.setTextCursor(cursor)
+
+    def line_count(self):
+        """Returns the number of lines, known from the line index before loading finishes."""
+        if self.loader:
+            return max(self.blockCount(), self.loader.line_index.line_count)
+        return self.blockCount()
+
+    def go_to_line(self, number):
+        """Moves the cursor to a line, or to where it will be once it has been loaded."""
+        if number > self.blockCount() and self.loader:
+            self.pending_line = number
+            return
+        self.pending_line = None
+        block = self.document().findBlockByNumber(min(number, self.blockCount()) - 1)
+        self.setTextCursor(QTextCursor(block))
+        self.centerCursor()
+
+    def restore_position(self, line, column, scroll):
+        """Puts the cursor and the scroll bar back where a session left them."""
+        if self.loader:
+            # Only the line can be waited for
+            self.go_to_line(line + 1)
+            return
+        block = self.document().findBlockByNumber(min(line, self.blockCount() - 1))
+        cursor = QTextCursor(block)
+        cursor.setPosition(block.position() + min(column, block.length() - 1))
+        self.setTextCursor(cursor)
+        self.verticalScrollBar().setValue(scroll)
+
+    def replace_range(self, start, end, text):
+        """
+        Replaces the text from start to end in one edit, so it is a single
+        undo step and only that stretch is laid out and highlighted again.
+        The cursor is moved along by QTextDocument like any other.
+        """
+        cursor = QTextCursor(self.document())
+        cursor.beginEditBlock()
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        cursor.insertText(text)
+        cursor.endEditBlock()
+
     def mark_as_saved(self):
         """
         Marks the document as not modified.
         """
+        self.document().setModified(False)
         self.is_modified = False
         self.modified_state_changed.emit()
 
-    def set_highlighter(self, highlighter_class):
+    def mark_as_modified(self):
+        """Marks the document as having unsaved changes."""
+        self.document().setModified(True)
+        self.is_modified = True
+        self.modified_state_changed.emit()
+
+    def estimated_memory(self):
+        """Returns roughly how many bytes the document, its layout and formats take."""
+        document = self.document()
+        return document.characterCount() * EDITOR_BYTES_PER_CHAR + document.blockCount() * EDITOR_BYTES_PER_BLOCK
+
+    def set_highlighter(self, highlighter_factory):
         """Sets a new syntax highlighter for the document."""
         if self.syntax_highlighter:
+            self.syntax_highlighter.stop_background_highlighting()
             self.syntax_highlighter.setDocument(None)
         
-        if highlighter_class:
-            self.syntax_highlighter = highlighter_class(self.document())
+        if highlighter_factory:
+            self.syntax_highlighter = highlighter_factory(self.document())
+            # Very large documents are only highlighted around the viewport,
+            # large ones are tokenized off the GUI thread
+            if self.blockCount() >= LAZY_HIGHLIGHT_MIN_BLOCKS:
+                self.syntax_highlighter.set_lazy_highlighting(True)
+            self._update_highlight_viewport()
+            if BACKGROUND_HIGHLIGHT_MIN_BLOCKS <= self.blockCount() < LAZY_HIGHLIGHT_MIN_BLOCKS:
+                self.syntax_highlighter.start_background_highlighting()
         else:
             self.syntax_highlighter = None
 
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_highlight_viewport()
+
+    def visible_block_range(self):
+        """Returns the first and last block numbers shown in the viewport."""
+        first = self.firstVisibleBlock().blockNumber()
+        line_height = max(1, self.fontMetrics().height())
+        return first, first + self.viewport().height() // line_height + 1
+
+    def visible_text_range(self):
+        """Returns the positions where the blocks shown in the viewport start and end."""
+        document = self.document()
+        first, last = self.visible_block_range()
+        last_block = document.findBlockByNumber(last)
+        if not last_block.isValid():
+            last_block = document.lastBlock()
+        return document.findBlockByNumber(first).position(), last_block.position() + last_block.length()
+
+    def _update_highlight_viewport(self, *args):
+        """Passes the visible block range on to the syntax highlighter."""
+        if self.syntax_highlighter:
+            self.syntax_highlighter.set_visible_blocks(*self.visible_block_range())
+
+    def _handle_block_count_changed(self, *args):
+        """Keeps lazy highlighting in step when lines are added or removed."""
+        if self.pending_line and (self.pending_line <= self.blockCount() or not self.loader):
+            self.go_to_line(self.pending_line)
+        # A background job restarts itself from the edited block
+        if self.syntax_highlighter and self.syntax_highlighter.lazy_blocks is not None:
+            self._update_highlight_viewport()
+
     def keyPressEvent(self, event):
         """
         Overrides the key press event to handle auto-indentation on 'Enter'
         and convert tabs to 4 spaces.
         """
+        # Loading or saving, only let the default handler move the cursor
+        if self.isReadOnly():
+            super().keyPressEvent(event)
+            return
+
         # Handle Shift+Tab for unindentation - يجب التحقق من هذا أولاً
         if event.key() == Qt.Key_Backtab:  # Key_Backtab هو Shift+Tab
             cursor = self.textCursor()
@@ -1985,6 +1243,9 @@ class FindWidget(QWidget):
             QPushButton:pressed {
                 background-color: #444444;
             }
+            QPushButton:checked {
+                background-color: #094771;
+            }
             QLabel {
                 color: #d4d4d4;
             }
@@ -1996,17 +1257,35 @@ class FindWidget(QWidget):
                 background-color: #E81123;
                 border-radius: 3px;
             }
+            #replace_row {
+                border: none;
+            }
         """)
 
-        layout = QHBoxLayout(self)
+        layout = QVBoxLayout(self)
         layout.setContentsMargins(10, 5, 10, 5)
-        layout.setSpacing(6)
+        layout.setSpacing(4)
+        find_row = QHBoxLayout()
+        find_row.setSpacing(6)
 
         # Search input
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Search...")
         self.search_input.setMinimumWidth(200)
 
+        # Search options
+        self.case_button = QPushButton("Aa")
+        self.case_button.setToolTip("Match case")
+        self.case_button.setCheckable(True)
+
+        self.word_button = QPushButton("ab")
+        self.word_button.setToolTip("Match whole word")
+        self.word_button.setCheckable(True)
+
+        self.regex_button = QPushButton(".*")
+        self.regex_button.setToolTip("Use regular expression")
+        self.regex_button.setCheckable(True)
+
         # Search buttons with clear text
         self.prev_button = QPushButton("<")
         self.prev_button.setToolTip("Previous match")
@@ -2017,20 +1296,151 @@ class FindWidget(QWidget):
         # Results counter
         self.results_label = QLabel("0/0")
 
-        # Close button with clear 'X' text
-        self.close_button = QPushButton("X")
-        self.close_button.setObjectName("close_button")
-        self.close_button.setToolTip("Close Find")
+        # Close button with clear 'X' text
+        self.close_button = QPushButton("X")
+        self.close_button.setObjectName("close_button")
+        self.close_button.setToolTip("Close Find")
+
+        # Small adjustment for the 'X' button size
+        self.close_button.setFixedSize(24, 24)
+
+        find_row.addStretch(1)
+        find_row.addWidget(self.search_input)
+        find_row.addWidget(self.case_button)
+        find_row.addWidget(self.word_button)
+        find_row.addWidget(self.regex_button)
+        find_row.addWidget(self.results_label)
+        find_row.addWidget(self.prev_button)
+        find_row.addWidget(self.next_button)
+        find_row.addWidget(self.close_button)
+        layout.addLayout(find_row)
+
+        # Replace row, only shown for Replace
+        self.replace_row = QWidget()
+        self.replace_row.setObjectName("replace_row")
+        replace_layout = QHBoxLayout(self.replace_row)
+        replace_layout.setContentsMargins(0, 0, 0, 0)
+        replace_layout.setSpacing(6)
+
+        self.replace_input = QLineEdit()
+        self.replace_input.setPlaceholderText("Replace...")
+        self.replace_input.setMinimumWidth(200)
+        self.replace_input.setToolTip("With a regular expression, \\1 or \\g<name> inserts a group")
+
+        self.replace_button = QPushButton("Replace")
+        self.replace_button.setToolTip("Replace this match")
+
+        self.replace_all_button = QPushButton("All")
+        self.replace_all_button.setToolTip("Replace all matches")
+
+        replace_layout.addStretch(1)
+        replace_layout.addWidget(self.replace_input)
+        replace_layout.addWidget(self.replace_button)
+        replace_layout.addWidget(self.replace_all_button)
+        self.replace_row.hide()
+        layout.addWidget(self.replace_row)
+
+    def options(self):
+        """Returns the search options as keyword arguments for compile_query()."""
+        return {'case_sensitive': self.case_button.isChecked(),
+                'whole_word': self.word_button.isChecked(),
+                'regex': self.regex_button.isChecked()}
+
+
+class Replacer(QObject):
+    """
+    Replaces every match of a pattern in an editor with a ReplaceJob.
+
+    The new text is worked out from a snapshot on a worker thread; the
+    editor is read-only meanwhile, so the snapshot stays valid. The stretch
+    from the first match to the last is then replaced in one edit: a single
+    undo step, laid out and highlighted once rather than once per match.
+    """
+    finished = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, editor, text, pattern, template, regex=False, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.job = ReplaceJob(text, pattern, template, regex)
+        # Edits made anyway, by a reload say, would be lost
+        self.version = editor.search_cache.version
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.check)
+
+    def start(self):
+        self.editor.replacer = self
+        self.editor.setReadOnly(True)
+        self.job.start()
+        self.timer.start(SEARCH_POLL_MS)
+
+    def cancel(self):
+        """Stop waiting for the job and leave the editor as it is."""
+        self.job.cancel()
+        self.timer.stop()
+        self.editor.replacer = None
+        self.editor.setReadOnly(False)
+
+    def check(self):
+        if not self.job.finished:
+            return
+        self.cancel()
+        if self.job.error:
+            self.failed.emit(str(self.job.error))
+            return
+        if self.editor.search_cache.version != self.version:
+            self.failed.emit("the text changed meanwhile")
+            return
+        if self.job.replacement is not None:
+            self.editor.replace_range(self.job.first, self.job.last, self.job.replacement)
+        self.finished.emit(self.job.count)
+
 
-        # Small adjustment for the 'X' button size
-        self.close_button.setFixedSize(24, 24)
+class Searcher(QObject):
+    """
+    Searches a snapshot of an editor's text with a SearchJob.
+
+    The job runs on a worker thread; its matches are picked up every
+    SEARCH_POLL_MS and reported in batches, in document order, as they come
+    in. Starting a new search cancels the one still running, so a query
+    that was typed over costs nothing more once its window is searched.
+    """
+    found = pyqtSignal(object)
+    finished = pyqtSignal()
 
-        layout.addStretch(1)
-        layout.addWidget(self.search_input)
-        layout.addWidget(self.results_label)
-        layout.addWidget(self.prev_button)
-        layout.addWidget(self.next_button)
-        layout.addWidget(self.close_button)
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.job = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.check)
+
+    @property
+    def running(self):
+        return self.job is not None
+
+    def start(self, text, pattern, base=None, verify=False):
+        self.cancel()
+        self.job = SearchJob(text, pattern, base, verify)
+        self.job.start()
+        self.timer.start(SEARCH_POLL_MS)
+
+    def cancel(self):
+        """Stop the running search; nothing more is reported for it."""
+        if self.job:
+            self.job.cancel()
+            self.job = None
+        self.timer.stop()
+
+    def check(self):
+        # Everything is queued once the job is finished
+        finished = self.job.finished
+        matches = self.job.take_results()
+        if finished:
+            self.cancel()
+        if matches:
+            self.found.emit(matches)
+        if finished:
+            self.finished.emit()
 
 
 # ------------------ Custom Tab Widget ------------------ #
@@ -2080,7 +1490,7 @@ class CustomTabWidget(QTabWidget):
                 background-color: #252526;
             }
         """)
-        self.setTabsClosable(True)
+        self.setTabsClosable(False)
         self.setMovable(True)
         self.tabCloseRequested.connect(self.close_tab)
 
@@ -2106,7 +1516,10 @@ class CustomTabWidget(QTabWidget):
         super().mousePressEvent(event)
 
     def addTab(self, widget, label):
-        index = super().addTab(widget, label)
+        return self.insertTab(-1, widget, label)
+
+    def insertTab(self, index, widget, label):
+        index = super().insertTab(index, widget, label)
         close_button = QPushButton("✕")
         close_button.setFixedSize(20, 20)
         close_button.setStyleSheet("""
@@ -2130,18 +1543,45 @@ class CustomTabWidget(QTabWidget):
     def close_tab(self, index):
         """Handles closing a tab, with a check for unsaved changes."""
         widget = self.widget(index)
-        editor = widget.editor if widget else None
-
-        if editor and editor.is_modified:
+        if isinstance(widget, PlaceholderTab) and widget.buffer is not None:
+            # Hibernated with unsaved changes, bring the text back to ask about it
+            self.setCurrentIndex(index)
+            widget = self.widget(index)
+        # Viewer tabs have no editor
+        editor = getattr(widget, 'editor', None)
+
+        if editor and editor.loader:
+            # Still loading, nothing to save
+            editor.loader.cancel()
+            self.parent.update_load_progress()
+        elif editor and editor.is_modified:
             response = QMessageBox.warning(self.parent, "Unsaved Changes",
                                            f"File '{self.tabText(index).strip('*')}' has been modified.\nDo you want to save your changes?",
                                            QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel)
             if response == QMessageBox.Cancel:
                 return  # Don't close the tab
             elif response == QMessageBox.Save:
-                self.parent.save_file(index)
+                self.parent.save_file(index, wait=True)
+
+        if editor and editor.saver:
+            # Let a running save finish before the editor goes away
+            editor.saver.wait()
+        if editor and editor.reloader:
+            editor.reloader.cancel()
+        if editor and editor.replacer:
+            editor.replacer.cancel()
+        if editor and editor.journal:
+            # Saved or discarded, there is nothing left to recover
+            editor.journal.discard()
+
+        if isinstance(widget, MappedFileViewer):
+            widget.close_file()
 
         if widget:
+            document = self.parent.documents.get(widget)
+            self.parent.documents.remove(document)
+            if document.path:
+                self.parent.watcher.unwatch(document.path)
             self.removeTab(index)
             widget.deleteLater()
             # Check if this was the last tab
@@ -2149,6 +1589,201 @@ class CustomTabWidget(QTabWidget):
                 self.parent.status_bar.hide()
 
 
+# ------------------ File Loading ------------------ #
+# The file task classes for PyQt5
+FILE_TASKS = file_tasks(QtCore, QtGui)
+
+
+class FileLoader(FILE_TASKS.FileLoader):
+    """Streams a file into an AutoIndentPlainTextEdit, see file_tasks.FileLoader."""
+    def __init__(self, editor, path, parent=None):
+        super().__init__(editor, path, editor.file_format, parent)
+
+    def begin_loading(self):
+        self.editor.begin_loading(self)
+
+    def end_loading(self):
+        self.editor.end_loading()
+
+
+class FileOpener(QObject):
+    """
+    Opens several files at once from an OpenBatchJob.
+
+    The files are read on the job's thread pool; opened is emitted on the
+    GUI thread for each one as it comes in and finished once all are done.
+    """
+    opened = pyqtSignal(int, str, object)
+    failed = pyqtSignal(str, str)
+    finished = pyqtSignal()
+
+    def __init__(self, paths, parent=None):
+        super().__init__(parent)
+        self.job = OpenBatchJob(paths)
+        # Numbers of the files with a tab so far
+        self.placed = []
+        # Tab shown instead of the first new one, when the first file was already open
+        self.first = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.check)
+
+    def start(self):
+        self.job.start()
+        self.timer.start(10)
+
+    def check(self):
+        for number, path, result, error in self.job.take_results():
+            if error:
+                self.failed.emit(path, str(error))
+            else:
+                self.opened.emit(number, path, result)
+        if self.job.done:
+            self.timer.stop()
+            self.finished.emit()
+
+
+# ------------------ File Saving ------------------ #
+FileSaver = FILE_TASKS.FileSaver
+
+
+# ------------------ File Watching ------------------ #
+FileReloader = FILE_TASKS.FileReloader
+FileWatcher = FILE_TASKS.FileWatcher
+
+
+# ------------------ Memory-Mapped Viewer ------------------ #
+class MappedFileViewer(QAbstractScrollArea):
+    """
+    Read-only view of a MappedFile, for files too large to load into an editor.
+
+    Only the lines in the viewport are decoded and painted. The vertical
+    scroll bar counts lines, so scrolling seeks by line offset.
+    """
+    def __init__(self, mapped, parent=None):
+        super().__init__(parent)
+        self.mapped = mapped
+        self.file_path = mapped.path
+        self.longest_line = 0
+        # First line to show once the index gets there
+        self.pending_scroll = None
+        self.setFont(QFont("Cascadia Code", 10))
+        self.setFocusPolicy(Qt.StrongFocus)
+
+        # Follow the line count while the file is being indexed
+        self.index_timer = QTimer(self)
+        self.index_timer.timeout.connect(self.update_scroll_range)
+        self.index_timer.start(100)
+        self.update_scroll_range()
+
+    def close_file(self):
+        self.index_timer.stop()
+        self.mapped.close()
+
+    def first_visible_line(self):
+        return self.verticalScrollBar().value()
+
+    def go_to_line(self, number):
+        """Scrolls a line to the middle of the view."""
+        self.verticalScrollBar().setValue(number - 1 - self.visible_line_count() // 2)
+
+    def scroll_to(self, first):
+        """Shows line first at the top, once it has been indexed."""
+        self.pending_scroll = first
+        self.update_scroll_range()
+
+    def visible_line_count(self):
+        return max(1, self.viewport().height() // self.fontMetrics().height())
+
+    def line_number_area_width(self):
+        # نفس حساب عرض منطقة الأرقام في المحرر
+        return 10 + self.fontMetrics().horizontalAdvance('9') * len(str(self.mapped.line_count))
+
+    def update_scroll_range(self):
+        """Updates the scroll bars to the lines indexed and the longest line seen so far."""
+        if self.mapped.indexed:
+            self.index_timer.stop()
+        page = self.visible_line_count()
+        self.verticalScrollBar().setRange(0, max(0, self.mapped.line_count - page))
+        self.verticalScrollBar().setPageStep(page)
+        if self.pending_scroll is not None and (self.pending_scroll < self.mapped.line_count or self.mapped.indexed):
+            self.verticalScrollBar().setValue(self.pending_scroll)
+            self.pending_scroll = None
+        text_width = self.viewport().width() - self.line_number_area_width()
+        content_width = self.longest_line * self.fontMetrics().horizontalAdvance('9') + 10
+        self.horizontalScrollBar().setRange(0, max(0, content_width - text_width))
+        self.horizontalScrollBar().setPageStep(text_width)
+        self.viewport().update()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_scroll_range()
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    def keyPressEvent(self, event):
+        if event.modifiers() & Qt.ControlModifier and event.key() == Qt.Key_Home:
+            self.verticalScrollBar().setValue(0)
+        elif event.modifiers() & Qt.ControlModifier and event.key() == Qt.Key_End:
+            self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+        else:
+            super().keyPressEvent(event)
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.fillRect(event.rect(), QColor("#1e1e1e"))
+
+        font_metrics = self.fontMetrics()
+        line_height = font_metrics.height()
+        first = self.first_visible_line()
+        lines = self.mapped.lines(first, self.visible_line_count() + 1)
+        gutter = self.line_number_area_width()
+        height = self.viewport().height()
+
+        # النص
+        longest_line = self.longest_line
+        painter.setClipRect(gutter, 0, self.viewport().width() - gutter, height)
+        painter.setPen(QColor("#d4d4d4"))
+        x = gutter + 5 - self.horizontalScrollBar().value()
+        for i, text in enumerate(lines):
+            text = text.expandtabs(4)
+            longest_line = max(longest_line, len(text))
+            painter.drawText(x, i * line_height + font_metrics.ascent(), text)
+
+        # أرقام الأسطر
+        painter.setClipping(False)
+        painter.fillRect(0, 0, gutter, height, QColor("#252526"))
+        painter.setPen(QColor("#858585"))
+        for i in range(len(lines)):
+            painter.drawText(0, i * line_height, gutter - 5, line_height,
+                             Qt.AlignRight | Qt.AlignVCenter, str(first + i + 1))
+        painter.end()
+
+        if longest_line != self.longest_line:
+            self.longest_line = longest_line
+            self.update_scroll_range()
+
+
+# ------------------ Session ------------------ #
+class PlaceholderTab(QWidget):
+    """
+    Stand-in for a tab restored from the last session or hibernated.
+
+    It only holds the saved state of the tab; the file is opened, and the
+    EditorWidget or viewer created, when the tab is next shown. A hibernated
+    tab with unsaved changes keeps its text zlib-compressed in buffer, with
+    the file_format to save it in.
+    """
+    def __init__(self, state, parent=None, buffer=None, file_format=None):
+        super().__init__(parent)
+        self.state = state
+        self.file_path = state['path']
+        self.buffer = buffer
+        self.file_format = file_format
+        # Recovery journal of the text in buffer
+        self.journal = None
+
+
 # ------------------ Main Editor ------------------ #
 class CodeEditor(QMainWindow):
     """
@@ -2173,6 +1808,14 @@ class CodeEditor(QMainWindow):
 
         # Custom tab widget to hold multiple editors with double-click functionality
         self.tab_widget = CustomTabWidget(self)
+        # The open files, looked up without walking the tabs
+        self.documents = DocumentRegistry()
+        # Keeps unsaved text on disk in case the editor crashes
+        self.recovery = RecoveryJournal()
+        self.recovery.start()
+        # Reloads the open files when other programs change them
+        self.watcher = FileWatcher(self)
+        self.watcher.changed.connect(self.reload_changed_file)
         self.find_widget = FindWidget(self)
         self.find_widget.hide()
 
@@ -2186,8 +1829,21 @@ class CodeEditor(QMainWindow):
         self.status_bar.setStyleSheet("QStatusBar { background-color: #333333; color: #ffffff; }")
         self.cursor_label = QLabel("Line: 1, Col: 1")
         self.status_label = QLabel("Saved")
+        self.format_label = QLabel("")
         self.status_bar.addPermanentWidget(self.status_label, 1)
         self.status_bar.addPermanentWidget(self.cursor_label)
+        self.status_bar.addPermanentWidget(self.format_label)
+        # Progress of files being loaded in the background
+        self.load_progress = QProgressBar()
+        self.load_progress.setMaximumWidth(150)
+        self.load_progress.setRange(0, 100)
+        self.load_progress.hide()
+        self.cancel_load_button = QPushButton("Cancel")
+        self.cancel_load_button.clicked.connect(self.cancel_loading)
+        self.cancel_load_button.hide()
+        self.status_bar.addPermanentWidget(self.load_progress)
+        self.status_bar.addPermanentWidget(self.cancel_load_button)
+        self.loaders = []
         self.status_bar.hide()  # Initially hide the status bar
 
         # Toolbar - غير قابل للإخفاء
@@ -2244,54 +1900,63 @@ class CodeEditor(QMainWindow):
         find_action.setShortcut(QKeySequence("Ctrl+F"))
         toolbar.addAction(find_action)
 
+        replace_action = QAction("Replace", self)
+        replace_action.triggered.connect(self.show_replace_widget)
+        replace_action.setShortcut(QKeySequence("Ctrl+H"))
+        toolbar.addAction(replace_action)
+
+        go_to_line_action = QAction("Go to Line", self)
+        go_to_line_action.triggered.connect(self.show_go_to_line)
+        go_to_line_action.setShortcut(QKeySequence("Ctrl+G"))
+        toolbar.addAction(go_to_line_action)
+
         # Connect find widget signals
         self.find_widget.search_input.textChanged.connect(self.find_text)
         self.find_widget.search_input.returnPressed.connect(lambda: self.find_next())
         self.find_widget.next_button.clicked.connect(self.find_next)
         self.find_widget.prev_button.clicked.connect(self.find_previous)
         self.find_widget.close_button.clicked.connect(self.hide_find_widget)
+        for button in (self.find_widget.case_button, self.find_widget.word_button, self.find_widget.regex_button):
+            button.toggled.connect(lambda: self.find_text(self.find_widget.search_input.text()))
+        self.find_widget.replace_input.returnPressed.connect(self.replace_current)
+        self.find_widget.replace_button.clicked.connect(self.replace_current)
+        self.find_widget.replace_all_button.clicked.connect(self.replace_all)
 
         # Enable drag and drop
         self.setAcceptDrops(True)
 
-        # Search state variables
-        self.search_results = []
+        # Search state variables: start and end offsets of the matches, sorted
+        self.search_starts = array.array('q')
+        self.search_ends = array.array('q')
         self.current_search_index = -1
         self.last_search_text = ""
+        # Step asked for with find_next()/find_previous() before the first match came in
+        self.pending_search_step = 0
+        # Position to go to the first match from, once the search gets there
+        self.pending_search_from = None
+        # (editor, revision, text) of the last text searched, reused while the document is unchanged
+        self.search_snapshot = None
+        # (editor, query, options, cache version) of the running search, to cache its results
+        self.search_origin = None
+        self.searcher = Searcher(self)
+        self.searcher.found.connect(self.add_search_results)
+        self.searcher.finished.connect(self.finish_searching)
+
+        # Tabs of the last session
+        restored = self.restore_session()
 
-        # Initial file
-        self.new_file()
-        
         # Connect tab change signal
         self.tab_widget.currentChanged.connect(self.on_tab_changed)
 
-        # Map file extensions to highlighter classes
-        self.highlighters = {
-            '.py': PythonHighlighter,
-            '.js': JavaScriptHighlighter,
-            '.ts': TypeScriptHighlighter,
-            '.cpp': CppHighlighter,
-            '.h': CppHighlighter, 
-            '.html': HtmlHighlighter,
-            '.htm': HtmlHighlighter,
-            '.css': CssHighlighter,
-            '.json': JsonHighlighter,
-            '.sh': BashHighlighter,
-            '.bash': BashHighlighter,
-            '.md': MarkdownHighlighter,
-            '.xml': XmlHighlighter,
-            '.java': JavaHighlighter,
-            '.rb': RubyHighlighter,
-            '.php': PhpHighlighter,
-            '.sql': SqlHighlighter,
-            '.swift': SwiftHighlighter,
-            '.go': GoHighlighter,
-            '.cs': CsharpHighlighter,
-            '.rs': RustHighlighter,
-            '.kt': KotlinHighlighter,
-            '.yml': YamlHighlighter,
-            '.yaml': YamlHighlighter,
-        }
+        # Map file extensions to highlighter factories
+        self.highlighters = LANGUAGES.highlighter_factories()
+
+        # Unsaved text of an editor that crashed, or an empty file
+        if not self.recover_buffers() and not restored:
+            self.new_file()
+
+        # Load the restored tab that is shown
+        self.on_tab_changed(self.tab_widget.currentIndex())
 
     # --- Search Feature ---
     def show_find_widget(self):
@@ -2300,9 +1965,17 @@ class CodeEditor(QMainWindow):
         self.find_widget.search_input.setFocus()
         self.find_widget.search_input.selectAll()
 
+    def show_replace_widget(self):
+        """Shows the find widget with its replace row."""
+        self.find_widget.replace_row.show()
+        self.show_find_widget()
+
     def hide_find_widget(self):
         """Hides the find widget and clears the last search query."""
         self.find_widget.hide()
+        self.find_widget.replace_row.hide()
+        self.reset_search()
+        self.search_snapshot = None
         self.clear_search_highlights()
 
     def clear_search_highlights(self):
@@ -2314,79 +1987,165 @@ class CodeEditor(QMainWindow):
             # Restore current line highlight
             self.highlight_current_line()
 
-    def find_all_occurrences(self, text):
-        """Find all occurrences of text in the document."""
-        current_editor = self.get_current_editor()
-        if not current_editor or not text:
-            return []
-
-        cursor = current_editor.textCursor()
-        cursor.movePosition(QTextCursor.Start)
-
-        occurrences = []
-        while True:
-            cursor = current_editor.document().find(text, cursor)
-            if cursor.isNull():
-                break
-            occurrences.append((cursor.selectionStart(), cursor.selectionEnd()))
-
-        return occurrences
+    def reset_search(self):
+        """Stops the running search, keeping what it found in the cache, and forgets its results."""
+        self.cache_search()
+        self.searcher.cancel()
+        self.last_search_text = ""
+        self.current_search_index = -1
+        self.pending_search_step = 0
+        self.pending_search_from = None
+        self.search_starts = array.array('q')
+        self.search_ends = array.array('q')
+        self.find_widget.results_label.setText("0/0")
+        self.find_widget.results_label.setToolTip("")
 
-    def highlight_search_results(self, occurrences):
-        """Highlight all search results in the editor."""
+    def highlight_search_results(self):
+        """
+        Highlights the search results shown in the current editor. Only the
+        matches in the visible blocks get a selection, found by bisecting
+        the sorted offsets, so the cost does not grow with the number of
+        matches; scrolling calls this again.
+        """
         current_editor = self.get_current_editor()
         if not current_editor:
             return
 
+        document = current_editor.document()
+        # Results of a search over older text may run past its end
+        end_position = document.characterCount() - 1
+        top, bottom = current_editor.visible_text_range()
+        # Matches ending in or after the visible blocks, and starting before their end
+        begin = bisect.bisect_right(self.search_ends, top)
+        stop = bisect.bisect_left(self.search_starts, min(bottom, end_position), begin)
+
         extra_selections = []
 
-        # Highlight all occurrences
-        for start, end in occurrences:
-            cursor = QTextCursor(current_editor.document())
-            cursor.setPosition(start)
-            cursor.setPosition(end, QTextCursor.KeepAnchor)
+        # Highlight the visible occurrences
+        for index in range(begin, stop):
+            cursor = QTextCursor(document)
+            cursor.setPosition(self.search_starts[index])
+            cursor.setPosition(min(self.search_ends[index], end_position), QTextCursor.KeepAnchor)
 
             selection = QTextEdit.ExtraSelection()
-            selection.format.setBackground(QColor("#36454F"))  # Dark blue-gray
+            # Current occurrence in bright blue, the others in dark blue-gray
+            selection.format.setBackground(QColor("#569CD6" if index == self.current_search_index else "#36454F"))
             selection.format.setForeground(QColor("#FFFFFF"))
             selection.cursor = cursor
             extra_selections.append(selection)
 
-        # Highlight current occurrence
-        if 0 <= self.current_search_index < len(occurrences):
-            start, end = occurrences[self.current_search_index]
-            cursor = QTextCursor(current_editor.document())
-            cursor.setPosition(start)
-            cursor.setPosition(end, QTextCursor.KeepAnchor)
+        current_editor.setExtraSelections(extra_selections)
 
-            selection = QTextEdit.ExtraSelection()
-            selection.format.setBackground(QColor("#569CD6"))  # Bright blue
-            selection.format.setForeground(QColor("#FFFFFF"))
-            selection.cursor = cursor
-            extra_selections.append(selection)
+    def refresh_search_highlights(self):
+        """Highlights the matches that scrolled into view."""
+        current_editor = self.get_current_editor()
+        if current_editor and len(self.search_starts) and self.sender() is current_editor.verticalScrollBar():
+            self.highlight_search_results()
 
-        current_editor.setExtraSelections(extra_selections)
+    def update_search_label(self):
+        """Shows the current match and the number found so far, with a '+' while still searching."""
+        total = len(self.search_starts)
+        more = "+" if self.searcher.running else ""
+        self.find_widget.results_label.setText(f"{self.current_search_index + 1}/{total}{more}")
 
     def find_text(self, text):
-        """Find text in the document and update highlights."""
-        if text != self.last_search_text:
-            # Reset search if text changed
-            self.search_results = self.find_all_occurrences(text)
-            self.current_search_index = -1
-            self.last_search_text = text
-
-        # Update results label
-        total = len(self.search_results)
-        if total > 0 and self.current_search_index >= 0:
-            self.find_widget.results_label.setText(f"{self.current_search_index + 1}/{total}")
-        else:
-            self.find_widget.results_label.setText(f"0/{total}")
-
-        # Highlight results
-        self.highlight_search_results(self.search_results)
+        """
+        Starts searching the current editor for text with the options of the
+        find widget. The search runs in the background over a snapshot of
+        the text, matches are highlighted as they come in.
+        """
+        self.reset_search()
+        self.last_search_text = text
+        current_editor = self.get_current_editor()
+        if current_editor and text:
+            options = self.find_widget.options()
+            try:
+                pattern = compile_query(text, **options)
+            except re.error as e:
+                self.find_widget.results_label.setText("Invalid")
+                self.find_widget.results_label.setToolTip(str(e))
+                self.highlight_search_results()
+                return
+            cache = current_editor.search_cache
+            cached = cache.get(text, options)
+            if cached and not cached.spans:
+                # Searched before, and patched through the edits since
+                self.search_starts, self.search_ends = cached.starts, cached.ends
+            else:
+                # Only search what the cache cannot tell, or narrow down the
+                # matches of a query this one starts with
+                base = cached or cache.narrowing(text, options)
+                self.search_origin = (current_editor, text, options, cache.version)
+                self.searcher.start(self.search_text(current_editor), pattern, base, verify=cached is None)
+        self.update_search_label()
+        self.highlight_search_results()
+
+    def search_text(self, editor):
+        """Returns the text of editor to search, taken once per revision of the document."""
+        revision = editor.document().revision()
+        if self.search_snapshot and self.search_snapshot[:2] == (editor, revision):
+            return self.search_snapshot[2]
+        text = editor.raw_text()
+        self.search_snapshot = (editor, revision, text)
+        return text
+
+    def cache_search(self):
+        """Keeps the matches of the running search in its editor's cache, as far as they are known to be complete."""
+        if not self.search_origin:
+            return
+        editor, query, options, version = self.search_origin
+        self.search_origin = None
+        # Matches in a text that was edited meanwhile are out of place
+        if editor.search_cache.version != version:
+            return
+        job = self.searcher.job
+        if not job:
+            editor.search_cache.put(query, options, self.search_starts, self.search_ends)
+        elif job.scanned is not None:
+            # Stopped early; matches past the last window finished are searched again
+            known = bisect.bisect_left(self.search_starts, job.scanned)
+            editor.search_cache.put(query, options, self.search_starts[:known], self.search_ends[:known], job.scanned)
+
+    def add_search_results(self, matches):
+        """Takes in a batch of matches of the running search."""
+        starts, ends = zip(*matches)
+        self.search_starts.extend(starts)
+        self.search_ends.extend(ends)
+        if self.pending_search_from is not None and self.search_starts[-1] >= self.pending_search_from:
+            self.select_search_result_from(self.pending_search_from)
+            return
+        # Going forward only needs the first match
+        if self.pending_search_step > 0:
+            self.pending_search_step = 0
+            self.step_search(1)
+            return
+        self.update_search_label()
+        # Batches past the visible blocks change nothing on screen
+        if matches[0][0] < self.get_current_editor().visible_text_range()[1]:
+            self.highlight_search_results()
+
+    def finish_searching(self):
+        """Caches the matches, and goes back to the last one if that was asked for before it was found."""
+        self.cache_search()
+        if self.pending_search_from is not None:
+            self.select_search_result_from(self.pending_search_from)
+            return
+        if self.pending_search_step < 0:
+            self.pending_search_step = 0
+            self.step_search(-1)
+            return
+        self.update_search_label()
 
     def find_next(self):
         """Find next occurrence of search text."""
+        self.step_search(1)
+
+    def find_previous(self):
+        """Find previous occurrence of search text."""
+        self.step_search(-1)
+
+    def step_search(self, step):
+        """Moves step matches forward or back, once there are matches to move to."""
         text = self.find_widget.search_input.text()
         if not text:
             return
@@ -2394,47 +2153,105 @@ class CodeEditor(QMainWindow):
         if text != self.last_search_text:
             self.find_text(text)
 
-        if not self.search_results:
+        if not self.search_starts:
+            # Move as soon as the search can tell where to
+            if self.searcher.running:
+                self.pending_search_step = step
+            return
+        # The last match is not known until the search is over
+        if self.current_search_index < 0 and step < 0 and self.searcher.running:
+            self.pending_search_step = step
             return
 
-        self.current_search_index = (self.current_search_index + 1) % len(self.search_results)
+        # Before the first move, going back starts from the last match
+        index = self.current_search_index if self.current_search_index >= 0 else (-1 if step > 0 else 0)
+        self.current_search_index = (index + step) % len(self.search_starts)
         self.navigate_to_search_result()
 
-    def find_previous(self):
-        """Find previous occurrence of search text."""
-        text = self.find_widget.search_input.text()
-        if not text:
+    def select_search_result_from(self, position):
+        """Moves to the first match at or after position, or back to the first one, once it is known."""
+        index = bisect.bisect_left(self.search_starts, position)
+        if index == len(self.search_starts) and self.searcher.running:
+            self.pending_search_from = position
             return
-
-        if text != self.last_search_text:
-            self.find_text(text)
-
-        if not self.search_results:
+        self.pending_search_from = None
+        if not self.search_starts:
+            self.update_search_label()
             return
-
-        self.current_search_index = (self.current_search_index - 1) % len(self.search_results)
+        self.current_search_index = index % len(self.search_starts)
         self.navigate_to_search_result()
 
+    def replace_current(self):
+        """Replaces the current match once it is selected, and moves on to the next one."""
+        current_editor = self.get_current_editor()
+        text = self.find_widget.search_input.text()
+        if not current_editor or not text or current_editor.isReadOnly():
+            return
+        if text != self.last_search_text or self.current_search_index < 0:
+            # The first press only selects the next match
+            self.find_next()
+            return
+        start = self.search_starts[self.current_search_index]
+        cursor = current_editor.textCursor()
+        if (cursor.selectionStart(), cursor.selectionEnd()) != (start, self.search_ends[self.current_search_index]):
+            self.select_search_result_from(cursor.selectionStart())
+            return
+        options = self.find_widget.options()
+        try:
+            replacement = expand_match(self.search_text(current_editor), compile_query(text, **options), start,
+                                       self.find_widget.replace_input.text(), options['regex'])
+        except (re.error, IndexError) as e:
+            self.status_bar.showMessage(f"Cannot replace: {e}", 5000)
+            return
+        if replacement is not None:
+            cursor.insertText(replacement)
+            start = cursor.position()
+        # The cached search is patched through the edit, so this is quick
+        self.find_text(text)
+        self.select_search_result_from(start)
+
+    def replace_all(self):
+        """Replaces every match in the current editor in the background, as one undo step."""
+        current_editor = self.get_current_editor()
+        text = self.find_widget.search_input.text()
+        if not current_editor or not text or current_editor.isReadOnly():
+            return
+        options = self.find_widget.options()
+        try:
+            pattern = compile_query(text, **options)
+        except re.error as e:
+            self.status_bar.showMessage(f"Cannot replace: {e}", 5000)
+            return
+        replacer = Replacer(current_editor, self.search_text(current_editor), pattern,
+                            self.find_widget.replace_input.text(), options['regex'], self)
+        replacer.finished.connect(lambda count: self.finish_replacing(replacer, count))
+        replacer.failed.connect(lambda message: self.status_bar.showMessage(f"Cannot replace: {message}", 5000))
+        replacer.start()
+        self.status_bar.showMessage("Replacing...")
+
+    def finish_replacing(self, replacer, count):
+        self.status_bar.showMessage(f"Replaced {count} occurrence{'s' if count != 1 else ''}", 5000)
+        if replacer.editor is self.get_current_editor():
+            self.find_text(self.find_widget.search_input.text())
+
     def navigate_to_search_result(self):
         """Navigate to the current search result."""
-        if not self.search_results or self.current_search_index < 0:
+        if not self.search_starts or self.current_search_index < 0:
             return
 
         current_editor = self.get_current_editor()
         if not current_editor:
             return
 
-        start, end = self.search_results[self.current_search_index]
         cursor = QTextCursor(current_editor.document())
-        cursor.setPosition(start)
-        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        cursor.setPosition(self.search_starts[self.current_search_index])
+        cursor.setPosition(self.search_ends[self.current_search_index], QTextCursor.KeepAnchor)
         current_editor.setTextCursor(cursor)
         current_editor.centerCursor()
 
         # Update highlights and results label
-        self.highlight_search_results(self.search_results)
-        total = len(self.search_results)
-        self.find_widget.results_label.setText(f"{self.current_search_index + 1}/{total}")
+        self.highlight_search_results()
+        self.update_search_label()
 
     # --- Drag & Drop Methods ---
     def dragEnterEvent(self, event):
@@ -2445,44 +2262,23 @@ class CodeEditor(QMainWindow):
             event.ignore()
 
     def dropEvent(self, event):
-        """Handles the drop event and opens the dropped file."""
-        for url in event.mimeData().urls():
-            file_path = url.toLocalFile()
-            if file_path:
-                self.open_file(file_path)
+        """Handles the drop event and opens the dropped files."""
+        paths = [url.toLocalFile() for url in event.mimeData().urls()]
+        self.open_files([path for path in paths if path])
         event.accept()
 
-    def _get_next_untitled_number(self):
-        """
-        Finds the lowest available number for a new 'Untitled' tab.
-        For example, if 'Untitled-1' and 'Untitled-3' exist, it returns 2.
-        """
-        used_numbers = set()
-        for i in range(self.tab_widget.count()):
-            tab_text = self.tab_widget.tabText(i).strip('*')
-            if tab_text.startswith("Untitled-"):
-                try:
-                    num = int(tab_text.split('-')[-1])
-                    used_numbers.add(num)
-                except (ValueError, IndexError):
-                    continue
-        
-        # Find the first positive integer that's not in the set
-        next_number = 1
-        while next_number in used_numbers:
-            next_number += 1
-        
-        return next_number
-
-    def new_file(self, content="", path=None):
+    def new_file(self, content="", path=None, file_format=None, index=-1, modified=False, activate=True):
         """
-        Creates a new empty tab with an editor.
+        Creates a new empty tab with an editor and returns the editor. With
+        modified, content is unsaved text rather than what is in the file at
+        path; without activate, the tab is added behind the current one.
         """
         self.status_bar.show()  # Show the status bar if it was hidden
 
         editor_widget = EditorWidget(self)
         editor = editor_widget.editor
         editor.setPlainText(content)
+        editor.file_format = file_format or FileFormat()
 
         # Use a consistent font
         font = QFont("Cascadia Code", 10)
@@ -2492,36 +2288,47 @@ class CodeEditor(QMainWindow):
         editor.setLineWrapMode(QPlainTextEdit.NoWrap)
         editor.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
 
+        document = self.documents.add(editor_widget, path)
+        tab_name = document.name
         if path:
-            tab_name = os.path.basename(path)
             # Get file extension and apply highlighter
             ext = os.path.splitext(path)[1].lower()
-            highlighter_class = self.highlighters.get(ext)
-            if highlighter_class:
-                editor.set_highlighter(highlighter_class)
+            highlighter_factory = self.highlighters.get(ext)
+            if highlighter_factory:
+                editor.set_highlighter(highlighter_factory)
             else:
                 editor.set_highlighter(None)  # Clear any existing highlighter for unknown file types
             
             # حفظ مسار الملف في المحرر نفسه
             editor.file_path = path
+            self.watcher.watch(path)
         else:
-            new_number = self._get_next_untitled_number()
-            tab_name = f"Untitled-{new_number}"
             editor.set_highlighter(None)  # No highlighter for new, untitled files
             editor.file_path = None  # لا يوجد مسار ملف بعد
+        # Text read from a file is journaled from the file, anything else from a snapshot
+        editor.journal = self.recovery.open(self.journal_meta(document, editor),
+                                            None if path and not modified else content)
 
-        tab_index = self.tab_widget.addTab(editor_widget, tab_name)
-        self.tab_widget.setCurrentIndex(tab_index)
+        tab_index = self.tab_widget.insertTab(index, editor_widget, tab_name)
+        if activate:
+            self.tab_widget.setCurrentIndex(tab_index)
 
         # Connect signals for the new tab
         editor.cursorPositionChanged.connect(self.update_status_bar)
+        editor.verticalScrollBar().valueChanged.connect(self.refresh_search_highlights)
+        editor.verticalScrollBar().rangeChanged.connect(self.refresh_search_highlights)
+        editor.modified_state_changed.connect(lambda: self.documents.set_modified(document, editor.is_modified))
         editor.modified_state_changed.connect(self.update_tab_title)
 
         # لا نحتاج إلى open_files dictionary بعد الآن
-        editor.mark_as_saved()
+        if modified:
+            editor.mark_as_modified()
+        else:
+            editor.mark_as_saved()
 
         self.highlight_current_line()
         self.update_status_bar()
+        return editor
 
     def update_tab_title(self):
         """Updates the tab title to reflect saved or modified status."""
@@ -2533,12 +2340,13 @@ class CodeEditor(QMainWindow):
         if not editor_widget:
             return
 
+        if isinstance(editor_widget, MappedFileViewer):
+            self.status_label.setText("Read-only")
+            return
+
         editor = editor_widget.editor
-        if editor.file_path:
-            base_name = os.path.basename(editor.file_path)
-        else:
-            base_name = self.tab_widget.tabText(current_index).strip('*')
-            
+        base_name = self.documents.get(editor_widget).name
+
         if editor.is_modified:
             self.tab_widget.setTabText(current_index, base_name + '*')
             self.status_label.setText("Modified")
@@ -2555,24 +2363,35 @@ class CodeEditor(QMainWindow):
             cursor = editor.textCursor()
             line = cursor.blockNumber() + 1
             col = cursor.columnNumber() + 1
-            self.cursor_label.setText(f"Line: {line}, Col: {col}")
+            self.cursor_label.setText(f"Line: {line} of {editor.line_count()}, Col: {col}")
+            self.format_label.setText(editor.file_format.describe())
+        elif isinstance(self.tab_widget.currentWidget(), MappedFileViewer):
+            viewer = self.tab_widget.currentWidget()
+            self.cursor_label.setText(f"Line: {viewer.first_visible_line() + 1} of {viewer.mapped.line_count}")
+            self.format_label.setText(viewer.mapped.file_format.describe())
 
     def on_tab_changed(self, index):
         """Handles changes in the active tab to update editor state."""
+        widget = self.tab_widget.widget(index)
+        if isinstance(widget, PlaceholderTab):
+            self.open_placeholder(index)
+            return
+        if widget:
+            self.documents.touch(self.documents.get(widget))
+            self.hibernate_tabs()
         self.highlight_current_line()
         self.update_status_bar()
         self.update_tab_title()
         # Reset search state when changing tabs
-        self.last_search_text = ""
-        self.current_search_index = -1
-        self.search_results = []
-        self.find_widget.results_label.setText("0/0")
+        self.reset_search()
+        self.search_snapshot = None
 
     def get_current_editor(self):
         """Returns the editor widget of the current tab."""
         current_widget = self.tab_widget.currentWidget()
         if current_widget:
-            return current_widget.editor
+            # Viewer tabs have no editor
+            return getattr(current_widget, 'editor', None)
         return None
 
     def highlight_current_line(self):
@@ -2591,33 +2410,208 @@ class CodeEditor(QMainWindow):
 
             editor.setExtraSelections([selection])
 
+    def show_go_to_line(self):
+        """Asks for a line number and moves the current tab to it."""
+        widget = self.tab_widget.currentWidget()
+        if not widget:
+            return
+        if isinstance(widget, MappedFileViewer):
+            view, line_count = widget, widget.mapped.line_count
+            current_line = widget.first_visible_line() + 1
+        else:
+            view, line_count = widget.editor, widget.editor.line_count()
+            current_line = widget.editor.textCursor().blockNumber() + 1
+
+        number, ok = QInputDialog.getInt(self, "Go to Line", f"Line number (1 - {line_count}):",
+                                         current_line, 1, line_count)
+        if ok:
+            view.go_to_line(number)
+            view.setFocus()
+
     # ------------------ File Actions ------------------ #
-    def open_file(self, path=None):
+    def open_file(self, path=None, index=-1):
         """
-        Opens a file in a new tab.
+        Opens a file in a new tab, at index if given.
         """
         if not path:
             path, _ = QFileDialog.getOpenFileName(self, "Open File", "", "All Files (*.*);;Python Files (*.py)")
 
         if path:
             try:
-                with open(path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                
-                # Check if the file is already open
-                for i in range(self.tab_widget.count()):
-                    editor_widget = self.tab_widget.widget(i)
-                    if editor_widget and editor_widget.editor.file_path == path:
-                        self.tab_widget.setCurrentIndex(i)
-                        return
-                
-                self.new_file(content, path)
+                # Check if the file is already open, under this or another path
+                document = self.documents.find(path)
+                if document:
+                    self.tab_widget.setCurrentIndex(self.tab_widget.indexOf(document.view))
+                    return
+
+                self.show_file(path, *read_file(path), index)
             except Exception as e:
                 QMessageBox.warning(self, "Error", f"Could not open file: {e}")
 
-    def save_file(self, index=None):
+    def show_file(self, path, file_format, size, text, index=-1, activate=True):
+        """
+        Opens a file read by file_io.read_file() in a new tab, an editor or
+        a read-only viewer depending on what it holds and how large it is.
+        """
+        name = os.path.basename(path)
+        if file_format.binary:
+            self.open_viewer(path, HexDump(path), f"{name} is a binary file, opened read-only as hex", index, activate)
+            return
+
+        # Files too large to edit are only viewed, straight from disk
+        if size >= MMAP_VIEW_MIN_BYTES:
+            if file_format.ascii_compatible:
+                self.open_viewer(path, MappedFile(path, file_format),
+                                 f"{name} is too large to edit, opened read-only", index, activate)
+            else:
+                # Lines are found by b'\n', which UTF-16 and UTF-32 do not use
+                self.open_viewer(path, HexDump(path),
+                                 f"{name} is too large to edit, opened read-only as hex", index, activate)
+            return
+
+        # Large files are streamed in without blocking the window
+        if size >= STREAM_LOAD_MIN_BYTES:
+            self.load_file(path, file_format, index, activate)
+            return
+
+        self.new_file(text, path, file_format, index, activate=activate)
+
+    def open_files(self, paths):
         """
-        Saves the content of the current tab.
+        Opens several files at once, as when they are dropped on the window or
+        given on the command line. They are read in parallel and their tabs
+        added as they come in, in the order given, with the first one shown.
+        """
+        paths = list(dict.fromkeys(paths))
+        documents = [self.documents.find(path) for path in paths]
+        batch = [path for path, document in zip(paths, documents) if not document]
+        if documents and documents[0]:
+            # The first file is already open, it stays in front
+            self.tab_widget.setCurrentWidget(documents[0].view)
+        if not batch:
+            return
+
+        opener = FileOpener(batch, self)
+        if documents[0]:
+            opener.first = documents[0].view
+        # Tabs go after the current last tab, in the order of paths
+        first_index = self.tab_widget.count()
+        errors = []
+        opener.opened.connect(lambda number, path, result: self.add_opened_file(opener, first_index, number, path, result))
+        opener.failed.connect(lambda path, message: errors.append(f"{os.path.basename(path)}: {message}"))
+        opener.finished.connect(lambda: self.finish_opening(opener, errors))
+        opener.start()
+        self.status_bar.show()
+        self.status_bar.showMessage(f"Opening {len(batch)} file(s)...")
+
+    def add_opened_file(self, opener, first_index, number, path, result):
+        """Adds the tab of a file read by a FileOpener and shows the first file of the batch."""
+        # A file given twice under different paths is only opened once
+        if self.documents.find(path):
+            return
+        index = min(first_index + bisect.bisect(opener.placed, number), self.tab_widget.count())
+        count = self.tab_widget.count()
+        # Only the first file that came in so far is brought to the front
+        activate = opener.first is None and (not opener.placed or number < opener.placed[0])
+        try:
+            self.show_file(path, *result, index, activate)
+        except Exception as e:
+            opener.failed.emit(path, str(e))
+            return
+        if self.tab_widget.count() == count:
+            return
+        bisect.insort(opener.placed, number)
+
+    def finish_opening(self, opener, errors):
+        opener.deleteLater()
+        if errors:
+            QMessageBox.warning(self, "Error", "Could not open these files:\n" + "\n".join(errors))
+        else:
+            self.status_bar.showMessage(f"Opened {len(opener.placed)} file(s)", 3000)
+
+    def open_viewer(self, path, mapped, message, index=-1, activate=True):
+        """
+        Opens a MappedFile or HexDump in a read-only viewer tab.
+        """
+        self.status_bar.show()
+        viewer = MappedFileViewer(mapped, self)
+        viewer.verticalScrollBar().valueChanged.connect(self.update_status_bar)
+        viewer.verticalScrollBar().rangeChanged.connect(self.update_status_bar)
+        self.documents.add(viewer, path)
+        self.watcher.watch(path)
+
+        tab_index = self.tab_widget.insertTab(index, viewer, os.path.basename(path))
+        if activate:
+            self.tab_widget.setCurrentIndex(tab_index)
+        mapped.start()
+        self.update_status_bar()
+        self.status_bar.showMessage(message, 5000)
+
+    def load_file(self, path, file_format, index=-1, activate=True):
+        """
+        Opens a file in a new tab and streams its content in on a worker thread.
+        """
+        editor = self.new_file("", path, file_format, index, activate=activate)
+        # Highlighting starts once the whole file is in
+        editor.set_highlighter(None)
+
+        loader = FileLoader(editor, path, self)
+        loader.progress.connect(self.update_load_progress)
+        loader.finished.connect(lambda: self.finish_loading(loader))
+        loader.failed.connect(lambda message: self.fail_loading(loader, message))
+        self.loaders.append(loader)
+        loader.start()
+        self.update_load_progress()
+        self.status_bar.showMessage(f"Loading {os.path.basename(path)}...")
+
+    def update_load_progress(self, *args):
+        """Shows the combined progress of the files being loaded."""
+        self.loaders = [loader for loader in self.loaders if loader.editor.loader is loader]
+        if not self.loaders:
+            self.load_progress.hide()
+            self.cancel_load_button.hide()
+            return
+        self.load_progress.setValue(sum(loader.percent for loader in self.loaders) // len(self.loaders))
+        self.load_progress.show()
+        self.cancel_load_button.show()
+        self.update_status_bar()
+
+    def finish_loading(self, loader):
+        """Applies the highlighter once a file has been loaded."""
+        editor = loader.editor
+        ext = os.path.splitext(loader.path)[1].lower()
+        editor.set_highlighter(self.highlighters.get(ext))
+        editor.mark_as_saved()
+        self.update_load_progress()
+        self.update_status_bar()
+        self.status_bar.showMessage(f"Loaded {os.path.basename(loader.path)}", 3000)
+        # The file may have changed while it was read
+        self.reload_changed_file(loader.path)
+
+    def fail_loading(self, loader, message):
+        """Closes the tab of a file that could not be read."""
+        self.close_loading_tab(loader)
+        QMessageBox.warning(self, "Error", f"Could not open file: {message}")
+
+    def cancel_loading(self):
+        """Cancels every running load and closes the tabs being loaded."""
+        for loader in list(self.loaders):
+            loader.cancel()
+            self.close_loading_tab(loader)
+        self.status_bar.showMessage("Loading cancelled", 3000)
+
+    def close_loading_tab(self, loader):
+        for i in range(self.tab_widget.count()):
+            editor_widget = self.tab_widget.widget(i)
+            if editor_widget and getattr(editor_widget, 'editor', None) is loader.editor:
+                self.tab_widget.close_tab(i)
+                break
+        self.update_load_progress()
+
+    def save_file(self, index=None, wait=False):
+        """
+        Saves the content of the current tab on a worker thread.
+        With wait, blocks until the file is written and returns whether it was.
         """
         # دائماً استخدام التبويب النشط الحالي، تجاهل الفهرس الممرر
         current_index = self.tab_widget.currentIndex()
@@ -2630,29 +2624,17 @@ class CodeEditor(QMainWindow):
             return False
 
         current_editor = current_widget.editor
+        if current_editor.loader or current_editor.reloader:
+            self.status_bar.showMessage("The file is still loading", 3000)
+            return False
 
         # إذا كان الملف جديداً ولم يتم حفظه من قبل، استخدم Save As
         if current_editor.file_path is None:
-            return self.save_as_file(current_index)
+            return self.save_as_file(current_index, wait)
         
-        path = current_editor.file_path
-
-        try:
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(current_editor.toPlainText())
-            current_editor.mark_as_saved()
-            
-            # تحديث عنوان التبويب
-            base_name = os.path.basename(path)
-            self.tab_widget.setTabText(current_index, base_name)
-            self.status_label.setText("Saved")
-            self.status_bar.showMessage(f"File saved successfully: {base_name}", 3000)
-            return True
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Could not save file: {e}")
-            return False
+        return self.start_saving(current_editor, current_editor.file_path, wait)
 
-    def save_as_file(self, index=None):
+    def save_as_file(self, index=None, wait=False):
         """
         Saves the content of the current tab with a new name.
         """
@@ -2667,6 +2649,9 @@ class CodeEditor(QMainWindow):
             return False
 
         current_editor = current_widget.editor
+        if current_editor.loader or current_editor.reloader:
+            self.status_bar.showMessage("The file is still loading", 3000)
+            return False
 
         # الحصول على الاسم الافتراضي للحفظ
         if current_editor.file_path:
@@ -2679,52 +2664,330 @@ class CodeEditor(QMainWindow):
         if not path:
             return False
 
-        try:
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(current_editor.toPlainText())
-            
+        return self.start_saving(current_editor, path, wait)
+
+    def start_saving(self, editor, path, wait=False):
+        """
+        Starts writing an editor's text to path; finish_saving runs once it is on disk.
+        """
+        if editor.saver:
+            # Saves of one editor are written in order
+            editor.saver.wait()
+
+        saver = FileSaver(editor, path, editor.file_format, self)
+        saver.progress.connect(lambda: self.update_save_progress(saver))
+        saver.finished.connect(lambda: self.finish_saving(saver))
+        saver.failed.connect(lambda message: self.fail_saving(saver, message))
+        saver.start()
+        if wait:
+            saver.wait()
+            return saver.job.error is None
+        return True
+
+    def finish_saving(self, saver):
+        """Marks the editor as saved and updates its tab once the file is on disk."""
+        editor = saver.editor
+        document = self.documents.get(editor.parentWidget())
+        if document.path != saver.path:
+            if document.path:
+                self.watcher.unwatch(document.path)
+            self.watcher.watch(saver.path)
+        # The save replaced the file, so its inode and stamp changed too
+        self.documents.set_path(document, saver.path)
+        editor.journal.follow_file(self.journal_meta(document, editor))
+        if editor.file_path != saver.path:
             # تحديث مسار الملف في المحرر
-            current_editor.file_path = path
-            
+            editor.file_path = saver.path
+
             # تحديث المميز النحوي بناءً على امتداد الملف الجديد
-            ext = os.path.splitext(path)[1].lower()
-            highlighter_class = self.highlighters.get(ext)
-            if highlighter_class:
-                current_editor.set_highlighter(highlighter_class)
-            else:
-                current_editor.set_highlighter(None)
-            
-            current_editor.mark_as_saved()
-            
-            # تحديث عنوان التبويب
-            base_name = os.path.basename(path)
-            self.tab_widget.setTabText(current_index, base_name)
-            self.status_label.setText("Saved")
-            
-            self.status_bar.showMessage(f"File saved successfully: {base_name}", 3000)
-            return True
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Could not save file: {e}")
-            return False
+            ext = os.path.splitext(saver.path)[1].lower()
+            editor.set_highlighter(self.highlighters.get(ext))
+
+        editor.mark_as_saved()
+
+        # تحديث عنوان التبويب
+        base_name = document.name
+        tab_index = self.tab_widget.indexOf(document.view)
+        if tab_index != -1:
+            self.tab_widget.setTabText(tab_index, base_name + ('*' if editor.is_modified else ''))
+        self.update_tab_title()
+        seconds = time.perf_counter() - saver.started_at
+        megabytes = saver.job.bytes_written / 1e6
+        self.status_bar.showMessage(f"File saved successfully: {base_name} "
+                                    f"({megabytes:.1f} MB in {seconds:.2f} s, {saver.throughput() / 1e6:.1f} MB/s)", 5000)
+
+    def update_save_progress(self, saver):
+        """Shows how far a save has got and how fast it is writing."""
+        self.status_bar.showMessage(f"Saving {os.path.basename(saver.path)}... "
+                                    f"{saver.percent}% ({saver.throughput() / 1e6:.1f} MB/s)")
+
+    def fail_saving(self, saver, message):
+        self.status_bar.clearMessage()
+        QMessageBox.warning(self, "Error", f"Could not save file: {message}")
             
+    def reload_changed_file(self, path):
+        """
+        Brings the tab of a file up to date after another program changed it.
+        Unmodified editors are reloaded in place; for modified ones the user
+        chooses between the file on disk and the unsaved changes.
+        """
+        document = self.documents.find(path)
+        stamp = file_stamp(path)
+        # Our own saves have refreshed the stamp already
+        if not document or stamp == document.stamp:
+            return
+        widget = document.view
+        editor = getattr(widget, 'editor', None)
+        if editor and (editor.loader or editor.saver or editor.reloader or editor.replacer):
+            # The change is looked at again once they are done
+            return
+        document.stamp = stamp
+        # Placeholders read the file when they are shown
+        if isinstance(widget, PlaceholderTab):
+            return
+
+        if stamp is None:
+            self.status_bar.showMessage(f"{document.name} was deleted from disk", 5000)
+            # Closing the tab must not lose the text without asking
+            if editor and not editor.is_modified:
+                editor.mark_as_modified()
+            if editor:
+                # The journal can no longer start from the file
+                editor.compact_journal()
+            return
+
+        if not editor:
+            # Viewers map the old file, reopen it where it was
+            index = self.tab_widget.indexOf(widget)
+            was_current = widget is self.tab_widget.currentWidget()
+            placeholder = PlaceholderTab(self.tab_state(widget), self)
+            self.tab_widget.blockSignals(True)
+            self.documents.remove(document)
+            self.tab_widget.removeTab(index)
+            widget.close_file()
+            widget.deleteLater()
+            self.documents.add(placeholder, path)
+            self.tab_widget.insertTab(index, placeholder, document.name)
+            if was_current:
+                self.tab_widget.setCurrentIndex(index)
+            self.tab_widget.blockSignals(False)
+            if was_current:
+                self.open_placeholder(index)
+            return
+
+        if editor.is_modified:
+            response = QMessageBox.warning(self, "File Changed",
+                                           f"File '{document.name}' has been changed by another program.\n"
+                                           f"Do you want to reload it and lose your changes?",
+                                           QMessageBox.Yes | QMessageBox.No)
+            if response != QMessageBox.Yes:
+                editor.compact_journal()
+                return
+
+        reloader = FileReloader(editor, path, self)
+        reloader.finished.connect(lambda: self.finish_reloading(reloader))
+        reloader.failed.connect(lambda message: self.fail_reloading(reloader, message))
+        reloader.start()
+
+    def finish_reloading(self, reloader):
+        """Updates the tab of a reloaded file and looks for changes made meanwhile."""
+        reloader.editor.file_format = reloader.job.file_format
+        reloader.editor.mark_as_saved()
+        document = self.documents.get(reloader.editor.parentWidget())
+        document.stamp = reloader.job.stamp
+        reloader.editor.journal.follow_file(self.journal_meta(document, reloader.editor))
+        self.tab_widget.setTabText(self.tab_widget.indexOf(document.view), document.name)
+        self.update_tab_title()
+        self.update_status_bar()
+        self.status_bar.showMessage(f"Reloaded {document.name}, it was changed on disk", 3000)
+        self.reload_changed_file(reloader.path)
+
+    def fail_reloading(self, reloader, message):
+        """Keeps the old text, marked as modified since it no longer matches the file."""
+        reloader.editor.mark_as_modified()
+        reloader.editor.compact_journal()
+        self.status_bar.showMessage(f"Could not reload {os.path.basename(reloader.path)}: {message}", 5000)
+
+    # ------------------ Session ------------------ #
+    def restore_session(self):
+        """
+        Reopens the tabs of the last session as placeholders, which are only
+        loaded once shown. Returns whether there were any.
+        """
+        tabs, current = load_session()
+        for state in tabs:
+            placeholder = PlaceholderTab(state, self)
+            document = self.documents.add(placeholder, state['path'])
+            self.watcher.watch(state['path'])
+            self.tab_widget.addTab(placeholder, document.name)
+        if tabs:
+            self.status_bar.show()
+            self.tab_widget.setCurrentIndex(current)
+        return bool(tabs)
+
+    def open_placeholder(self, index):
+        """Replaces a session placeholder with the tab of its file."""
+        placeholder = self.tab_widget.widget(index)
+        state = placeholder.state
+        # Swapping the tabs must not activate the next placeholder
+        self.tab_widget.blockSignals(True)
+        self.documents.remove(self.documents.get(placeholder))
+        self.tab_widget.removeTab(index)
+        placeholder.deleteLater()
+        count = self.tab_widget.count()
+        if placeholder.buffer is not None:
+            # Unsaved changes kept while the tab was hibernated
+            text = zlib.decompress(placeholder.buffer).decode('utf-8', 'surrogatepass')
+            self.new_file(text, state['path'], placeholder.file_format, index, modified=True)
+            placeholder.journal.discard()
+        else:
+            self.open_file(state['path'], index)
+        self.tab_widget.blockSignals(False)
+
+        if self.tab_widget.count() > count:
+            widget = self.tab_widget.widget(index)
+            if isinstance(widget, MappedFileViewer):
+                widget.scroll_to(state.get('scroll', 0))
+            else:
+                widget.editor.restore_position(state.get('line', 0), state.get('column', 0), state.get('scroll', 0))
+            self.tab_widget.setCurrentIndex(index)
+        self.on_tab_changed(self.tab_widget.currentIndex())
+
+    def hibernate_tabs(self):
+        """
+        Hibernates the least recently used tabs while the open editors take
+        more than HIBERNATE_MEMORY_BUDGET.
+        """
+        editors = [(document, document.view.editor) for document in self.documents
+                   if isinstance(document.view, EditorWidget)]
+        used = sum(editor.estimated_memory() for _, editor in editors)
+        current = self.tab_widget.currentWidget()
+        for document, editor in editors:
+            if used <= HIBERNATE_MEMORY_BUDGET:
+                break
+            # Untitled tabs have nothing to reopen, loading, saving, reloading and replacing ones are busy
+            if (document.view is current or not document.path
+                    or editor.loader or editor.saver or editor.reloader or editor.replacer):
+                continue
+            used -= editor.estimated_memory()
+            self.hibernate_tab(self.tab_widget.indexOf(document.view))
+
+    def hibernate_tab(self, index):
+        """
+        Replaces an editor tab with a placeholder, freeing its document,
+        layout and highlighting. The file is reopened when the tab is next
+        shown; unsaved text is kept compressed instead. The undo history is lost.
+        """
+        widget = self.tab_widget.widget(index)
+        editor = widget.editor
+        document = self.documents.get(widget)
+        buffer = None
+        if document.modified:
+            buffer = zlib.compress(editor.raw_text().encode('utf-8', 'surrogatepass'))
+        placeholder = PlaceholderTab(self.tab_state(widget), self, buffer, editor.file_format)
+        if document.modified:
+            # Keeps the unsaved text recoverable while it is only in buffer
+            placeholder.journal = editor.journal
+        else:
+            editor.journal.discard()
+
+        self.tab_widget.blockSignals(True)
+        self.documents.remove(document)
+        self.tab_widget.removeTab(index)
+        hibernated = self.documents.add(placeholder, document.path)
+        self.documents.set_modified(hibernated, document.modified)
+        self.tab_widget.insertTab(index, placeholder, document.name + ('*' if document.modified else ''))
+        self.tab_widget.blockSignals(False)
+
+        if editor.syntax_highlighter:
+            editor.syntax_highlighter.stop_background_highlighting()
+        widget.deleteLater()
+
+    def tab_state(self, widget):
+        """Returns what the session keeps of a tab, None for untitled tabs."""
+        if isinstance(widget, PlaceholderTab):
+            return widget.state
+        if isinstance(widget, MappedFileViewer):
+            return {'path': widget.file_path, 'scroll': widget.first_visible_line()}
+        editor = widget.editor
+        if not editor.file_path:
+            return None
+        cursor = editor.textCursor()
+        return {'path': editor.file_path, 'line': cursor.blockNumber(), 'column': cursor.positionInBlock(),
+                'scroll': editor.verticalScrollBar().value()}
+
+    def journal_meta(self, document, editor):
+        """Returns what the recovery journal keeps to bring a document back."""
+        meta = {'path': document.path, 'name': document.name, 'stamp': document.stamp}
+        meta.update(format_meta(editor.file_format))
+        return meta
+
+    def recover_buffers(self):
+        """
+        Reopens the unsaved text journaled by an editor that did not exit
+        cleanly in modified tabs. Returns whether there was any.
+        """
+        recovered = recover()
+        count = 0
+        for entry in recovered:
+            meta, text = entry['meta'], entry['text']
+            if text is None:
+                self.status_bar.showMessage(f"Could not recover {meta['name']}, its file has changed since", 10000)
+                continue
+            index = -1
+            document = self.documents.find(meta['path']) if meta['path'] else None
+            if document:
+                # Takes the place of the tab restored with the session
+                index = self.tab_widget.indexOf(document.view)
+                self.tab_widget.close_tab(index)
+            self.new_file(text, meta['path'], meta_format(meta), index, modified=True)
+            count += 1
+        # Journaled again by the new tabs
+        self.recovery.forget(recovered)
+        if count:
+            self.status_bar.showMessage(f"Recovered unsaved changes of {count} file(s)", 10000)
+        return count > 0
+
+    def write_session(self):
+        """Remembers the open files, their cursors and scroll positions for the next start."""
+        tabs = []
+        current = 0
+        for i in range(self.tab_widget.count()):
+            state = self.tab_state(self.tab_widget.widget(i))
+            if state:
+                if i == self.tab_widget.currentIndex():
+                    current = len(tabs)
+                tabs.append(state)
+        save_session(tabs, current)
+
     def closeEvent(self, event):
         """Handles closing the application, with a check for unsaved changes."""
-        for i in range(self.tab_widget.count() - 1, -1, -1):
-            editor_widget = self.tab_widget.widget(i)
-            editor = editor_widget.editor if editor_widget else None
-
-            if editor and editor.is_modified:
-                self.tab_widget.setCurrentIndex(i)
-                response = QMessageBox.warning(self, "Unsaved Changes",
-                                               f"File '{self.tab_widget.tabText(i).strip('*')}' has been modified.\nDo you want to save your changes before closing?",
-                                               QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel)
-                if response == QMessageBox.Cancel:
+        for document in self.documents:
+            editor = getattr(document.view, 'editor', None)
+            if editor and editor.saver:
+                # A save still running decides whether the tab is modified
+                editor.saver.wait()
+
+        for document in self.documents.modified():
+            i = self.tab_widget.indexOf(document.view)
+            self.tab_widget.setCurrentIndex(i)
+            response = QMessageBox.warning(self, "Unsaved Changes",
+                                           f"File '{document.name}' has been modified.\nDo you want to save your changes before closing?",
+                                           QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel)
+            if response == QMessageBox.Cancel:
+                event.ignore()
+                return
+            elif response == QMessageBox.Save:
+                if not self.save_file(i, wait=True):
                     event.ignore()
                     return
-                elif response == QMessageBox.Save:
-                    if not self.save_file(i):
-                        event.ignore()
-                        return
+        self.write_session()
+        # Everything was saved or discarded on purpose
+        for document in self.documents:
+            journal = getattr(getattr(document.view, 'editor', document.view), 'journal', None)
+            if journal:
+                journal.discard()
+        self.recovery.stop()
         event.accept()
 
 
@@ -2757,4 +3020,7 @@ if __name__ == "__main__":
 
     editor = CodeEditor()
     editor.show()
+    # Files given on the command line
+    if sys.argv[1:]:
+        editor.open_files(sys.argv[1:])
     sys.exit(app.exec_())
\ No newline at end of file
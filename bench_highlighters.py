@@ -0,0 +1,272 @@
+"""
+Highlighter throughput benchmark.
+
+Feeds generated and real-world corpora of several sizes through every
+highlighter in Coder-v0's language registry and through
+editor.PygmentsHighlighter, headless on Qt's offscreen platform, and prints
+the results as JSON:
+
+    python bench_highlighters.py --sizes 1000 10000 --output bench.json
+
+Coder-v0 uses PyQt5 and editor.py uses PyQt6, which cannot share a process,
+and the peak resident set size of a process never goes down, so each case
+(one highlighter on one corpus) runs in its own child process; peak_rss_kb
+is the peak of a process that highlighted only that case.
+"""
+import argparse
+import functools
+import glob
+import itertools
+import importlib.util
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+TARGETS = ('coder', 'pygments')
+DEFAULT_SIZES = (1000, 10000)
+
+# Line templates for the generated corpus; {name}, {number} and {word} are
+# filled in at random so only some lines repeat, as in real code
+TEMPLATES = (
+    'def {name}(self, {word}, {name}=None):',
+    '    return {name}.{word}({number}) + "{word} {word}"',
+    'if ({name} == "{word}") {{',
+    '    {name} = {word}[{number}] * {number}.5;',
+    '}}',
+    '',
+    '// {word} {word} {name}',
+    '# {word} {name} {word}',
+    '/* {word} {name}',
+    ' * {word} {word} */',
+    '<{word} class="{name}">{word} {number}</{word}>',
+    'SELECT {name}, {word} FROM {name} WHERE {word} = \'{word}\';',
+    '{name}: {number}',
+    '    "{word}": [{number}, true, null],',
+    'import {name}',
+    '    for {word} in range({number}):',
+)
+WORDS = ('value', 'item', 'data', 'index', 'result', 'node', 'key', 'text', 'count', 'path')
+
+
+def generated_corpus(lines, seed=0):
+    """Return generated source text with the given number of lines."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(lines):
+        template = rng.choice(TEMPLATES)
+        out.append(template.format(name='%s_%d' % (rng.choice(WORDS), rng.randrange(1000)),
+                                   word=rng.choice(WORDS),
+                                   number=rng.randrange(100000)))
+    return '\n'.join(out)
+
+
+def real_corpus(paths, lines):
+    """Repeat the lines of the given files until there are enough of them."""
+    source = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            source.extend(f.read().split('\n'))
+    if not source:
+        return ''
+    out = []
+    while len(out) < lines:
+        out.extend(source[:lines - len(out)])
+    return '\n'.join(out)
+
+
+def corpora(extension, sizes, files):
+    """
+    Yield (name, size, make_text) for the generated corpus and any real
+    files with this extension; make_text() returns the text.
+    """
+    matching = [path for path in files if os.path.splitext(path)[1].lower() == extension]
+    for size in sizes:
+        yield 'generated', size, functools.partial(generated_corpus, size)
+        if matching:
+            yield 'real', size, functools.partial(real_corpus, matching, size)
+
+
+def memory_kb():
+    """Return the peak resident set size of this process in KB, when the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux KB
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def measure(make_document, make_highlighter, text, line_cache):
+    """Highlight text once for timing and once under tracemalloc for memory."""
+    document = make_document(text)
+    blocks = document.blockCount()
+    line_cache.clear()
+    highlighter = make_highlighter(document)
+    start = time.perf_counter()
+    highlighter.rehighlight()
+    seconds = time.perf_counter() - start
+    cache = line_cache.stats()
+    highlighter.setDocument(None)
+
+    document = make_document(text)
+    line_cache.clear()
+    highlighter = make_highlighter(document)
+    tracemalloc.start()
+    highlighter.rehighlight()
+    python_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    highlighter.setDocument(None)
+
+    return {
+        'blocks': blocks,
+        'seconds': round(seconds, 4),
+        'blocks_per_sec': round(blocks / seconds) if seconds else None,
+        'python_peak_kb': python_peak // 1024,
+        'peak_rss_kb': memory_kb(),
+        'line_cache': cache,
+    }
+
+
+def bench_coder(sizes, files, case):
+    """Benchmark one case of the highlighters of Coder-v0 (PyQt5); [] past the last case."""
+    from PyQt5.QtWidgets import QApplication, QPlainTextDocumentLayout
+    from PyQt5.QtGui import QTextDocument
+    from highlighting import line_cache
+
+    app = QApplication.instance() or QApplication([])
+    spec = importlib.util.spec_from_file_location('coder_v0', os.path.join(HERE, 'Coder-v0.py'))
+    coder = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(coder)
+    # Not from a CodeEditor, which would restore and save the user's session
+    highlighters = coder.LANGUAGES.highlighter_factories()
+
+    def make_document(text):
+        document = QTextDocument()
+        document.setDocumentLayout(QPlainTextDocumentLayout(document))
+        document.setPlainText(text)
+        return document
+
+    cases = []
+    seen = set()
+    for extension, highlighter_factory in highlighters.items():
+        # Several extensions share a language
+        language = coder.LANGUAGES.language_for_extension(extension)
+        if language in seen:
+            continue
+        seen.add(language)
+        for corpus, size, make_text in corpora(extension, sizes, files):
+            result = {'target': 'coder', 'highlighter': language,
+                      'extension': extension, 'corpus': corpus, 'lines': size}
+            cases.append((result, highlighter_factory, make_text))
+    if case >= len(cases):
+        return []
+    result, highlighter_factory, make_text = cases[case]
+    result.update(measure(make_document, highlighter_factory, make_text(), line_cache))
+    return [result]
+
+
+def bench_pygments(sizes, files, case):
+    """Benchmark one case of editor.PygmentsHighlighter (PyQt6), a lexer per extension; [] past the last case."""
+    from PyQt6.QtWidgets import QApplication, QPlainTextDocumentLayout
+    from PyQt6.QtGui import QTextDocument
+    from pygments.lexers import get_lexer_for_filename
+    from pygments.util import ClassNotFound
+    from highlighting import line_cache
+    import editor
+
+    app = QApplication.instance() or QApplication([])
+
+    def make_document(text):
+        document = QTextDocument()
+        document.setDocumentLayout(QPlainTextDocumentLayout(document))
+        document.setPlainText(text)
+        return document
+
+    # The same languages as Coder-v0, one lexer per language
+    extensions = ('.py', '.js', '.ts', '.cpp', '.html', '.css', '.json', '.sh', '.md', '.xml',
+                  '.java', '.rb', '.php', '.sql', '.swift', '.go', '.cs', '.rs', '.kt', '.yml')
+    cases = []
+    for extension in extensions:
+        try:
+            lexer = get_lexer_for_filename('bench' + extension)
+        except ClassNotFound:
+            continue
+
+        def make_highlighter(document, lexer=lexer):
+            return editor.PygmentsHighlighter(document, lexer=lexer)
+
+        for corpus, size, make_text in corpora(extension, sizes, files):
+            result = {'target': 'pygments', 'highlighter': type(lexer).__name__,
+                      'extension': extension, 'corpus': corpus, 'lines': size}
+            cases.append((result, make_highlighter, make_text))
+    if case >= len(cases):
+        return []
+    result, make_highlighter, make_text = cases[case]
+    result.update(measure(make_document, make_highlighter, make_text(), line_cache))
+    return [result]
+
+
+BENCHMARKS = {'coder': bench_coder, 'pygments': bench_pygments}
+
+
+def run_children(target, args):
+    """Run the cases of one target, each in a child process, and return their results."""
+    results = []
+    for case in itertools.count():
+        command = [sys.executable, os.path.abspath(__file__), '--target', target, '--case', str(case),
+                   '--sizes'] + [str(size) for size in args.sizes]
+        if args.corpus:
+            command += ['--corpus'] + args.corpus
+        output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+        case_results = json.loads(output)
+        if not case_results:
+            return results
+        results.extend(case_results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--target', choices=TARGETS, help="run the cases of a single target")
+    parser.add_argument('--case', type=int,
+                        help="run only this case of --target, numbered from 0, in this process")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="corpus sizes in lines")
+    parser.add_argument('--corpus', nargs='+', default=None,
+                        help="real-world files, matched to highlighters by extension "
+                             "(default: this repository's Python files)")
+    parser.add_argument('--output', help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+    if args.case is not None and args.target is None:
+        parser.error("--case needs --target")
+    files = args.corpus if args.corpus is not None else sorted(glob.glob(os.path.join(HERE, '*.py')))
+
+    if args.case is not None:
+        results = BENCHMARKS[args.target](args.sizes, files, args.case)
+    else:
+        results = []
+        for target in (args.target,) if args.target else TARGETS:
+            results.extend(run_children(target, args))
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import heapq
+import json
+import os
+
+from file_io import file_stamp
+
+
+# Where the open tabs are kept between runs
+SESSION_PATH = os.path.join(os.environ.get('XDG_STATE_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'state'),
+                            'minicodeeditor', 'session.json')
+
+
+def canonical_path(path):
+    """Return path made absolute, with symlinks and '..' resolved and case folded where the OS ignores it."""
+    return os.path.normcase(os.path.realpath(os.path.abspath(path)))
+
+
+def file_id(path):
+    """Return (st_dev, st_ino) for a file, or None if it cannot be found or has no inode number."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    # Some file systems report 0 instead of a real inode number
+    if not stat.st_ino:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+class Document:
+    """
+    State of one open file, kept apart from the widget showing it.
+
+    view is the tab page the editor shows the document in; the registry
+    only uses it as a key. Untitled documents have no path but an
+    untitled_number instead. stamp is the file_stamp() of the file as last
+    read or written, to tell changes made by other programs from our own.
+    """
+    def __init__(self, view, path=None):
+        self.view = view
+        self.path = path
+        self.key = None
+        self.file_id = None
+        self.stamp = None
+        self.untitled_number = None
+        self.modified = False
+
+    @property
+    def name(self):
+        """File name shown on the tab, without the modified marker."""
+        if self.path:
+            return os.path.basename(self.path)
+        return "Untitled-%d" % self.untitled_number
+
+
+class DocumentRegistry:
+    """
+    The open documents, found by path or view in O(1).
+
+    Paths are looked up by their canonical form, so a symlink or a relative
+    path to an open file finds it. Failing that, the file's
+    (st_dev, st_ino) pair is looked up, which also catches hard links and
+    files whose directory was reached another way. Saving replaces a file
+    with a new inode, so set_path() is called again after every save.
+
+    Untitled numbers are handed out lowest first and reused once their
+    document is closed or saved under a name. modified() lists the
+    documents with unsaved changes without looking at any widget.
+    Documents iterate least recently used first, see touch().
+    """
+    def __init__(self):
+        self._by_view = {}
+        self._by_key = {}
+        self._by_id = {}
+        self._modified = {}
+        # Untitled numbers below _next_untitled that are free again
+        self._free_untitled = []
+        self._next_untitled = 1
+
+    def __len__(self):
+        return len(self._by_view)
+
+    def __iter__(self):
+        return iter(list(self._by_view.values()))
+
+    def add(self, view, path=None):
+        """Register the document shown in view and return it."""
+        document = Document(view)
+        self._by_view[view] = document
+        self.set_path(document, path)
+        return document
+
+    def remove(self, document):
+        self._by_view.pop(document.view, None)
+        self._modified.pop(document.view, None)
+        self._forget_path(document)
+        self._release_untitled(document)
+
+    def touch(self, document):
+        """Mark a document as the most recently used."""
+        self._by_view[document.view] = self._by_view.pop(document.view)
+
+    def get(self, view):
+        """Return the document shown in view, or None."""
+        return self._by_view.get(view)
+
+    def find(self, path):
+        """Return the open document for path, or None; costs at most a couple of stat calls."""
+        document = self._by_key.get(canonical_path(path))
+        if document:
+            return document
+        identity = file_id(path)
+        document = self._by_id.get(identity) if identity else None
+        # The open file may have been deleted and its inode number reused
+        if document and file_id(document.path) == identity:
+            return document
+        return None
+
+    def set_path(self, document, path):
+        """Give a document a new path, or refresh its keys after its file was replaced."""
+        self._forget_path(document)
+        document.path = path
+        if path is None:
+            if document.untitled_number is None:
+                if self._free_untitled:
+                    document.untitled_number = heapq.heappop(self._free_untitled)
+                else:
+                    document.untitled_number = self._next_untitled
+                    self._next_untitled += 1
+            return
+        self._release_untitled(document)
+        document.key = canonical_path(path)
+        document.file_id = file_id(path)
+        document.stamp = file_stamp(path)
+        self._by_key[document.key] = document
+        if document.file_id:
+            self._by_id[document.file_id] = document
+
+    def set_modified(self, document, modified):
+        document.modified = modified
+        if modified:
+            self._modified[document.view] = document
+        else:
+            self._modified.pop(document.view, None)
+
+    def modified(self):
+        """Return the documents with unsaved changes, in the order they were changed."""
+        return list(self._modified.values())
+
+    def _forget_path(self, document):
+        if self._by_key.get(document.key) is document:
+            del self._by_key[document.key]
+        if self._by_id.get(document.file_id) is document:
+            del self._by_id[document.file_id]
+        document.key = document.file_id = document.stamp = None
+
+    def _release_untitled(self, document):
+        if document.untitled_number is not None:
+            heapq.heappush(self._free_untitled, document.untitled_number)
+            document.untitled_number = None
+
+
+def save_session(tabs, current, path=SESSION_PATH):
+    """
+    Save the open tabs, a list of dicts with at least a 'path' key, and the
+    index of the current one. The file is replaced atomically; a session
+    that cannot be written is simply lost.
+    """
+    temp_path = path + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'current': current, 'tabs': tabs}, f)
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+
+
+def load_session(path=SESSION_PATH):
+    """
+    Return the (tabs, current) saved by save_session(), without the tabs
+    whose file no longer exists. A missing or damaged session is empty.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            session = json.load(f)
+        tabs = [tab for tab in session['tabs'] if os.path.isfile(tab['path'])]
+        current = session['tabs'][session['current']]
+    except (OSError, ValueError, KeyError, IndexError, TypeError):
+        return [], 0
+    return tabs, tabs.index(current) if current in tabs else 0
@@ -1,19 +1,97 @@
 
 import sys
-from PyQt6.QtWidgets import QPlainTextEdit, QWidget, QTextEdit
-from PyQt6.QtCore import Qt, QRect, QSize
-from PyQt6.QtGui import QColor, QPainter, QTextFormat, QFont, QSyntaxHighlighter, QTextCharFormat, QFontDatabase
+import time
+from PyQt6.QtWidgets import QPlainTextEdit, QWidget, QTextEdit, QAbstractScrollArea
+from PyQt6.QtCore import Qt, QRect, QSize, QTimer
+from PyQt6.QtGui import QColor, QPainter, QTextFormat, QFont, QSyntaxHighlighter, QTextCharFormat, QFontDatabase, QTextCursor
 
 # Try to import pygments, handle if missing
 try:
     from pygments import highlight
+    from pygments.lexer import RegexLexer
     from pygments.lexers import PythonLexer
     from pygments.formatter import Formatter
-    from pygments.token import Token, Keyword, Name, Comment, String, Error, Number, Operator, Generic, Literal, Text
+    from pygments.token import Token, Keyword, Name, Comment, String, Error, Number, Operator, Generic, Literal, Text, Whitespace, _TokenType
     PYGMENTS_AVAILABLE = True
 except ImportError:
     PYGMENTS_AVAILABLE = False
 
+from file_io import FileFormat
+from highlighting import HighlightJob, line_cache
+
+# Documents with at least this many lines are highlighted in a background thread
+BACKGROUND_HIGHLIGHT_MIN_BLOCKS = 5000
+# Seconds spent applying background highlighting per event loop iteration
+HIGHLIGHT_TIME_SLICE = 0.008
+# Documents with at least this many lines are only highlighted around the viewport
+LAZY_HIGHLIGHT_MIN_BLOCKS = 100000
+# Blocks highlighted above and below the viewport in lazy mode
+LAZY_HIGHLIGHT_LOOKAHEAD = 200
+# Blocks further than this from the viewport lose their formats in lazy mode
+LAZY_HIGHLIGHT_RETENTION = 1000
+
+
+def lex_line(lexer, text, stack=('root',)):
+    """
+    Lex a single line starting from the given lexer state stack.
+
+    This follows RegexLexer.get_tokens_unprocessed, but also returns the
+    state stack at the end of the line so the next line can continue from
+    it (for example inside a triple-quoted string).
+    Returns ([(index, tokentype, value), ...], stack).
+    """
+    tokens = []
+    # Lexer rules expect every line to be terminated
+    text += '\n'
+    pos = 0
+    tokendefs = lexer._tokens
+    statestack = list(stack)
+    statetokens = tokendefs[statestack[-1]]
+    while 1:
+        for rexmatch, action, new_state in statetokens:
+            m = rexmatch(text, pos)
+            if m:
+                if action is not None:
+                    if type(action) is _TokenType:
+                        tokens.append((pos, action, m.group()))
+                    else:
+                        tokens.extend(action(lexer, m))
+                pos = m.end()
+                if new_state is not None:
+                    # state transition
+                    if isinstance(new_state, tuple):
+                        for state in new_state:
+                            if state == '#pop':
+                                if len(statestack) > 1:
+                                    statestack.pop()
+                            elif state == '#push':
+                                statestack.append(statestack[-1])
+                            else:
+                                statestack.append(state)
+                    elif isinstance(new_state, int):
+                        # pop, but keep at least one state on the stack
+                        if abs(new_state) >= len(statestack):
+                            del statestack[1:]
+                        else:
+                            del statestack[new_state:]
+                    elif new_state == '#push':
+                        statestack.append(statestack[-1])
+                    statetokens = tokendefs[statestack[-1]]
+                break
+        else:
+            # No rule matched at this position
+            if pos >= len(text):
+                break
+            if text[pos] == '\n':
+                # at EOL, reset state to "root"
+                statestack = ['root']
+                statetokens = tokendefs['root']
+                tokens.append((pos, Whitespace, '\n'))
+            else:
+                tokens.append((pos, Error, text[pos]))
+            pos += 1
+    return tokens, tuple(statestack)
+
 class LineNumberArea(QWidget):
     def __init__(self, editor):
         super().__init__(editor)
@@ -26,11 +104,66 @@ class LineNumberArea(QWidget):
         self.codeEditor.lineNumberAreaPaintEvent(event)
 
 class PygmentsHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
+    """
+    Highlights a document with a single, reused Pygments lexer.
+
+    For regex based lexers the lexer state stack at the end of every block is
+    kept as the block state, so multi-line constructs such as triple-quoted
+    strings are lexed correctly. Qt only re-highlights the following blocks
+    while their state keeps changing, so an edit re-lexes the damaged region
+    and stops as soon as the state converges again.
+
+    Large documents can be lexed in a background thread with
+    startBackgroundHighlighting(); the results are then applied in short
+    time slices, visible blocks first, so the window stays responsive. An
+    edit meanwhile restarts the job from the edited block.
+
+    In lazy mode (setLazyHighlighting()) only the blocks within lookahead
+    blocks of the viewport are highlighted, and blocks further than
+    retention blocks away lose their formats again. Blocks that were never
+    highlighted keep no state, so a string that starts above the
+    highlighted range is only picked up once that part is scrolled through.
+    """
+    # Lexer state stacks are interned so they can be stored as block states
+    _stack_states = {('root',): 0}
+    _state_stacks = [('root',)]
+    # Styles and the flattened token type -> format map, shared by all editors
+    styles = None
+    token_formats = None
+
+    def __init__(self, parent=None, lexer=None):
         super().__init__(parent)
-        
-        # Define basic styles for pygments tokens
-        self.styles = {
+        self.lexer = None
+        if PYGMENTS_AVAILABLE:
+            self.lexer = lexer or PythonLexer()
+            if PygmentsHighlighter.styles is None:
+                PygmentsHighlighter.styles = self.build_styles()
+                PygmentsHighlighter.token_formats = dict(PygmentsHighlighter.styles)
+        # lex_line follows RegexLexer's own loop, so lexers that replace it
+        # (e.g. ExtendedRegexLexer subclasses) are lexed line by line
+        self.stateful = (isinstance(self.lexer, RegexLexer) and
+                         type(self.lexer).get_tokens_unprocessed is RegexLexer.get_tokens_unprocessed)
+
+        # Background highlighting state
+        self.visibleBlocks = (0, 100)
+        self.backgroundJob = None
+        self.backgroundResults = None
+        self.backgroundOrder = []
+        # First block number the job has not handed over yet
+        self.backgroundNext = 0
+        self.backgroundDocument = None
+        self.backgroundTimer = QTimer(self)
+        self.backgroundTimer.timeout.connect(self.applyBackgroundResults)
+
+        # Lazy highlighting state
+        self.lookahead = LAZY_HIGHLIGHT_LOOKAHEAD
+        self.retention = LAZY_HIGHLIGHT_RETENTION
+        self.lazyBlocks = None
+        self.lastLazyBlock = -1
+
+    def build_styles(self):
+        """Define basic styles for pygments tokens."""
+        return {
             Token:              QTextCharFormat(),
             
             Keyword:            self.format("#569cd6", "bold"),
@@ -100,7 +233,7 @@ class PygmentsHighlighter(QSyntaxHighlighter):
             Generic.Subheading: self.format("#d4d4d4", "bold"),
             Generic.Traceback:  self.format("#d4d4d4"),
         }
-        
+
     def format(self, color, style=''):
         """Return a QTextCharFormat with the given attributes."""
         _format = QTextCharFormat()
@@ -111,40 +244,275 @@ class PygmentsHighlighter(QSyntaxHighlighter):
             _format.setFontItalic(True)
         return _format
 
+    @classmethod
+    def resolve_format(cls, token):
+        """Find the style of a token type and remember it in token_formats."""
+        style = None
+        tmp_token = token
+        while style is None and tmp_token is not None:
+            style = cls.styles.get(tmp_token)
+            tmp_token = tmp_token.parent
+        cls.token_formats[token] = style
+        return style
+
+    @classmethod
+    def state_for_stack(cls, stack):
+        """Return the block state number for a lexer state stack."""
+        state = cls._stack_states.get(stack)
+        if state is None:
+            state = len(cls._state_stacks)
+            cls._stack_states[stack] = state
+            cls._state_stacks.append(stack)
+        return state
+
+    def lexLine(self, text, stack):
+        """
+        Lex one line through the shared line cache, returns (tokens, stack).
+
+        Does not touch Qt, so background jobs can call it too.
+        """
+        return line_cache.tokenize(type(self.lexer), self.lexUncached, text, stack)
+
+    def lexUncached(self, text, stack):
+        if self.stateful:
+            return lex_line(self.lexer, text, stack)
+        # Other lexers cannot resume mid-document, lex the line on its own
+        return list(self.lexer.get_tokens_unprocessed(text)), stack
+
+    def setVisibleBlocks(self, first, last):
+        """Tell the highlighter which block numbers are on screen."""
+        self.visibleBlocks = (first, last)
+        if self.lazyBlocks is not None:
+            self.updateLazyBlocks()
+
+    def setLazyHighlighting(self, enabled):
+        """Only highlight the blocks around the viewport, or go back to highlighting everything."""
+        if enabled == (self.lazyBlocks is not None):
+            return
+        if enabled:
+            self.stopBackgroundHighlighting()
+            # Nothing is highlighted until the viewport is known
+            self.lazyBlocks = (0, -1)
+        else:
+            self.lazyBlocks = None
+            self.rehighlight()
+
+    def updateLazyBlocks(self):
+        """Highlight the blocks near the viewport and drop the formats of blocks far from it."""
+        document = self.document()
+        if document is None:
+            return
+        first, last = self.visibleBlocks
+        start = max(0, first - self.lookahead)
+        end = min(document.blockCount() - 1, last + self.lookahead)
+        oldStart, oldEnd = self.lazyBlocks
+        # Keep the part of the old range that is still within the retention window
+        keptStart = max(oldStart, first - self.retention)
+        keptEnd = min(oldEnd, last + self.retention)
+        if keptStart <= keptEnd and keptStart <= end + 1 and start <= keptEnd + 1:
+            start, end = min(start, keptStart), max(end, keptEnd)
+        self.lazyBlocks = (start, end)
+
+        # Blocks outside the new range are re-highlighted without formats
+        self.rehighlightBlocks(document, oldStart, min(oldEnd, start - 1))
+        self.rehighlightBlocks(document, max(oldStart, end + 1), oldEnd)
+        if oldStart > oldEnd:
+            self.rehighlightBlocks(document, start, end)
+        else:
+            self.rehighlightBlocks(document, start, min(end, oldStart - 1))
+            self.rehighlightBlocks(document, max(start, oldEnd + 1), end)
+
+    def rehighlightBlocks(self, document, first, last):
+        """Re-highlight the blocks numbered first to last."""
+        number = first
+        while number <= last:
+            block = document.findBlockByNumber(number)
+            if not block.isValid():
+                break
+            self.lastLazyBlock = number
+            self.rehighlightBlock(block)
+            # Qt carries on into the next blocks while their state changes
+            number = max(number, self.lastLazyBlock) + 1
+
+    def startBackgroundHighlighting(self):
+        """
+        Lex a snapshot of the document in a worker thread.
+
+        The snapshot is taken once the job starts, from the next timer tick,
+        so this can be called before loading the text with setPlainText();
+        the synchronous pass Qt runs while loading then only lexes visible
+        blocks.
+        """
+        self.stopBackgroundHighlighting()
+        document = self.document()
+        if not PYGMENTS_AVAILABLE or document is None:
+            return
+        self.backgroundResults = {}
+        self.backgroundOrder = []
+        self.startBackgroundJob(0, ('root',))
+        self.backgroundDocument = document
+        document.contentsChange.connect(self.restartBackgroundHighlighting)
+
+    def startBackgroundJob(self, first, stack):
+        """Lex the blocks from number first on, entered with the lexer state stack."""
+        self.backgroundJob = HighlightJob(None, self.lexLine, stack, first)
+        self.backgroundNext = first
+        # Started from the first timer tick, once Qt's own pass is over, so
+        # the worker does not compete with it for the interpreter
+        self.backgroundTimer.start(0)
+
+    def stopBackgroundHighlighting(self):
+        """Cancel a running background job and drop its pending results."""
+        if self.backgroundJob:
+            self.backgroundJob.cancel()
+        if self.backgroundDocument is not None:
+            try:
+                self.backgroundDocument.contentsChange.disconnect(self.restartBackgroundHighlighting)
+            except (TypeError, RuntimeError):
+                pass
+            self.backgroundDocument = None
+        self.backgroundJob = None
+        self.backgroundResults = None
+        self.backgroundOrder = []
+        self.backgroundTimer.stop()
+
+    def applyBackgroundResults(self):
+        """Apply finished background results for one time slice, visible blocks first."""
+        job = self.backgroundJob
+        document = self.document()
+        if job is None or document is None:
+            self.stopBackgroundHighlighting()
+            return
+
+        if not job.started:
+            # toPlainText() would also break lines at U+2028, out of step with the blocks
+            job.lines = document.toRawText().replace('\u2029', '\n').split('\n')[job.first:]
+            job.start()
+            return
+
+        results = self.backgroundResults
+        self.takeBackgroundResults(job)
+
+        deadline = time.perf_counter() + HIGHLIGHT_TIME_SLICE
+        first, last = self.visibleBlocks
+        for number in range(first, last + 1):
+            if number in results:
+                self.applyBackgroundResult(document, number)
+
+        order = self.backgroundOrder
+        applied = 0
+        while applied < len(order) and time.perf_counter() < deadline:
+            number = order[applied]
+            applied += 1
+            if number in results:
+                self.applyBackgroundResult(document, number)
+        del order[:applied]
+
+        if job.done and not results:
+            self.stopBackgroundHighlighting()
+
+    def restartBackgroundHighlighting(self, position, removed, added):
+        """
+        Start the background job over from the first edited block. The
+        results from there on follow the old text and the states it led to,
+        so they are dropped even for blocks whose own text is unchanged.
+        """
+        job = self.backgroundJob
+        document = self.document()
+        if job is None or document is None:
+            return
+        job.cancel()
+        self.takeBackgroundResults(job)
+        first = min(document.findBlock(position).blockNumber(), self.backgroundNext)
+        results = self.backgroundResults
+        for number in [number for number in results if number >= first]:
+            del results[number]
+        self.backgroundOrder = [number for number in self.backgroundOrder if number < first]
+        # The blocks before first are highlighted or have their result waiting
+        if first - 1 in results:
+            stack = results[first - 1][2]
+        else:
+            state = document.findBlockByNumber(first - 1).userState() if first else -1
+            stack = self._state_stacks[state] if self.stateful and state > 0 else ('root',)
+        self.startBackgroundJob(first, stack)
+
+    def takeBackgroundResults(self, job):
+        for number, text, tokens, stack in job.take_results():
+            self.backgroundResults[number] = (text, tokens, stack)
+            self.backgroundOrder.append(number)
+            self.backgroundNext = number + 1
+
+    def applyBackgroundResult(self, document, number):
+        """Re-highlight one block from its background result."""
+        block = document.findBlockByNumber(number)
+        if not block.isValid():
+            self.backgroundResults.pop(number, None)
+            return
+        # Store the final state first so Qt does not cascade into the next block
+        if self.stateful:
+            block.setUserState(self.state_for_stack(self.backgroundResults[number][2]))
+        self.rehighlightBlock(block)
+        self.backgroundResults.pop(number, None)
+
     def highlightBlock(self, text):
         """Apply syntax highlighting to the given block of text."""
         if not PYGMENTS_AVAILABLE:
             return
-            
-        lexer = PythonLexer()
-        tokens = lexer.get_tokens(text)
-        
-        # Because pygments returns tokens for the whole text and we only process one block (line) 
-        # at a time in Qt, this implementation is simplified. 
-        # A proper implementation would need to handle multi-line constructs (like multi-line strings)
-        # by managing state. user data, etc. 
-        # For this "Mini" version, we'll do a simple per-line lexical analysis 
-        # which works for most things except multi-line strings start/end detection across blocks.
-        
-        index = 0
-        for token, content in tokens:
-            length = len(content)
-            # Find the best match style
-            style = self.styles.get(token, self.styles.get(token.parent, None))
-            # Just simple fallback loop
-            tmp_token = token
-            while style is None and tmp_token.parent:
-                tmp_token = tmp_token.parent
-                style = self.styles.get(tmp_token, None)
+
+        if self.lazyBlocks is not None:
+            number = self.currentBlock().blockNumber()
+            self.lastLazyBlock = number
+            first, last = self.lazyBlocks
+            if not first <= number <= last:
+                # Far from the viewport: no formats, and the stored state is kept
+                return
+
+        result = None
+        if self.backgroundResults is not None:
+            number = self.currentBlock().blockNumber()
+            result = self.backgroundResults.pop(number, None)
+            first, last = self.visibleBlocks
+            if result is None and not first <= number <= last:
+                # Not lexed yet; the background job will get here
+                return
+            if result is not None and result[0] != text:
+                result = None
+
+        if result is not None:
+            tokens, stack = result[1], result[2]
+            if self.stateful:
+                self.setCurrentBlockState(self.state_for_stack(stack))
+        elif self.stateful:
+            previous_state = self.previousBlockState()
+            stack = self._state_stacks[previous_state] if previous_state > 0 else ('root',)
+            tokens, stack = self.lexLine(text, stack)
+            self.setCurrentBlockState(self.state_for_stack(stack))
+        else:
+            tokens, stack = self.lexLine(text, ('root',))
+
+        token_formats = self.token_formats
+        for index, token, content in tokens:
+            try:
+                style = token_formats[token]
+            except KeyError:
+                style = self.resolve_format(token)
 
             if style:
-                self.setFormat(index, length, style)
-            
-            index += length
+                self.setFormat(index, len(content), style)
 
 class CodeEditor(QPlainTextEdit):
     def __init__(self):
         super().__init__()
+        # Set while a FileLoader streams a file into the editor
+        self.loader = None
+        # Set while a FileSaver writes the file
+        self.saver = None
+        # Set while a FileReloader rereads the file after it changed on disk
+        self.reloader = None
+        # Line to go to once the loader gets there
+        self.pendingLine = None
+        # How the file is stored on disk; saving keeps it
+        self.fileFormat = FileFormat()
         self.lineNumberArea = LineNumberArea(self)
         
         self.blockCountChanged.connect(self.updateLineNumberAreaWidth)
@@ -166,10 +534,91 @@ class CodeEditor(QPlainTextEdit):
         
         # Syntax Highlighter
         self.highlighter = PygmentsHighlighter(self.document())
+        # Keep the highlighter informed about what is on screen
+        self.verticalScrollBar().valueChanged.connect(self.updateHighlightViewport)
+        self.blockCountChanged.connect(self.handleBlockCountChanged)
+
+    def setPlainText(self, text):
+        self.chooseHighlighting(text.count('\n') + 1)
+        super().setPlainText(text)
+        self.updateHighlightViewport()
+
+    def chooseHighlighting(self, lines):
+        # Very large documents are only highlighted around the viewport,
+        # large ones are lexed off the GUI thread
+        self.highlighter.setLazyHighlighting(lines >= LAZY_HIGHLIGHT_MIN_BLOCKS)
+        if BACKGROUND_HIGHLIGHT_MIN_BLOCKS <= lines < LAZY_HIGHLIGHT_MIN_BLOCKS:
+            self.highlighter.startBackgroundHighlighting()
+        else:
+            self.highlighter.stopBackgroundHighlighting()
+
+    def beginLoading(self, loader):
+        # Read-only while a loader appends the file, without filling the undo stack
+        self.loader = loader
+        self.setReadOnly(True)
+        self.document().setUndoRedoEnabled(False)
+        self.setKeepCursorPosition(True)
+        # Highlighting starts once the whole file is in
+        self.highlighter.stopBackgroundHighlighting()
+        self.highlighter.setDocument(None)
+
+    def endLoading(self):
+        self.loader = None
+        self.document().setUndoRedoEnabled(True)
+        self.document().setModified(False)
+        self.setKeepCursorPosition(False)
+        self.setReadOnly(False)
+        self.highlightCurrentLine()
+        self.highlighter.setDocument(self.document())
+        self.chooseHighlighting(self.blockCount())
+        self.updateHighlightViewport()
+        if self.pendingLine:
+            self.goToLine(self.pendingLine)
+
+    def setKeepCursorPosition(self, keep):
+        # Text appended at the cursor should not drag it along
+        cursor = self.textCursor()
+        cursor.setKeepPositionOnInsert(keep)
+        if not keep:
+            # Only the position stays, the anchor moved along and would
+            # select the whole text
+            cursor.clearSelection()
+        self.setTextCursor(cursor)
+
+    def lineCount(self):
+        # The loader's line index knows the length of the file before it is all in
+        if self.loader:
+            return max(self.blockCount(), self.loader.line_index.line_count)
+        return self.blockCount()
+
+    def goToLine(self, number):
+        # Lines that are not loaded yet are gone to once they are
+        if number > self.blockCount() and self.loader:
+            self.pendingLine = number
+            return
+        self.pendingLine = None
+        block = self.document().findBlockByNumber(min(number, self.blockCount()) - 1)
+        self.setTextCursor(QTextCursor(block))
+        self.centerCursor()
+
+    def visibleBlockRange(self):
+        first = self.firstVisibleBlock().blockNumber()
+        lineHeight = max(1, self.fontMetrics().height())
+        return first, first + self.viewport().height() // lineHeight + 1
+
+    def updateHighlightViewport(self, *args):
+        self.highlighter.setVisibleBlocks(*self.visibleBlockRange())
+
+    def handleBlockCountChanged(self, *args):
+        if self.pendingLine and self.pendingLine <= self.blockCount():
+            self.goToLine(self.pendingLine)
+        # A background job restarts itself from the edited block
+        if self.highlighter.lazyBlocks is not None:
+            self.updateHighlightViewport()
 
     def lineNumberAreaWidth(self):
         digits = 1
-        max_val = max(1, self.blockCount())
+        max_val = max(1, self.lineCount())
         while max_val >= 10:
             max_val //= 10
             digits += 1
@@ -177,7 +626,10 @@ class CodeEditor(QPlainTextEdit):
         return space
 
     def updateLineNumberAreaWidth(self, _):
-        self.setViewportMargins(self.lineNumberAreaWidth(), 0, 0, 0)
+        # Only relayout when the width changes; this runs for every repainted block
+        width = self.lineNumberAreaWidth()
+        if self.viewportMargins().left() != width:
+            self.setViewportMargins(width, 0, 0, 0)
 
     def updateLineNumberArea(self, rect, dy):
         if dy:
@@ -192,6 +644,7 @@ class CodeEditor(QPlainTextEdit):
         super().resizeEvent(event)
         cr = self.contentsRect()
         self.lineNumberArea.setGeometry(QRect(cr.left(), cr.top(), self.lineNumberAreaWidth(), cr.height()))
+        self.updateHighlightViewport()
 
     def highlightCurrentLine(self):
         extraSelections = []
@@ -229,3 +682,102 @@ class CodeEditor(QPlainTextEdit):
             top = bottom
             bottom = top + self.blockBoundingRect(block).height()
             blockNumber += 1
+
+
+class MappedFileViewer(QAbstractScrollArea):
+    """
+    Read-only view of a file_io.MappedFile, for files too large to load into
+    a CodeEditor. Only the lines in the viewport are decoded and painted; the
+    vertical scroll bar counts lines, so scrolling seeks by line offset.
+    """
+    def __init__(self, mapped):
+        super().__init__()
+        self.mapped = mapped
+        self.longestLine = 0
+
+        font = QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont)
+        font.setFamily("Consolas")
+        font.setStyleHint(QFont.StyleHint.Monospace)
+        font.setPointSize(11)
+        self.setFont(font)
+        self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
+
+        # Follow the line count while the file is being indexed
+        self.indexTimer = QTimer(self)
+        self.indexTimer.timeout.connect(self.updateScrollRange)
+        self.indexTimer.start(100)
+        self.updateScrollRange()
+
+    def closeFile(self):
+        self.indexTimer.stop()
+        self.mapped.close()
+
+    def visibleLineCount(self):
+        return max(1, self.viewport().height() // self.fontMetrics().height())
+
+    def firstVisibleLine(self):
+        return self.verticalScrollBar().value()
+
+    def goToLine(self, number):
+        self.verticalScrollBar().setValue(number - 1 - self.visibleLineCount() // 2)
+
+    def lineNumberAreaWidth(self):
+        return 3 + self.fontMetrics().horizontalAdvance('9') * len(str(self.mapped.line_count))
+
+    def updateScrollRange(self):
+        if self.mapped.indexed:
+            self.indexTimer.stop()
+        page = self.visibleLineCount()
+        self.verticalScrollBar().setRange(0, max(0, self.mapped.line_count - page))
+        self.verticalScrollBar().setPageStep(page)
+        textWidth = self.viewport().width() - self.lineNumberAreaWidth()
+        contentWidth = self.longestLine * self.fontMetrics().horizontalAdvance('9') + 10
+        self.horizontalScrollBar().setRange(0, max(0, contentWidth - textWidth))
+        self.horizontalScrollBar().setPageStep(textWidth)
+        self.viewport().update()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.updateScrollRange()
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    def keyPressEvent(self, event):
+        control = event.modifiers() & Qt.KeyboardModifier.ControlModifier
+        if control and event.key() == Qt.Key.Key_Home:
+            self.verticalScrollBar().setValue(0)
+        elif control and event.key() == Qt.Key.Key_End:
+            self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+        else:
+            super().keyPressEvent(event)
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.fillRect(event.rect(), QColor("#1e1e1e"))
+
+        metrics = self.fontMetrics()
+        height = metrics.height()
+        first = self.firstVisibleLine()
+        lines = self.mapped.lines(first, self.visibleLineCount() + 1)
+        gutter = self.lineNumberAreaWidth()
+
+        longestLine = self.longestLine
+        painter.setClipRect(gutter, 0, self.viewport().width() - gutter, self.viewport().height())
+        painter.setPen(QColor("#d4d4d4"))
+        x = gutter + 5 - self.horizontalScrollBar().value()
+        for i, text in enumerate(lines):
+            text = text.expandtabs(4)
+            longestLine = max(longestLine, len(text))
+            painter.drawText(x, i * height + metrics.ascent(), text)
+
+        painter.setClipping(False)
+        painter.setPen(QColor("#858585"))
+        for i in range(len(lines)):
+            painter.drawText(0, i * height, gutter - 5, height,
+                             Qt.AlignmentFlag.AlignRight, str(first + i + 1))
+        painter.end()
+
+        if longestLine != self.longestLine:
+            self.longestLine = longestLine
+            self.updateScrollRange()
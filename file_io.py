@@ -0,0 +1,846 @@
+import array
+import bisect
+import codecs
+import collections
+import concurrent.futures
+import difflib
+import hashlib
+import io
+import mmap
+import os
+import queue
+import stat
+import tempfile
+import threading
+
+
+# Files at least this large are loaded in chunks on a worker thread
+STREAM_LOAD_MIN_BYTES = 2 * 1024 * 1024
+# Characters in the first chunk; kept small so the first screenful shows at once
+FIRST_CHUNK_CHARS = 16 * 1024
+# Characters in every later chunk
+CHUNK_CHARS = 256 * 1024
+# Chunks the worker may read ahead of the GUI thread
+MAX_QUEUED_CHUNKS = 16
+# Characters of text handed to a SaveJob at a time
+SAVE_CHUNK_CHARS = 256 * 1024
+# Files an OpenBatchJob reads at the same time
+OPEN_WORKERS = 8
+
+# Files at least this large are opened in the read-only memory-mapped viewer
+MMAP_VIEW_MIN_BYTES = 128 * 1024 * 1024
+# Bytes covered by each entry of a line index
+INDEX_BLOCK_BYTES = 64 * 1024
+# Bytes a line index reads from the file at a time
+INDEX_CHUNK_BYTES = 16 * INDEX_BLOCK_BYTES
+# Where finished line indexes are kept for files opened again
+LINE_INDEX_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                                    'minicodeeditor', 'line-index')
+# Bytes hashed at each end of a file for its fingerprint
+FINGERPRINT_SAMPLE_BYTES = 64 * 1024
+# Changed regions without a unique line to match on are diffed with difflib up
+# to this many lines on either side and replaced whole beyond it
+MAX_DIFF_LINES = 2000
+
+# Bytes of a line a MappedFile decodes at most; the rest is not shown
+MAX_LINE_BYTES = 8 * 1024
+# Bytes shown on each line of a HexDump
+HEX_ROW_BYTES = 16
+
+# Bytes read from the start of a file to find out how its text is stored
+SNIFF_BYTES = 8 * 1024
+# Byte order marks and their encodings; UTF-32-LE first, its mark starts with UTF-16-LE's
+BOMS = ((codecs.BOM_UTF32_LE, 'utf-32-le'), (codecs.BOM_UTF32_BE, 'utf-32-be'),
+        (codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16-le'), (codecs.BOM_UTF16_BE, 'utf-16-be'))
+# Tried in order when a file without a byte order mark is not UTF-8; Latin-1
+# decodes any bytes and writes them back unchanged
+FALLBACK_ENCODINGS = ('cp1252', 'latin-1')
+
+
+class FileFormat:
+    """
+    How a file's text is stored on disk: its encoding, byte order mark and
+    line endings, or that it is not text at all.
+
+    Loading decodes with encoding after skipping bom and reads any line
+    ending as '\\n'; saving writes bom, then the text encoded with encoding
+    and '\\n' written as newline, so a file keeps its format when it is
+    saved. The default is what new files are saved as.
+    """
+    def __init__(self, encoding='utf-8', bom=b'', newline=os.linesep, binary=False):
+        self.encoding = encoding
+        self.bom = bom
+        self.newline = newline
+        self.binary = binary
+
+    @property
+    def ascii_compatible(self):
+        """False for UTF-16 and UTF-32, where b'\\n' does not mark a line end."""
+        return not self.encoding.startswith(('utf-16', 'utf-32'))
+
+    def describe(self):
+        """Return a short label such as 'UTF-8 with BOM, CRLF'."""
+        if self.binary:
+            return "Binary"
+        name = codecs.lookup(self.encoding).name.upper()
+        if self.bom:
+            name += " with BOM"
+        endings = {'\r\n': "CRLF", '\n': "LF", '\r': "CR"}
+        return "%s, %s" % (name, endings.get(self.newline, repr(self.newline)))
+
+
+def sniff_file(path):
+    """
+    Return the FileFormat of a file from its first SNIFF_BYTES.
+
+    A byte order mark decides the encoding. Without one, a NUL byte means
+    the file is binary, and text that is not valid UTF-8 is read with the
+    first of FALLBACK_ENCODINGS that decodes it. The most common line ending
+    in the sample is kept; a sample without any keeps the platform's.
+    Only the sample is checked, so a file that turns invalid further on
+    still fails to load.
+    """
+    with open(path, 'rb') as f:
+        sample = f.read(SNIFF_BYTES)
+    whole = len(sample) < SNIFF_BYTES
+
+    file_format = FileFormat()
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            file_format.encoding, file_format.bom = encoding, bom
+            break
+    else:
+        if b'\0' in sample:
+            file_format.binary = True
+            return file_format
+        try:
+            # A character cut off at the end of the sample is not an error
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=whole)
+        except UnicodeDecodeError:
+            for encoding in FALLBACK_ENCODINGS:
+                try:
+                    sample.decode(encoding)
+                except UnicodeDecodeError:
+                    continue
+                file_format.encoding = encoding
+                break
+
+    text = sample[len(file_format.bom):].decode(file_format.encoding, 'replace')
+    crlf = text.count('\r\n')
+    endings = {'\r\n': crlf, '\n': text.count('\n') - crlf, '\r': text.count('\r') - crlf}
+    newline = max(endings, key=endings.get)
+    if endings[newline]:
+        file_format.newline = newline
+    return file_format
+
+
+def open_text(path, file_format):
+    """
+    Open a file for reading as text in the given FileFormat, with universal
+    newlines. The byte order mark is skipped.
+    """
+    f = open(path, 'rb')
+    try:
+        f.seek(len(file_format.bom))
+        return io.TextIOWrapper(f, encoding=file_format.encoding)
+    except (OSError, LookupError):
+        f.close()
+        raise
+
+
+def read_file(path):
+    """
+    Find out how a file is stored and read it if it can go straight into an
+    editor. Returns (file_format, size, text); text is None for binary files
+    and files of STREAM_LOAD_MIN_BYTES or more.
+    """
+    file_format = sniff_file(path)
+    size = os.path.getsize(path)
+    text = None
+    if not file_format.binary and size < STREAM_LOAD_MIN_BYTES:
+        with open_text(path, file_format) as f:
+            text = f.read()
+    return file_format, size, text
+
+
+class OpenBatchJob:
+    """
+    Reads several files with read_file() on a pool of OPEN_WORKERS threads.
+
+    Opening many files takes about as long as the slowest of them rather
+    than all of them together. Results are queued as they come in as
+    (number, path, result, error) tuples, number being the position of
+    path in paths and result what read_file() returned, or None with the
+    exception in error. They are collected from the GUI thread with
+    take_results().
+    """
+    def __init__(self, paths, workers=OPEN_WORKERS):
+        self.paths = paths
+        self.workers = max(1, min(workers, len(paths)))
+        self.collected = 0
+        self._results = collections.deque()
+
+    def start(self):
+        executor = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix="OpenBatchJob")
+        for number, path in enumerate(self.paths):
+            future = executor.submit(read_file, path)
+            future.add_done_callback(lambda future, number=number, path=path: self._finish(number, path, future))
+        # The threads end once the queued files are read
+        executor.shutdown(wait=False)
+
+    @property
+    def done(self):
+        """True once every file has been read and collected."""
+        return self.collected == len(self.paths)
+
+    def take_results(self):
+        """Return the results queued since the last call."""
+        results = []
+        while self._results:
+            results.append(self._results.popleft())
+        self.collected += len(results)
+        return results
+
+    def _finish(self, number, path, future):
+        error = future.exception()
+        self._results.append((number, path, None if error else future.result(), error))
+
+
+class FileLoadJob:
+    """
+    Reads a text file in chunks in a background thread.
+
+    The file is decoded with universal newlines, exactly like
+    open_text(path, file_format).read(). Chunks are queued as
+    (text, bytes_read) tuples and collected from the GUI thread with
+    take_chunk(), so the job never touches Qt. At most MAX_QUEUED_CHUNKS are
+    read ahead; a slow consumer does not pull the whole file into memory
+    twice.
+
+    Errors raised while reading are stored in error and end the job.
+    """
+    def __init__(self, path, file_format=None):
+        self.path = path
+        self.file_format = file_format or FileFormat()
+        self.total_bytes = os.path.getsize(path)
+        self.error = None
+        self.finished = False
+        self._chunks = queue.Queue(MAX_QUEUED_CHUNKS)
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="FileLoadJob", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        """Stop reading; chunks already queued are dropped by the caller."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def done(self):
+        """True once the file has been read and every chunk collected."""
+        return self.finished and self._chunks.empty()
+
+    def take_chunk(self):
+        """Return the next (text, bytes_read) chunk, or None if none is ready."""
+        try:
+            return self._chunks.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _put(self, chunk):
+        # Wait for room in the queue, but give up as soon as the job is cancelled
+        while not self._cancelled.is_set():
+            try:
+                self._chunks.put(chunk, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(self):
+        try:
+            with open_text(self.path, self.file_format) as f:
+                size = FIRST_CHUNK_CHARS
+                while not self._cancelled.is_set():
+                    text = f.read(size)
+                    if not text:
+                        break
+                    if not self._put((text, f.buffer.tell())):
+                        break
+                    size = CHUNK_CHARS
+        except (OSError, LookupError, ValueError) as e:
+            # ValueError covers UnicodeDecodeError
+            self.error = e
+        finally:
+            self.finished = True
+
+
+_UMASK = None
+_UMASK_LOCK = threading.Lock()
+
+
+def _umask():
+    """Return the process umask, read once on first use."""
+    global _UMASK
+    with _UMASK_LOCK:
+        if _UMASK is None:
+            try:
+                # Linux reports it without changing it
+                with open('/proc/self/status') as f:
+                    _UMASK = next(int(line.split()[1], 8) for line in f if line.startswith('Umask:'))
+            except (OSError, StopIteration, ValueError, IndexError):
+                # Elsewhere it can only be read by setting it. Files other
+                # threads create meanwhile get the strictest mode, not 0666
+                _UMASK = os.umask(0o777)
+                os.umask(_UMASK)
+        return _UMASK
+
+
+class SaveJob:
+    """
+    Writes text to a file atomically in a background thread.
+
+    The text is handed over in chunks with write() and ended with
+    write(None), so the whole document never has to exist as one string;
+    the worker encodes each chunk with an incremental encoder and writes it
+    through a buffered file. At most MAX_QUEUED_CHUNKS chunks wait to be
+    written, which bounds the memory a save needs. The file is written in
+    file_format, byte order mark and line endings included.
+
+    Everything goes to a temporary file next to the target, is flushed to
+    disk with fsync and then renamed over the target with os.replace, so the
+    target holds either the old or the new content even if the editor or the
+    machine dies mid-save. Symlinks are followed and an existing file keeps
+    its permissions.
+
+    Errors are stored in error and end the job; the temporary file is
+    removed, as it is when the job is cancelled. The thread is not a daemon,
+    so a save still running when the editor quits is finished first; one
+    still waiting for text once the main thread has ended is cancelled, as
+    nothing is left to hand the text over.
+    """
+    def __init__(self, path, file_format=None):
+        self.path = path
+        self.file_format = file_format or FileFormat()
+        self.bytes_written = 0
+        self.error = None
+        self.finished = False
+        self._chunks = queue.Queue(MAX_QUEUED_CHUNKS)
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="SaveJob")
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        """Stop saving and leave the file as it was."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def wait(self):
+        """Block until the file has been written or the save has failed."""
+        self._thread.join()
+
+    def write(self, text, wait=False):
+        """
+        Queue text to be written, None once all of it has been. Returns False
+        if the queue is full, unless wait is set. Text queued after the job
+        has failed is dropped.
+        """
+        while not self.finished:
+            try:
+                if wait:
+                    self._chunks.put(text, timeout=0.1)
+                else:
+                    self._chunks.put_nowait(text)
+                return True
+            except queue.Full:
+                if not wait:
+                    return False
+        return True
+
+    def _run(self):
+        target = os.path.realpath(self.path)
+        directory = os.path.dirname(target)
+        temp_path = None
+        try:
+            fd, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(target) + '.',
+                                             suffix='.tmp', dir=directory)
+            with os.fdopen(fd, 'wb') as f:
+                newline = self.file_format.newline
+                encoder = codecs.getincrementalencoder(self.file_format.encoding)()
+                f.write(self.file_format.bom)
+                self.bytes_written += len(self.file_format.bom)
+                while True:
+                    text = self._take()
+                    if text is None:
+                        break
+                    if newline != '\n':
+                        text = text.replace('\n', newline)
+                    data = encoder.encode(text)
+                    f.write(data)
+                    self.bytes_written += len(data)
+                if self._cancelled.is_set():
+                    return
+                data = encoder.encode('', final=True)
+                f.write(data)
+                self.bytes_written += len(data)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates the file readable by its owner only
+            try:
+                mode = stat.S_IMODE(os.stat(target).st_mode)
+            except FileNotFoundError:
+                mode = 0o666 & ~_umask()
+            os.chmod(temp_path, mode)
+            os.replace(temp_path, target)
+            temp_path = None
+            self._sync_directory(directory)
+        except (OSError, LookupError, ValueError) as e:
+            # LookupError covers unknown encodings, ValueError UnicodeEncodeError
+            self.error = e
+        finally:
+            if temp_path:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            self.finished = True
+
+    def _take(self):
+        # Wait for the next chunk, but give up as soon as the job is cancelled
+        # or the main thread, which hands the chunks over, has ended
+        while not self._cancelled.is_set():
+            try:
+                return self._chunks.get(timeout=0.1)
+            except queue.Empty:
+                if not threading.main_thread().is_alive():
+                    self._cancelled.set()
+        return None
+
+    @staticmethod
+    def _sync_directory(directory):
+        # Makes the rename itself durable; not possible on every platform
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        try:
+            fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def file_stamp(path):
+    """Return (size, mtime_ns) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def line_edits(old_lines, new_lines):
+    """
+    Return the edits turning old_lines into new_lines as
+    (first, last, lines) tuples, each replacing old lines first to last
+    (exclusive) with lines. The edits are ordered last first, so applying
+    them in order keeps the line numbers of the remaining ones valid.
+
+    This is a patience diff: after skipping the common head and tail, lines
+    found exactly once on both sides are matched up in order and the gaps
+    between them are diffed the same way. That stays close to linear even
+    for large files full of repeated lines such as blank lines and braces.
+    Gaps without such lines are left to difflib up to MAX_DIFF_LINES lines
+    and replaced whole beyond that.
+    """
+    edits = []
+    _diff_lines(old_lines, 0, len(old_lines), new_lines, 0, len(new_lines), edits)
+    edits.reverse()
+    return edits
+
+
+def _diff_lines(old, old_first, old_last, new, new_first, new_last, edits):
+    while old_first < old_last and new_first < new_last and old[old_first] == new[new_first]:
+        old_first += 1
+        new_first += 1
+    while old_first < old_last and new_first < new_last and old[old_last - 1] == new[new_last - 1]:
+        old_last -= 1
+        new_last -= 1
+    if old_first == old_last or new_first == new_last:
+        if old_first != old_last or new_first != new_last:
+            edits.append((old_first, old_last, new[new_first:new_last]))
+        return
+
+    anchors = _unique_matches(old, old_first, old_last, new, new_first, new_last)
+    if not anchors:
+        if old_last - old_first > MAX_DIFF_LINES or new_last - new_first > MAX_DIFF_LINES:
+            edits.append((old_first, old_last, new[new_first:new_last]))
+            return
+        matcher = difflib.SequenceMatcher(None, old[old_first:old_last], new[new_first:new_last], autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag != 'equal':
+                edits.append((old_first + i1, old_first + i2, new[new_first + j1:new_first + j2]))
+        return
+    for old_anchor, new_anchor in anchors:
+        # Most gaps between matches are unchanged, compare them in C first
+        if (old_anchor - old_first != new_anchor - new_first
+                or old[old_first:old_anchor] != new[new_first:new_anchor]):
+            _diff_lines(old, old_first, old_anchor, new, new_first, new_anchor, edits)
+        old_first, new_first = old_anchor + 1, new_anchor + 1
+    _diff_lines(old, old_first, old_last, new, new_first, new_last, edits)
+
+
+def _unique_matches(old, old_first, old_last, new, new_first, new_last):
+    # Lines found once on each side, as (old index, new index) pairs;
+    # Counter does the counting in C
+    old_segment = old[old_first:old_last]
+    new_segment = new[new_first:new_last]
+    new_counts = collections.Counter(new_segment)
+    unique = {line for line, count in collections.Counter(old_segment).items()
+              if count == 1 and new_counts[line] == 1}
+    if not unique:
+        return []
+    new_index = {line: j for j, line in enumerate(new_segment, new_first) if line in unique}
+    pairs = [(i, new_index[line]) for i, line in enumerate(old_segment, old_first) if line in unique]
+
+    # Longest run of pairs in order on both sides, by patience sorting
+    tops = []
+    top_pairs = []
+    previous = {}
+    for pair in pairs:
+        pile = bisect.bisect_left(tops, pair[1])
+        if pile == len(tops):
+            tops.append(pair[1])
+            top_pairs.append(pair)
+        else:
+            tops[pile] = pair[1]
+            top_pairs[pile] = pair
+        previous[pair] = top_pairs[pile - 1] if pile else None
+    matches = []
+    pair = top_pairs[-1] if top_pairs else None
+    while pair:
+        matches.append(pair)
+        pair = previous[pair]
+    matches.reverse()
+    return matches
+
+
+def file_fingerprint(path):
+    """
+    Return a cheap fingerprint of a file's content.
+
+    It combines the size, the modification time and a hash of the first and
+    last FINGERPRINT_SAMPLE_BYTES, so it is computed without reading the
+    whole file.
+    """
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        if stat.st_size > FINGERPRINT_SAMPLE_BYTES:
+            f.seek(max(FINGERPRINT_SAMPLE_BYTES, stat.st_size - FINGERPRINT_SAMPLE_BYTES))
+            digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+    return "%d-%d-%s" % (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+
+
+class ReloadJob:
+    """
+    Rereads a file that changed on disk in a background thread.
+
+    The file is sniffed and decoded again, and line_edits() turns old_lines,
+    a snapshot of the editor's text split at '\\n', into the new content.
+    The GUI thread applies edits once finished is set, so only the lines that
+    changed are touched. stamp is the file_stamp() from before the file was
+    read. Errors, a file that is no longer text included, are stored in
+    error.
+    """
+    def __init__(self, path, old_lines):
+        self.path = path
+        self.old_lines = old_lines
+        self.file_format = None
+        self.stamp = None
+        self.edits = None
+        self.error = None
+        self.finished = False
+        self._thread = threading.Thread(target=self._run, name="ReloadJob", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.stamp = file_stamp(self.path)
+            self.file_format = sniff_file(self.path)
+            if self.file_format.binary:
+                raise ValueError("the file is no longer text")
+            with open_text(self.path, self.file_format) as f:
+                new_lines = f.read().split('\n')
+            self.edits = line_edits(self.old_lines, new_lines)
+        except (OSError, LookupError, ValueError) as e:
+            self.error = e
+        finally:
+            self.old_lines = None
+            self.finished = True
+
+
+class LineIndex:
+    """
+    Number of newlines before every INDEX_BLOCK_BYTES block of a file.
+
+    The index is built in a background thread that reads the file
+    INDEX_CHUNK_BYTES at a time and counts newlines with bytes.count, which
+    runs in C. Finished indexes are saved in cache_dir under the file's
+    fingerprint, so reopening an unchanged file loads its index instead of
+    scanning it again. It holds one integer per block rather than one per
+    line; line_block() narrows a line down to its block and the caller scans
+    that block.
+
+    line_count grows while the file is scanned and is final once indexed is
+    True. Lines are counted by b'\\n', so the encoding must be ASCII
+    compatible.
+    """
+    def __init__(self, path, cache_dir=LINE_INDEX_CACHE_DIR):
+        self.path = path
+        self.cache_dir = cache_dir
+        self.size = os.path.getsize(path)
+        # newlines[i] is the number of newlines in the first i blocks
+        self.newlines = array.array('q', [0])
+        self.indexed = False
+        self.from_cache = False
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="LineIndex", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def line_count(self):
+        """Number of lines found so far."""
+        return self.newlines[-1] + 1
+
+    @property
+    def indexed_bytes(self):
+        return min(self.size, (len(self.newlines) - 1) * INDEX_BLOCK_BYTES)
+
+    def line_block(self, number):
+        """
+        Return (block, newlines before the block) for the block where line
+        number starts, or None if the index does not reach that line yet.
+        """
+        if number == 0:
+            return 0, 0
+        newlines = self.newlines
+        # The first block boundary at or past the number-th newline
+        boundary = bisect.bisect_left(newlines, number, 0, len(newlines))
+        if boundary == len(newlines):
+            return None
+        return boundary - 1, newlines[boundary - 1]
+
+    def cache_path(self):
+        name = hashlib.sha1(os.path.realpath(self.path).encode('utf-8', 'surrogateescape')).hexdigest()
+        return os.path.join(self.cache_dir, name + '.idx')
+
+    def _run(self):
+        try:
+            fingerprint = file_fingerprint(self.path)
+        except OSError:
+            fingerprint = None
+        if fingerprint and self._load(fingerprint):
+            self.from_cache = True
+        elif not self._scan():
+            return
+        self.indexed = True
+        if fingerprint and not self.from_cache:
+            self._save(fingerprint)
+
+    def _scan(self):
+        newlines = self.newlines
+        total = 0
+        buffer = bytearray(INDEX_CHUNK_BYTES)
+        view = memoryview(buffer)
+        try:
+            with open(self.path, 'rb', buffering=0) as f:
+                while not self._cancelled.is_set():
+                    # Reads can come back short, on network file systems
+                    # say; each block must be counted whole
+                    size = 0
+                    while size < INDEX_CHUNK_BYTES:
+                        read = f.readinto(view[size:])
+                        if not read:
+                            break
+                        size += read
+                    if not size:
+                        return True
+                    for start in range(0, size, INDEX_BLOCK_BYTES):
+                        total += buffer.count(b'\n', start, min(start + INDEX_BLOCK_BYTES, size))
+                        newlines.append(total)
+        except OSError:
+            pass
+        return False
+
+    def _load(self, fingerprint):
+        # Header line: fingerprint and block size, then the raw array
+        try:
+            with open(self.cache_path(), 'rb') as f:
+                header = f.readline().decode('ascii', 'replace').split()
+                if header != [fingerprint, str(INDEX_BLOCK_BYTES)]:
+                    return False
+                newlines = array.array('q')
+                newlines.frombytes(f.read())
+        except (OSError, ValueError):
+            return False
+        blocks = -(-self.size // INDEX_BLOCK_BYTES)
+        if len(newlines) != blocks + 1:
+            return False
+        self.newlines = newlines
+        return True
+
+    def _save(self, fingerprint):
+        path = self.cache_path()
+        temp_path = path + '.tmp'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                f.write(("%s %d\n" % (fingerprint, INDEX_BLOCK_BYTES)).encode('ascii'))
+                self.newlines.tofile(f)
+            os.replace(temp_path, path)
+        except OSError:
+            # Only a cache, the index is simply rebuilt next time
+            pass
+
+
+class MappedFile:
+    """
+    Read-only, memory-mapped file addressed by line number.
+
+    Nothing is read up front: a LineIndex locates the lines, and lines()
+    seeks through it and decodes only the lines asked for. Only the pages
+    that are looked at get mapped in, so memory use stays flat whatever the
+    file size. line_count grows while the file is being indexed; lines past
+    the indexed part are not available yet. The encoding must be ASCII
+    compatible, see FileFormat.ascii_compatible.
+    """
+    def __init__(self, path, file_format=None):
+        self.path = path
+        self.file_format = file_format or FileFormat()
+        self._file = open(path, 'rb')
+        try:
+            self.size = os.fstat(self._file.fileno()).st_size
+            # Empty files cannot be mapped
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+            if self.size and hasattr(mmap, 'MADV_RANDOM'):
+                # Pages are read where the view seeks to, read-ahead only wastes memory
+                self._map.madvise(mmap.MADV_RANDOM)
+            self.index = LineIndex(path)
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+
+    def start(self):
+        """Start indexing the file in the background."""
+        self.index.start()
+
+    def close(self):
+        self.index.cancel()
+        if self.size:
+            self._map.close()
+        self._file.close()
+
+    @property
+    def indexed(self):
+        return self.index.indexed
+
+    @property
+    def line_count(self):
+        """Number of lines found so far; final once indexed is True."""
+        return self.index.line_count
+
+    def line_offset(self, number):
+        """Return the byte offset where line number starts, or None if it is not indexed yet."""
+        found = self.index.line_block(number)
+        if found is None:
+            return None
+        block, newlines = found
+        position = block * INDEX_BLOCK_BYTES
+        for _ in range(number - newlines):
+            position = self._map.find(b'\n', position) + 1
+        return position
+
+    def lines(self, first, count):
+        """Decode up to count lines from line first on."""
+        lines = []
+        position = self.line_offset(first)
+        if position is None:
+            return lines
+        if first == 0:
+            position = len(self.file_format.bom)
+        encoding = self.file_format.encoding
+        data = self._map
+        last = min(first + count, self.line_count)
+        for number in range(first, last):
+            end = data.find(b'\n', position, position + MAX_LINE_BYTES)
+            if end == -1:
+                # Overlong or last line, decode its start and seek past it
+                end = min(position + MAX_LINE_BYTES, self.size)
+                following = self.line_offset(number + 1) if number + 1 < last else None
+            else:
+                following = end + 1
+            text = data[position:end]
+            if text.endswith(b'\r'):
+                text = text[:-1]
+            lines.append(text.decode(encoding, 'replace'))
+            if following is None:
+                break
+            position = following
+        return lines
+
+
+class HexDump(MappedFile):
+    """
+    Read-only, memory-mapped hex dump of a file, for binary files.
+
+    Works like a MappedFile whose lines are rows of HEX_ROW_BYTES bytes:
+    the offset, the bytes in hex and the printable ASCII ones. Rows are at
+    fixed offsets, so nothing needs indexing.
+    """
+    indexed = True
+
+    def __init__(self, path):
+        super().__init__(path, FileFormat(binary=True))
+
+    def start(self):
+        pass
+
+    @property
+    def line_count(self):
+        return max(1, -(-self.size // HEX_ROW_BYTES))
+
+    def line_offset(self, number):
+        return number * HEX_ROW_BYTES
+
+    def lines(self, first, count):
+        lines = []
+        half = HEX_ROW_BYTES // 2
+        for number in range(first, min(first + count, self.line_count)):
+            offset = number * HEX_ROW_BYTES
+            row = self._map[offset:offset + HEX_ROW_BYTES]
+            hex_bytes = row[:half].hex(' ') + '  ' + row[half:].hex(' ')
+            text = ''.join(chr(byte) if 32 <= byte < 127 else '.' for byte in row)
+            lines.append("%08x  %-*s  |%s|" % (offset, HEX_ROW_BYTES * 3, hex_bytes, text))
+        return lines
@@ -0,0 +1,346 @@
+import functools
+import os
+import time
+import types
+
+from file_io import FileLoadJob, LineIndex, ReloadJob, SaveJob, SAVE_CHUNK_CHARS
+
+
+# Seconds spent appending loaded text per event loop iteration
+LOAD_TIME_SLICE = 0.016
+# Seconds spent handing blocks to a save per event loop iteration
+SAVE_TIME_SLICE = 0.016
+# Milliseconds without further changes before a file changed on disk is reloaded
+WATCH_DEBOUNCE_MS = 300
+
+
+@functools.lru_cache(maxsize=None)
+def file_tasks(QtCore, QtGui):
+    """
+    Return the Qt side of the file_io jobs for one Qt binding, given its
+    QtCore and QtGui modules, as a namespace of classes. Both editors use
+    these, Coder-v0.py with PyQt5 and main.py with PyQt6, and subclass them
+    where their editors differ; only scoped enum names are used, which both
+    bindings accept.
+    """
+    QObject, QTimer, pyqtSignal = QtCore.QObject, QtCore.QTimer, QtCore.pyqtSignal
+    QFileSystemWatcher = QtCore.QFileSystemWatcher
+    QTextCursor = QtGui.QTextCursor
+
+    def apply_line_edits(document, edits):
+        """
+        Applies (first, last, lines) edits from file_io.line_edits() to a
+        QTextDocument as one undo step. Lines outside the edits are not
+        touched, so the cursor, the scroll position and their highlighting
+        stay as they are.
+        """
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        for first, last, lines in edits:
+            count = document.blockCount()
+            if first == count:
+                cursor.movePosition(QTextCursor.MoveOperation.End)
+                cursor.insertText(''.join('\n' + line for line in lines))
+                continue
+            start = document.findBlockByNumber(first).position()
+            if last < count:
+                end = document.findBlockByNumber(last).position()
+                text = ''.join(line + '\n' for line in lines)
+            else:
+                # Up to the end of the text, which has no newline to keep
+                end = document.characterCount() - 1
+                text = '\n'.join(lines)
+                if not lines and first:
+                    start -= 1
+            cursor.setPosition(start)
+            cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+            cursor.insertText(text)
+        cursor.endEditBlock()
+
+    class FileLoader(QObject):
+        """
+        Streams a file into an editor from a FileLoadJob.
+
+        The job reads and decodes the file on a worker thread; the loader
+        appends the chunks to the document from a timer, LOAD_TIME_SLICE at a
+        time, so the first screenful shows at once and the window stays
+        responsive. Subclasses provide begin_loading() and end_loading(),
+        which hand the editor to the loader and back.
+        """
+        progress = pyqtSignal(int)
+        finished = pyqtSignal()
+        failed = pyqtSignal(str)
+
+        def __init__(self, editor, path, file_format, parent=None):
+            super().__init__(parent)
+            self.editor = editor
+            self.path = path
+            self.percent = 0
+            self.job = FileLoadJob(path, file_format)
+            # Knows the number of lines long before the text is all in
+            self.line_index = LineIndex(path)
+            self.timer = QTimer(self)
+            self.timer.timeout.connect(self.append_chunks)
+
+        def start(self):
+            self.begin_loading()
+            self.line_index.start()
+            self.job.start()
+            self.timer.start(0)
+
+        def cancel(self):
+            """Stop loading and leave the editor with what was read so far."""
+            self.job.cancel()
+            self.line_index.cancel()
+            self.timer.stop()
+            self.end_loading()
+
+        def append_chunks(self):
+            """Append the chunks read so far for one time slice."""
+            deadline = time.perf_counter() + LOAD_TIME_SLICE
+            cursor = QTextCursor(self.editor.document())
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            bytes_read = None
+            while time.perf_counter() < deadline:
+                chunk = self.job.take_chunk()
+                if chunk is None:
+                    break
+                text, bytes_read = chunk
+                cursor.insertText(text)
+
+            if bytes_read is not None and self.job.total_bytes:
+                self.percent = bytes_read * 100 // self.job.total_bytes
+                self.progress.emit(self.percent)
+            # Poll less often while waiting for the disk
+            self.timer.setInterval(0 if bytes_read is not None else 10)
+
+            if self.job.done:
+                self.timer.stop()
+                self.end_loading()
+                if self.job.error:
+                    self.failed.emit(str(self.job.error))
+                else:
+                    self.finished.emit()
+
+    class FileSaver(QObject):
+        """
+        Saves an editor's text with a SaveJob.
+
+        The document is read on the GUI thread, SAVE_TIME_SLICE at a time,
+        in runs of whole blocks of about SAVE_CHUNK_CHARS characters, which
+        the job encodes and writes on a worker thread. The whole text is
+        never copied into one string. The editor is read-only until the file
+        is on disk and finished or failed is emitted.
+        """
+        progress = pyqtSignal()
+        finished = pyqtSignal()
+        failed = pyqtSignal(str)
+
+        def __init__(self, editor, path, file_format, parent=None):
+            super().__init__(parent)
+            self.editor = editor
+            self.path = path
+            self.job = SaveJob(path, file_format)
+            # Where the next chunk starts, None once all of them are taken
+            self.position = 0
+            self.chunk = None
+            self.ended = False
+            self.started_at = None
+            self.timer = QTimer(self)
+            self.timer.timeout.connect(self.write_blocks)
+
+        def start(self):
+            self.editor.saver = self
+            # The blocks must not change while they are written
+            self.editor.setReadOnly(True)
+            self.started_at = time.perf_counter()
+            self.job.start()
+            self.timer.start(0)
+
+        def wait(self):
+            """Blocks until the file is written and reports the result at once."""
+            self.timer.stop()
+            self.write_blocks(wait=True)
+            self.job.wait()
+            self.check()
+
+        @property
+        def percent(self):
+            """Share of the text handed to the job so far."""
+            if self.position is None:
+                return 100
+            return self.position * 100 // self.editor.document().characterCount()
+
+        def throughput(self):
+            """Returns the bytes written per second so far."""
+            seconds = time.perf_counter() - self.started_at
+            return self.job.bytes_written / seconds if seconds > 0 else 0
+
+        def next_chunk(self):
+            document = self.editor.document()
+            # Up to the end of the block SAVE_CHUNK_CHARS further on
+            block = document.findBlock(self.position + SAVE_CHUNK_CHARS)
+            if not block.isValid():
+                block = document.lastBlock()
+            end = block.position() + block.length() - 1
+            cursor = QTextCursor(document)
+            cursor.setPosition(self.position)
+            cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+            # selectedText() separates blocks with U+2029; Shift+Enter puts
+            # U+2028 line separators inside a block
+            text = cursor.selectedText().replace('\u2029', '\n').replace('\u2028', '\n')
+            if block == document.lastBlock():
+                self.position = None
+                return text
+            self.position = end + 1
+            return text + '\n'
+
+        def write_blocks(self, wait=False):
+            deadline = time.perf_counter() + SAVE_TIME_SLICE
+            while self.position is not None or self.chunk is not None:
+                if self.chunk is None:
+                    self.chunk = self.next_chunk()
+                if not self.job.write(self.chunk, wait):
+                    break
+                self.chunk = None
+                if not wait and time.perf_counter() > deadline:
+                    break
+            if self.position is None and self.chunk is None and not self.ended:
+                self.ended = self.job.write(None, wait)
+            if self.ended:
+                # Only the worker is left, poll it less often
+                self.timer.setInterval(10)
+            self.progress.emit()
+            self.check()
+
+        def check(self):
+            if not self.job.finished or self.editor.saver is not self:
+                return
+            self.timer.stop()
+            self.editor.saver = None
+            self.editor.setReadOnly(False)
+            if self.job.error:
+                self.failed.emit(str(self.job.error))
+            elif self.job.cancelled:
+                self.failed.emit("the save was cancelled")
+            else:
+                self.finished.emit()
+
+    class FileReloader(QObject):
+        """
+        Rereads an editor's file after it changed on disk, with a ReloadJob.
+
+        The job decodes the file and diffs it against a snapshot of the text
+        on a worker thread; the editor is read-only meanwhile, so the snapshot
+        stays valid. Only the lines that differ are then replaced, in one undo
+        step, before finished is emitted; job.file_format is the format the
+        file was read in.
+        """
+        finished = pyqtSignal()
+        failed = pyqtSignal(str)
+
+        def __init__(self, editor, path, parent=None):
+            super().__init__(parent)
+            self.editor = editor
+            self.path = path
+            # toPlainText() would also break lines at U+2028, out of step with
+            # the blocks the edits are applied to
+            text = editor.document().toRawText().replace('\u2029', '\n')
+            self.job = ReloadJob(path, text.split('\n'))
+            self.timer = QTimer(self)
+            self.timer.timeout.connect(self.check)
+
+        def start(self):
+            self.editor.reloader = self
+            self.editor.setReadOnly(True)
+            self.job.start()
+            self.timer.start(10)
+
+        def cancel(self):
+            """Stop waiting for the job and leave the editor as it is."""
+            self.timer.stop()
+            self.editor.reloader = None
+            self.editor.setReadOnly(False)
+
+        def check(self):
+            if not self.job.finished:
+                return
+            self.cancel()
+            if self.job.error:
+                self.failed.emit(str(self.job.error))
+                return
+            apply_line_edits(self.editor.document(), self.job.edits)
+            self.finished.emit()
+
+    class FileWatcher(QObject):
+        """
+        Reports changes made to the open files by other programs.
+
+        Wraps a QFileSystemWatcher. Programs often write a file in several
+        steps, so changed is emitted once per path when no change has come in
+        for WATCH_DEBOUNCE_MS. Saving by renaming a new file over the old
+        one, or deleting and recreating it, drops the path from
+        QFileSystemWatcher; the directories are watched as well so it is
+        picked up again once it is back.
+        """
+        changed = pyqtSignal(str)
+
+        def __init__(self, parent=None):
+            super().__init__(parent)
+            self.watcher = QFileSystemWatcher(self)
+            self.watcher.fileChanged.connect(self.queue_change)
+            self.watcher.directoryChanged.connect(self.check_directory)
+            # Watched paths by directory
+            self.directories = {}
+            self.pending = {}
+            self.timer = QTimer(self)
+            self.timer.setSingleShot(True)
+            self.timer.setInterval(WATCH_DEBOUNCE_MS)
+            self.timer.timeout.connect(self.emit_changes)
+
+        def watch(self, path):
+            directory = os.path.dirname(os.path.abspath(path))
+            paths = self.directories.setdefault(directory, set())
+            if path in paths:
+                return
+            if not paths:
+                self.watcher.addPath(directory)
+            paths.add(path)
+            self.watcher.addPath(path)
+
+        def unwatch(self, path):
+            directory = os.path.dirname(os.path.abspath(path))
+            paths = self.directories.get(directory, set())
+            if path not in paths:
+                return
+            paths.remove(path)
+            if not paths:
+                del self.directories[directory]
+                self.watcher.removePath(directory)
+            if path in self.watcher.files():
+                self.watcher.removePath(path)
+            self.pending.pop(path, None)
+
+        def queue_change(self, path):
+            self.pending[path] = None
+            self.timer.start()
+
+        def check_directory(self, directory):
+            """Queues the watched files of a directory that were dropped and exist again."""
+            files = self.watcher.files()
+            for path in self.directories.get(directory, ()):
+                if path not in files and os.path.exists(path):
+                    self.queue_change(path)
+
+        def emit_changes(self):
+            pending, self.pending = self.pending, {}
+            files = self.watcher.files()
+            for path in pending:
+                if path not in self.directories.get(os.path.dirname(os.path.abspath(path)), ()):
+                    continue
+                if path not in files and os.path.exists(path):
+                    self.watcher.addPath(path)
+                self.changed.emit(path)
+
+    return types.SimpleNamespace(FileLoader=FileLoader, FileSaver=FileSaver, FileReloader=FileReloader,
+                                 FileWatcher=FileWatcher, apply_line_edits=apply_line_edits)
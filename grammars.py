@@ -0,0 +1,670 @@
+# Language grammars for the Coder-v0 rule highlighters.
+#
+# Each grammar is plain data and is only compiled (formats and a
+# RuleTokenizer) the first time a file of that language is opened.
+#
+#   extensions:    file extensions that use the grammar
+#   formats:       format name -> "#color" followed by any of bold, italic,
+#                  underline
+#   rules:         (pattern, format_name) or (pattern, format_name, group)
+#                  tuples, where group is the capture group to color; the
+#                  rest of the match is left to the other rules. A list
+#                  of words instead of a pattern colors those keywords.
+#                  Later rules take precedence over earlier ones.
+#   block_comment: optional (start_pattern, end_pattern, format_name) for
+#                  comments spanning several lines
+#   ignore_case:   optional, match the rules and keywords case-insensitively
+
+GRAMMARS = {
+    'python': {
+        'extensions': ('.py',),
+        # Formats for different token types
+        'formats': {
+            "keyword": "#569CD6 bold",  # Blue
+            "string": "#CE9178",        # Orange
+            "comment": "#6A9955",       # Green
+            "class": "#C678DD bold",    # Purple
+            "function": "#DCDCAA",      # Yellow
+            "numbers": "#B5CEA8",       # Light Green
+        },
+        'rules': [
+            # Python Keywords
+            ([
+                'False', 'None', 'True', 'and', 'as', 'assert', 'async', 'await',
+                'break', 'class', 'continue', 'def', 'del', 'elif', 'else',
+                'except', 'finally', 'for', 'from', 'global', 'if', 'import',
+                'in', 'is', 'lambda', 'nonlocal', 'not', 'or', 'pass', 'raise',
+                'return', 'try', 'while', 'with', 'yield'
+            ], "keyword"),
+            # Add rules for built-in functions, types and constants
+            ([
+                'print', 'len', 'range', 'list', 'dict', 'tuple', 'set', 'str',
+                'int', 'float', 'bool', 'type', 'open', 'range', 'dir',
+                'abs', 'id', 'sum'
+            ], "function"),
+            # Rules for Class definition
+            (r'\bclass\b\s+([A-Za-z_][A-Za-z0-9_]*)', "class"),
+            # Rules for Function definition
+            (r'\bdef\b\s+([A-Za-z_][A-Za-z0-9_]*)', "function"),
+            # String literals (single and double quotes)
+            (r'\"[^\"]*\"', "string"),
+            (r'\'[^\']*\'', "string"),
+            # Numbers
+            (r'\b[0-9]+\b', "numbers"),
+            # Comments
+            (r'#.*', "comment"),
+        ],
+    },
+
+    'javascript': {
+        'extensions': ('.js',),
+        'formats': {
+            "keyword": "#C586C0",         # Purple
+            "control_flow": "#C586C0",    # Purple
+            "built_in": "#569CD6",        # Blue
+            "string": "#CE9178",          # Orange
+            "comment": "#6A9955",         # Green
+            "numbers": "#B5CEA8",         # Light Green
+            "class_function": "#DCDCAA",  # Yellow
+        },
+        'rules': [
+            ([
+                'var', 'let', 'const', 'function', 'class', 'import', 'export', 'of',
+                'from', 'as', 'await', 'async'
+            ], "keyword"),
+            ([
+                'if', 'else', 'for', 'while', 'do', 'switch', 'case', 'break',
+                'continue', 'return', 'try', 'catch', 'finally', 'with'
+            ], "control_flow"),
+            ([
+                'this', 'window', 'document', 'console', 'log', 'new', 'null', 'undefined',
+                'true', 'false'
+            ], "built_in"),
+            # Rules for class/function names
+            (r'\b(?:class|function)\s+([A-Za-z_][A-Za-z0-9_]*)', "class_function"),
+            (r'\b([A-Za-z_][A-Za-z0-9_]*)\s*\(', "class_function"),
+            # String literals
+            (r'\"[^\"]*\"', "string"),
+            (r'\'[^\']*\'', "string"),
+            (r'`[^`]*`', "string"),  # Backticks for template literals
+            # Numbers
+            (r'\b[0-9]+\b', "numbers"),
+            # Single-line comments
+            (r'//.*', "comment"),
+        ],
+        # Multi-line comments
+        'block_comment': (r'/\*', r'\*/', "comment"),
+    },
+
+    'cpp': {
+        'extensions': ('.cpp', '.h'),
+        'formats': {
+            "keyword": "#C586C0 bold",  # Purple
+            "type": "#569CD6",          # Blue
+            "string": "#CE9178",        # Orange
+            "comment": "#6A9955",       # Green
+            "numbers": "#B5CEA8",       # Light Green
+        },
+        'rules': [
+            ([
+                'alignas', 'alignof', 'and', 'and_eq', 'asm', 'auto', 'bitand', 'bitor', 'bool', 'break',
+                'case', 'catch', 'char', 'char16_t', 'char32_t', 'class', 'const', 'constexpr', 'const_cast',
+                'continue', 'decltype', 'default', 'delete', 'do', 'double', 'dynamic_cast', 'else', 'enum',
+                'explicit', 'export', 'extern', 'false', 'final', 'float', 'for', 'friend', 'goto', 'if',
+                'inline', 'int', 'long', 'mutable', 'namespace', 'new', 'noexcept', 'not', 'not_eq', 'nullptr',
+                'operator', 'or', 'or_eq', 'private', 'protected', 'public', 'register', 'reinterpret_cast',
+                'return', 'short', 'signed', 'sizeof', 'static', 'static_assert', 'static_cast', 'struct',
+                'switch', 'template', 'this', 'thread_local', 'throw', 'true', 'try', 'typedef', 'typeid',
+                'typename', 'union', 'unsigned', 'using', 'virtual', 'void', 'volatile', 'wchar_t', 'while',
+                'xor', 'xor_eq'
+            ], "keyword"),
+            ([
+                'int', 'long', 'short', 'double', 'float', 'char', 'bool', 'void',
+                'string', 'vector', 'map', 'set', 'pair'
+            ], "type"),
+            # String literals (double quotes)
+            (r'\"[^\"]*\"', "string"),
+            # Numbers
+            (r'\b[0-9]+\b', "numbers"),
+            # Single-line comments
+            (r'//.*', "comment"),
+        ],
+        # Multi-line comment highlighting
+        'block_comment': (r'/\*', r'\*/', "comment"),
+    },
+
+    'html': {
+        'extensions': ('.html', '.htm'),
+        'formats': {
+            "tag": "#569CD6",        # Blue for tags like <html>
+            "attribute": "#9CDCFE",  # Light Blue for attributes like href
+            "string": "#CE9178",     # Orange for attribute values
+            "comment": "#6A9955",    # Green for comments
+        },
+        'rules': [
+            # Tag names: e.g., <p>, <div>, <h1>
+            (r'<([a-zA-Z0-9]+)', "tag"),
+            (r'</([a-zA-Z0-9]+)>', "tag"),
+            # Attribute names: e.g., href, class, id
+            (r'([a-zA-Z0-9]+)=', "attribute"),
+            # String literals for attribute values
+            (r'\"[^\"]*\"', "string"),
+            (r'\'[^\']*\'', "string"),
+            # HTML Comments
+            (r'<!--.*-->', "comment"),
+        ],
+    },
+
+    'css': {
+        'extensions': ('.css',),
+        'formats': {
+            "selector": "#D7BA7D",  # Yellow
+            "property": "#9CDCFE",  # Light Blue
+            "value": "#CE9178",     # Orange
+            "string": "#CE9178",    # Orange
+            "comment": "#6A9955",   # Green
+            "at_rule": "#C586C0",   # Purple
+        },
+        'rules': [
+            # Selectors (classes and IDs)
+            (r'\.[a-zA-Z0-9_-]+', "selector"),
+            (r'#[a-zA-Z0-9_-]+', "selector"),
+            # Property names
+            (r'\b[a-zA-Z-]+(?=:)', "property"),
+            # Values (not strings)
+            (r':\s*([^;]+);', "value"),
+            # String literals
+            (r'\"[^\"]*\"', "string"),
+            (r'\'[^\']*\'', "string"),
+            # At-rules like @media, @import
+            (r'@[a-zA-Z]+', "at_rule"),
+        ],
+        # Multi-line comments
+        'block_comment': (r'/\*', r'\*/', "comment"),
+    },
+
+    'json': {
+        'extensions': ('.json',),
+        'formats': {
+            "key": "#9CDCFE",           # Light Blue
+            "string_value": "#CE9178",  # Orange
+            "number_value": "#B5CEA8",  # Light Green
+            "boolean_null": "#569CD6",  # Blue
+        },
+        'rules': [
+            # Keys in double quotes followed by a colon
+            (r'(\"[^\"]+\")\s*(?=:)', "key", 1),
+            # String values
+            (r':\s*\"[^\"]*\"', "string_value"),
+            # Number values
+            (r'\b[0-9.]+\b', "number_value"),
+            # Boolean and null values
+            (r'\b(true|false|null)\b', "boolean_null"),
+        ],
+    },
+
+    'bash': {
+        'extensions': ('.sh', '.bash'),
+        'formats': {
+            "keyword": "#C586C0",   # Purple
+            "command": "#569CD6",   # Blue
+            "variable": "#9CDCFE",  # Light Blue
+            "string": "#CE9178",    # Orange
+            "comment": "#6A9955",   # Green
+            "numbers": "#B5CEA8",   # Light Green
+        },
+        'rules': [
+            # Keywords (control flow)
+            ([
+                'if', 'then', 'else', 'elif', 'fi', 'for', 'while', 'do', 'done',
+                'case', 'esac', 'in', 'until', 'function'
+            ], "keyword"),
+            # Common shell commands
+            ([
+                'ls', 'cd', 'pwd', 'echo', 'cat', 'grep', 'find', 'sudo', 'apt-get', 'yum', 'git'
+            ], "command"),
+            # Variables
+            (r'\$\b[a-zA-Z_][a-zA-Z0-9_]*\b', "variable"),
+            # String literals (single and double quotes)
+            (r'\"[^\"]*\"', "string"),
+            (r'\'[^\']*\'', "string"),
+            # Numbers
+            (r'\b[0-9]+\b', "numbers"),
+            # Comments
+            (r'#.*', "comment"),
+        ],
+    },
+
+    'markdown': {
+        'extensions': ('.md',),
+        'formats': {
+            "header": "#569CD6 bold",     # Blue
+            "bold": "#DCDCAA bold",       # Yellow
+            "italic": "#CE9178 italic",   # Orange
+            "link": "#4EC9B0 underline",  # Teal
+            "list_item": "#B5CEA8",       # Light Green
+        },
+        'rules': [
+            # Headers: #, ##, ###, etc.
+            (r'^(#+)\s+.*', "header"),
+            # Italic text: *text* or _text_ (only the content is colored)
+            (r'(\*|_)(.*?)\1', "italic", 2),
+            # Bold text: **text** or __text__, after italic so it takes precedence
+            (r'(\*\*|__)(.*?)\1', "bold", 2),
+            # Links: [text](link)
+            (r'\[(.*?)\]\((.*?)\)', "link", 2),
+            # List item markers: *, -, 1.
+            (r'^\s*([*-]|\d+\.)\s+', "list_item"),
+        ],
+    },
+
+    'xml': {
+        'extensions': ('.xml',),
+        'formats': {
+            "tag": "#569CD6",        # Blue
+            "attribute": "#9CDCFE",  # Light Blue
+            "string": "#CE9178",     # Orange
+            "comment": "#6A9955",    # Green
+        },
+        'rules': [
+            # Tag names
+            (r'<([a-zA-Z0-9_.-:]+)', "tag"),
+            (r'</([a-zA-Z0-9_.-:]+)>', "tag"),
+            # Attribute names
+            (r'([a-zA-Z0-9_.-]+)=', "attribute"),
+            # String literals for attribute values
+            (r'\"[^\"]*\"', "string"),
+            (r'\'[^\']*\'', "string"),
+            # XML Comments
+            (r'<!--.*-->', "comment"),
+        ],
+    },
+
+    'java': {
+        'extensions': ('.java',),
+        'formats': {
+            "keyword": "#C586C0",     # Purple
+            "type": "#569CD6",        # Blue
+            "string": "#CE9178",      # Orange
+            "comment": "#6A9955",     # Green
+            "numbers": "#B5CEA8",     # Light Green
+            "class_name": "#DCDCAA",  # Yellow
+        },
+        'rules': [
+            ([
+                'abstract', 'assert', 'break', 'case', 'catch', 'class', 'const', 'continue',
+                'default', 'do', 'else', 'enum', 'extends', 'final', 'finally', 'for',
+                'goto', 'if', 'implements', 'import', 'instanceof', 'interface', 'native',
+                'new', 'package', 'private', 'protected', 'public', 'return', 'static',
+                'strictfp', 'super', 'switch', 'synchronized', 'this', 'throw', 'throws',
+                'transient', 'try', 'void', 'volatile', 'while'
+            ], "keyword"),
+            ([
+                'boolean', 'byte', 'char', 'double', 'float', 'int', 'long', 'short'
+            ], "type"),
+            # Class names
+            (r'\bclass\s+([A-Za-z_][A-Za-z0-9_]*)', "class_name"),
+            # String literals
+            (r'\"[^\"]*\"', "string"),
+            # Numbers
+            (r'\b[0-9]+\b', "numbers"),
+            # Single-line comments
+            (r'//.*', "comment"),
+        ],
+        # Multi-line comment highlighting
+        'block_comment': (r'/\*', r'\*/', "comment"),
+    },
+
+    'ruby': {
+        'extensions': ('.rb',),
+        'formats': {
+            "keyword": "#C586C0",   # Purple
+            "method": "#DCDCAA",    # Yellow
+            "variable": "#9CDCFE",  # Light Blue
+            "string": "#CE9178",    # Orange
+            "comment": "#6A9955",   # Green
+            "symbol": "#4EC9B0",    # Teal
+        },
+        'rules': [
+            ([
+                'BEGIN', 'END', 'alias', 'and', 'begin', 'break', 'case', 'class', 'def', 'do',
+                'else', 'elsif', 'end', 'ensure', 'for', 'if', 'in', 'module', 'next', 'nil',
+                'not', 'or', 'redo', 'rescue', 'retry', 'return', 'self', 'super', 'then',
+                'unless', 'until', 'when', 'while', 'yield'
+            ], "keyword"),
+            # Method names
+            (r'\bdef\s+([a-zA-Z_][a-zA-Z0-9_]*)', "method"),
+            # Instance and class variables
+            (r'(@[a-zA-Z_][a-zA-Z0-9_]*)', "variable"),
+            (r'(@@[a-zA-Z_][a-zA-Z0-9_]*)', "variable"),
+            # Global variables
+            (r'(\$[a-zA-Z_][a-zA-Z0-9_]*)', "variable"),
+            # Symbols
+            (r':([a-zA-Z_][a-zA-Z0-9_]*)', "symbol"),
+            # String literals (single and double quotes)
+            (r'\"[^\"]*\"', "string"),
+            (r'\'[^\']*\'', "string"),
+            # Comments
+            (r'#.*', "comment"),
+        ],
+    },
+
+    'php': {
+        'extensions': ('.php',),
+        'formats': {
+            "keyword": "#C586C0",   # Purple
+            "builtin": "#569CD6",   # Blue
+            "variable": "#9CDCFE",  # Light Blue
+            "string": "#CE9178",    # Orange
+            "comment": "#6A9955",   # Green
+            "numbers": "#B5CEA8",   # Light Green
+        },
+        'rules': [
+            # PHP keywords
+            ([
+                '__halt_compiler', 'abstract', 'and', 'array', 'as', 'break', 'callable', 'case', 'catch',
+                'class', 'clone', 'const', 'continue', 'declare', 'default', 'die', 'do', 'echo', 'else',
+                'elseif', 'empty', 'enddeclare', 'endfor', 'endforeach', 'endif', 'endswitch', 'endwhile',
+                'eval', 'exit', 'extends', 'final', 'for', 'foreach', 'function', 'global', 'goto', 'if',
+                'implements', 'include', 'include_once', 'instanceof', 'interface', 'isset', 'list',
+                'namespace', 'new', 'or', 'print', 'private', 'protected', 'public', 'require',
+                'require_once', 'return', 'static', 'switch', 'throw', 'trait', 'try', 'unset', 'use',
+                'var', 'while', 'xor', 'yield'
+            ], "keyword"),
+            # Built-in functions
+            ([
+                'printf', 'strlen', 'count', 'isset', 'empty', 'define', 'header', 'session_start'
+            ], "builtin"),
+            # Variables
+            (r'\$[a-zA-Z_][a-zA-Z0-9_]*', "variable"),
+            # String literals (single and double quotes)
+            (r'\"[^\"]*\"', "string"),
+            (r'\'[^\']*\'', "string"),
+            # Numbers
+            (r'\b[0-9]+\b', "numbers"),
+            # Single-line comments
+            (r'//.*', "comment"),
+        ],
+        # Multi-line comment highlighting
+        'block_comment': (r'/\*', r'\*/', "comment"),
+    },
+
+    'sql': {
+        'extensions': ('.sql',),
+        'ignore_case': True,
+        'formats': {
+            "keyword": "#C586C0",   # Purple
+            "function": "#DCDCAA",  # Yellow
+            "string": "#CE9178",    # Orange
+            "comment": "#6A9955",   # Green
+            "numbers": "#B5CEA8",   # Light Green
+        },
+        'rules': [
+            # SQL Keywords
+            ([
+                'ADD', 'ALTER', 'AND', 'AS', 'ASC', 'BETWEEN', 'BY', 'CASE', 'CAST', 'COLUMN',
+                'CREATE', 'DATABASE', 'DEFAULT', 'DELETE', 'DESC', 'DISTINCT', 'DROP', 'EXISTS',
+                'FROM', 'GROUP', 'HAVING', 'IN', 'INDEX', 'INSERT', 'INTO', 'IS', 'JOIN', 'LIKE',
+                'LIMIT', 'NOT', 'NULL', 'ON', 'OR', 'ORDER', 'OUTER', 'SELECT', 'SET', 'TABLE',
+                'UNION', 'UPDATE', 'VALUES', 'WHERE'
+            ], "keyword"),
+            # Built-in functions
+            ([
+                'COUNT', 'AVG', 'SUM', 'MIN', 'MAX', 'LOWER', 'UPPER', 'TRIM', 'CONCAT'
+            ], "function"),
+            # String literals (single quotes)
+            (r'\'[^\']*\'', "string"),
+            # Numbers
+            (r'\b[0-9]+\b', "numbers"),
+            # Single-line comments
+            (r'--.*', "comment"),
+        ],
+        # Multi-line comment highlighting
+        'block_comment': (r'/\*', r'\*/', "comment"),
+    },
+
+    'swift': {
+        'extensions': ('.swift',),
+        'formats': {
+            "keyword": "#C586C0",  # Purple
+            "type": "#569CD6",     # Blue
+            "string": "#CE9178",   # Orange
+            "comment": "#6A9955",  # Green
+            "numbers": "#B5CEA8",  # Light Green
+        },
+        'rules': [
+            ([
+                'as', 'async', 'await', 'break', 'case', 'catch', 'class', 'continue', 'convenience',
+                'default', 'defer', 'deinit', 'didSet', 'do', 'dynamic', 'else', 'enum', 'extension',
+                'fallthrough', 'false', 'final', 'for', 'func', 'if', 'import', 'in', 'init', 'inout',
+                'internal', 'is', 'lazy', 'let', 'mutating', 'nonmutating', 'nil', 'open', 'optional',
+                'override', 'private', 'protocol', 'public', 'required', 'return', 'self', 'static',
+                'struct', 'subscript', 'super', 'switch', 'throw', 'throws', 'true', 'try', 'typealias',
+                'var', 'weak', 'where', 'while', 'willSet'
+            ], "keyword"),
+            ([
+                'Int', 'Double', 'Float', 'String', 'Bool', 'Character', 'Array', 'Dictionary'
+            ], "type"),
+            # String literals
+            (r'\"[^\"]*\"', "string"),
+            # Numbers
+            (r'\b[0-9]+\b', "numbers"),
+            # Single-line comments
+            (r'//.*', "comment"),
+        ],
+        # Multi-line comment highlighting
+        'block_comment': (r'/\*', r'\*/', "comment"),
+    },
+
+    'go': {
+        'extensions': ('.go',),
+        'formats': {
+            "keyword": "#C586C0",       # Purple
+            "builtin_func": "#DCDCAA",  # Yellow
+            "type": "#569CD6",          # Blue
+            "string": "#CE9178",        # Orange
+            "comment": "#6A9955",       # Green
+            "numbers": "#B5CEA8",       # Light Green
+        },
+        'rules': [
+            ([
+                'break', 'case', 'chan', 'const', 'continue', 'default', 'defer', 'else',
+                'fallthrough', 'for', 'func', 'go', 'goto', 'if', 'import', 'interface',
+                'map', 'package', 'range', 'return', 'select', 'struct', 'switch', 'type',
+                'var'
+            ], "keyword"),
+            ([
+                'make', 'new', 'len', 'cap', 'append', 'copy', 'close', 'delete', 'panic',
+                'print', 'println', 'recover'
+            ], "builtin_func"),
+            ([
+                'bool', 'byte', 'complex64', 'complex128', 'error', 'float32', 'float64',
+                'int', 'int8', 'int16', 'int32', 'int64', 'rune', 'string', 'uint',
+                'uint8', 'uint16', 'uint32', 'uint64', 'uintptr'
+            ], "type"),
+            # String literals (double quotes)
+            (r'\"[^\"]*\"', "string"),
+            # Raw string literals (backticks)
+            (r'`[^`]*`', "string"),
+            # Numbers
+            (r'\b[0-9.]+\b', "numbers"),
+            # Single-line comments
+            (r'//.*', "comment"),
+        ],
+        # Multi-line comment highlighting
+        'block_comment': (r'/\*', r'\*/', "comment"),
+    },
+
+    'csharp': {
+        'extensions': ('.cs',),
+        # Color palette inspired by VS Code Dark+ theme
+        'formats': {
+            "keyword": "#C586C0 bold",       # Purple: for, if, class, return
+            "type_name": "#4EC9B0 bold",     # Teal: string, int, List
+            "method_name": "#DCDCAA",        # Yellow: MyFunction(), Console.WriteLine()
+            "string": "#CE9178",             # Orange: "Hello, World!"
+            "comment": "#6A9955",            # Green: // This is a comment
+            "numbers": "#B5CEA8",            # Light Green: 123, 45.6
+            "class_struct": "#569CD6 bold",  # Blue: class, struct
+            "attribute": "#9CDCFE",          # Light Blue: [Test]
+        },
+        'rules': [
+            # Keywords
+            ([
+                'abstract', 'as', 'async', 'await', 'base', 'break', 'case', 'catch', 'checked',
+                'const', 'continue', 'default', 'delegate', 'do', 'else', 'enum', 'event',
+                'explicit', 'extern', 'false', 'finally', 'fixed', 'for', 'foreach',
+                'goto', 'if', 'implicit', 'in', 'is', 'lock', 'new', 'null', 'out', 'override',
+                'params', 'private', 'protected', 'public', 'readonly', 'ref', 'return',
+                'sealed', 'sizeof', 'stackalloc', 'static', 'this', 'throw', 'true', 'try',
+                'typeof', 'unchecked', 'unsafe', 'using', 'virtual', 'void', 'volatile', 'while',
+                'yield'
+            ], "keyword"),
+            # Class/Struct/Interface keywords
+            ([
+                'class', 'struct', 'interface'
+            ], "class_struct"),
+            # Built-in types
+            ([
+                'bool', 'byte', 'char', 'decimal', 'double', 'float', 'int', 'long', 'object',
+                'sbyte', 'short', 'string', 'uint', 'ulong', 'ushort'
+            ], "type_name"),
+            # String literals (double quotes)
+            (r'\"[^\"]*\"', "string"),
+            # Verbatim strings
+            (r'@\"[^\"]*\"', "string"),
+            # Numbers
+            (r'\b[0-9.]+\b', "numbers"),
+            # Attributes: [Test], [Serializable]
+            (r'\[.*?\]', "attribute"),
+            # Method names (words followed by parentheses)
+            (r'\b[a-zA-Z_][a-zA-Z0-9_]*\s*(?=\()', "method_name"),
+            # Single-line comments
+            (r'//.*', "comment"),
+        ],
+        # Multi-line comment highlighting
+        'block_comment': (r'/\*', r'\*/', "comment"),
+    },
+
+    'rust': {
+        'extensions': ('.rs',),
+        'formats': {
+            "keyword": "#C586C0 bold",
+            "type": "#569CD6",
+            "function": "#DCDCAA",
+            "string": "#CE9178",
+            "comment": "#6A9955",
+            "numbers": "#B5CEA8",
+        },
+        'rules': [
+            ([
+                'as', 'async', 'await', 'break', 'const', 'continue', 'crate', 'dyn', 'else', 'enum',
+                'extern', 'false', 'fn', 'for', 'if', 'impl', 'in', 'let', 'loop', 'match',
+                'mod', 'move', 'mut', 'pub', 'ref', 'return', 'self', 'static', 'struct',
+                'super', 'trait', 'true', 'type', 'union', 'unsafe', 'use', 'where', 'while'
+            ], "keyword"),
+            ([
+                'bool', 'char', 'f32', 'f64', 'i8', 'i16', 'i32', 'i64', 'isize', 'str',
+                'u8', 'u16', 'u32', 'u64', 'usize'
+            ], "type"),
+            # Function names
+            (r'\bfn\s+([a-zA-Z_][a-zA-Z0-9_]*)', "function", 1),
+            # String literals (double quotes)
+            (r'\"[^\"]*\"', "string"),
+            # Numbers
+            (r'\b[0-9.]+\b', "numbers"),
+            # Single-line comments
+            (r'//.*', "comment"),
+        ],
+        # Multi-line comment highlighting
+        'block_comment': (r'/\*', r'\*/', "comment"),
+    },
+
+    'kotlin': {
+        'extensions': ('.kt',),
+        'formats': {
+            "keyword": "#C586C0 bold",  # Purple
+            "type": "#569CD6",          # Blue
+            "function": "#DCDCAA",      # Yellow
+            "string": "#CE9178",        # Orange
+            "comment": "#6A9955",       # Green
+            "numbers": "#B5CEA8",       # Light Green
+        },
+        'rules': [
+            ([
+                'as', 'as?', 'break', 'by', 'catch', 'class', 'continue', 'do', 'else', 'false',
+                'for', 'fun', 'if', 'in', 'is', 'null', 'object', 'package', 'return', 'super',
+                'this', 'throw', 'true', 'try', 'typealias', 'var', 'val', 'when', 'while'
+            ], "keyword"),
+            ([
+                'Any', 'Boolean', 'Byte', 'Char', 'Double', 'Float', 'Int', 'Long', 'Short', 'String'
+            ], "type"),
+            # Function names
+            (r'\bfun\s+([a-zA-Z_][a-zA-Z0-9_]*)', "function", 1),
+            # String literals
+            (r'\"[^\"]*\"', "string"),
+            (r'\"\"\"[\s\S]*?\"\"\"', "string"),
+            # Numbers
+            (r'\b[0-9.]+\b', "numbers"),
+            # Single-line comments
+            (r'//.*', "comment"),
+        ],
+        # Multi-line comment highlighting
+        'block_comment': (r'/\*', r'\*/', "comment"),
+    },
+
+    'typescript': {
+        'extensions': ('.ts',),
+        'formats': {
+            "keyword": "#C586C0 bold",  # Purple
+            "type": "#569CD6",          # Blue
+            "string": "#CE9178",        # Orange
+            "comment": "#6A9955",       # Green
+            "numbers": "#B5CEA8",       # Light Green
+        },
+        'rules': [
+            ([
+                'async', 'await', 'break', 'case', 'catch', 'class', 'const', 'continue', 'do',
+                'else', 'enum', 'export', 'extends', 'finally', 'for', 'if', 'import', 'in',
+                'instanceof', 'new', 'return', 'super', 'switch', 'this', 'throw', 'true',
+                'try', 'typeof', 'var', 'void', 'while', 'let', 'interface', 'type', 'implements'
+            ], "keyword"),
+            ([
+                'string', 'number', 'boolean', 'any', 'void', 'null', 'undefined'
+            ], "type"),
+            # String literals (double and single quotes, and backticks for templates)
+            (r'\"[^\"]*\"', "string"),
+            (r'\'[^\']*\'', "string"),
+            (r'`[^`]*`', "string"),
+            # Numbers
+            (r'\b[0-9.]+\b', "numbers"),
+            # Single-line comments
+            (r'//.*', "comment"),
+        ],
+        # Multi-line comment highlighting
+        'block_comment': (r'/\*', r'\*/', "comment"),
+    },
+
+    'yaml': {
+        'extensions': ('.yml', '.yaml'),
+        'formats': {
+            "key": "#9CDCFE",           # Light Blue
+            "string_value": "#CE9178",  # Orange
+            "number_value": "#B5CEA8",  # Light Green
+            "boolean_null": "#569CD6",  # Blue
+            "comment": "#6A9955",       # Green
+        },
+        'rules': [
+            # Keys (words followed by a colon)
+            (r'\b[a-zA-Z0-9_-]+\s*:', "key"),
+            # String values (in quotes or not)
+            (r'(\'|").*?(\'|")', "string_value"),
+            # Number values
+            (r'\b[0-9.]+\b', "number_value"),
+            # Boolean and null values
+            (r'\b(true|false|null)\b', "boolean_null"),
+            # Comments
+            (r'#.*', "comment"),
+        ],
+    },
+}
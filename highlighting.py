@@ -0,0 +1,114 @@
+import collections
+import threading
+
+
+# Number of tokenized lines kept by the shared line cache
+LINE_CACHE_SIZE = 20000
+
+
+class LineCache:
+    """
+    LRU cache of tokenized lines, shared by every open tab.
+
+    Entries map (language, entry state, line text) to the (tokens, end_state)
+    pair returned by the tokenizer, so identical lines such as blank lines,
+    closing braces or repeated imports are only tokenized once per state.
+    The cache is guarded by a lock because background highlighting jobs use
+    it too. Cached token lists are shared and must not be modified.
+    """
+    def __init__(self, max_entries=LINE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def tokenize(self, language, tokenize_line, text, state):
+        """Return tokenize_line(text, state), from the cache when possible."""
+        key = (language, state, text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        entry = tokenize_line(text, state)
+        with self._lock:
+            self._entries[key] = entry
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return the hit and miss counters and the number of entries."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+# The cache used by the editors' highlighters
+line_cache = LineCache()
+
+
+class HighlightJob:
+    """
+    Tokenizes a snapshot of a document's lines in a background thread.
+
+    tokenize_line(text, state) must return (tokens, end_state) and must not
+    touch any Qt object. Results are queued as
+    (block_number, text, tokens, end_state) tuples and collected from the
+    GUI thread with take_results(), so the job never needs to call back into
+    Qt and works the same with PyQt5 and PyQt6. lines can be the tail of a
+    document from block number first on, entered in initial_state, and can
+    be left to set until start() is called.
+    """
+    def __init__(self, lines, tokenize_line, initial_state, first=0):
+        self.lines = lines
+        self.tokenize_line = tokenize_line
+        self.initial_state = initial_state
+        self.first = first
+        self.started = False
+        self.finished = False
+        self._results = collections.deque()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="HighlightJob", daemon=True)
+
+    def start(self):
+        self.started = True
+        self._thread.start()
+
+    def cancel(self):
+        """Stop tokenizing; results already queued are kept."""
+        self._cancelled.set()
+
+    @property
+    def done(self):
+        """True once every line has been tokenized and collected."""
+        return self.finished and not self._results
+
+    def take_results(self):
+        """Return the results queued since the last call."""
+        results = []
+        while self._results:
+            results.append(self._results.popleft())
+        return results
+
+    def _run(self):
+        state = self.initial_state
+        tokenize_line = self.tokenize_line
+        append = self._results.append
+        for number, text in enumerate(self.lines, self.first):
+            if self._cancelled.is_set():
+                return
+            tokens, state = tokenize_line(text, state)
+            append((number, text, tokens, state))
+        # Drop the snapshot, the results hold everything still needed
+        self.lines = None
+        self.finished = True
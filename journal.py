@@ -0,0 +1,322 @@
+import json
+import os
+import queue
+import struct
+import threading
+import uuid
+import zlib
+
+from file_io import FileFormat, file_stamp, open_text
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Where the journals of unsaved documents are kept while the editor runs
+RECOVERY_DIR = os.path.join(os.environ.get('XDG_STATE_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'state'),
+                            'minicodeeditor', 'recovery')
+# Characters logged before a journal is worth compacting into a snapshot,
+# if the document itself is smaller
+JOURNAL_COMPACT_MIN_CHARS = 256 * 1024
+
+# Record kinds: the document's name and format, the text it starts from or
+# the file it was read from, and an edit to that text
+META = 1
+TEXT = 2
+FILE = 3
+EDIT = 4
+# kind, position, characters removed, payload length, CRC-32 of the payload;
+# 64-bit fields, so no document is too large to journal
+RECORD_HEADER = struct.Struct('<BQQQI')
+
+
+def _record(kind, payload, position=0, removed=0):
+    data = payload.encode('utf-8', 'surrogatepass')
+    return RECORD_HEADER.pack(kind, position, removed, len(data), zlib.crc32(data)) + data
+
+
+def format_meta(file_format):
+    """Return a FileFormat as the JSON-friendly dict kept in journal metadata."""
+    return {'encoding': file_format.encoding, 'bom': file_format.bom.hex(), 'newline': file_format.newline}
+
+
+def meta_format(meta):
+    """Return the FileFormat kept in journal metadata by format_meta()."""
+    return FileFormat(meta['encoding'], bytes.fromhex(meta['bom']), meta['newline'])
+
+
+class DocumentJournal:
+    """
+    Journal of one document, handed out by RecoveryJournal.open().
+
+    The methods only queue work for the writer thread, so they are cheap
+    enough to call for every change of the document. Positions and lengths
+    are those of QTextDocument.contentsChange, in UTF-16 code units, with
+    '\\n' between blocks.
+    """
+    def __init__(self, writer, meta):
+        self.meta = meta
+        # Characters logged since the last snapshot, against its size
+        self.logged = 0
+        self.base_size = 0
+        self._writer = writer
+        # Only used by the writer thread
+        self._head = None
+        self._file = None
+        self._path = None
+
+    @property
+    def needs_compaction(self):
+        return self.logged > max(JOURNAL_COMPACT_MIN_CHARS, self.base_size)
+
+    def record(self, position, removed, text):
+        """Logs that removed characters at position were replaced with text."""
+        self.logged += len(text) + RECORD_HEADER.size
+        self._writer.queue.put((self, EDIT, text, position, removed))
+
+    def snapshot(self, text, meta=None):
+        """Starts the journal over from text, the whole document."""
+        self._rebase(meta, TEXT, text, len(text))
+
+    def follow_file(self, meta):
+        """
+        Starts the journal over from the file in meta, which the document
+        matches; nothing is written until the next edit. meta['stamp'] must
+        be its file_stamp(), a journal of a file that changed since is lost.
+        """
+        self._rebase(meta, FILE, json.dumps(meta['stamp']), meta['stamp'][0] if meta['stamp'] else 0)
+
+    def discard(self):
+        """Deletes the journal, once the document is saved or dropped for good."""
+        self._writer.queue.put((self, None, None, 0, 0))
+
+    def _rebase(self, meta, kind, payload, size):
+        if meta is not None:
+            self.meta = meta
+        self.logged = 0
+        self.base_size = size
+        self._writer.queue.put((self, META, json.dumps(self.meta), 0, 0))
+        self._writer.queue.put((self, kind, payload, 0, 0))
+
+
+class RecoveryJournal:
+    """
+    Keeps append-only journals of the open documents, so unsaved text can be
+    rebuilt by recover() after the editor died.
+
+    A journal starts with the document's metadata and either a snapshot of
+    its text or a reference to the file it matches, followed by its edits.
+    Everything is encoded and written by a single worker thread; the GUI
+    thread only puts tuples on a queue. Records carry a CRC, so a record
+    torn by a crash ends the journal instead of corrupting it. A journal
+    file is only created once there is something to recover: a document
+    that matches its file has none until it is edited.
+
+    Compaction rewrites a journal as a single snapshot in a new file that
+    replaces the old one, so there is always a complete journal on disk.
+    Journal files are locked with flock() where available, so a second
+    editor running at the same time does not recover them.
+    """
+    def __init__(self, directory=RECOVERY_DIR):
+        self.directory = directory
+        self.queue = queue.SimpleQueue()
+        # Journals with a file open, only used by the worker
+        self._open = set()
+        self._thread = threading.Thread(target=self._run, name="RecoveryJournal", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Writes what is queued, closes the journal files and waits for the worker to end."""
+        self.queue.put(None)
+        self._thread.join()
+
+    def open(self, meta, text=None):
+        """
+        Returns the DocumentJournal of a document starting from text, or from
+        the file in meta when text is None.
+        """
+        journal = DocumentJournal(self, meta)
+        if text is None:
+            journal.follow_file(meta)
+        else:
+            journal.snapshot(text)
+        return journal
+
+    def forget(self, recovered):
+        """Deletes the journals read by recover(), once their documents are journaled again."""
+        for entry in recovered:
+            self.queue.put((None, None, entry['journal'], 0, 0))
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            # Everything queued meanwhile is written in one go
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            written = set()
+            for item in batch:
+                if item is None:
+                    for journal in list(self._open):
+                        self._close(journal, delete=False)
+                    return
+                journal, kind, payload, position, removed = item
+                if journal is None:
+                    try:
+                        os.remove(payload)
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    if self._write(journal, kind, payload, position, removed):
+                        written.add(journal)
+                except OSError:
+                    # A journal that cannot be written is given up on until
+                    # its next snapshot, the editor keeps working without it.
+                    # What is on disk lacks the edits from here on, so it is
+                    # deleted rather than recovered as the unsaved text.
+                    self._close(journal)
+                    journal._head = None
+            for journal in written:
+                self._flush(journal)
+
+    def _write(self, journal, kind, payload, position, removed):
+        """Writes one queued item, returns whether the journal file needs flushing."""
+        if kind is None:
+            self._close(journal)
+            journal._head = None
+            return False
+        if kind == META:
+            journal._head = [_record(META, payload)]
+            return False
+        if kind != EDIT:
+            journal._head.append(_record(kind, payload))
+            if kind == FILE or not payload:
+                # The file or an empty document needs no journal yet
+                self._close(journal)
+                return False
+            self._replace(journal)
+            return True
+        if journal._head is None:
+            return False
+        if journal._file is None:
+            self._replace(journal)
+        journal._file.write(_record(EDIT, payload, position, removed))
+        return True
+
+    def _replace(self, journal):
+        """Writes the head of a journal to a new file, which replaces the old one."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = journal._path or os.path.join(self.directory, uuid.uuid4().hex + '.journal')
+        temp_path = path + '.tmp'
+        f = open(temp_path, 'wb')
+        try:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            for record in journal._head:
+                f.write(record)
+            f.flush()
+            if journal._file:
+                journal._file.close()
+                journal._file = None
+            os.replace(temp_path, path)
+        except OSError:
+            f.close()
+            raise
+        journal._file = f
+        journal._path = path
+        self._open.add(journal)
+
+    def _flush(self, journal):
+        if journal._file:
+            try:
+                journal._file.flush()
+            except OSError:
+                self._close(journal)
+                journal._head = None
+
+    def _close(self, journal, delete=True):
+        if journal._file:
+            try:
+                journal._file.close()
+            except OSError:
+                pass
+            journal._file = None
+        self._open.discard(journal)
+        if journal._path and delete:
+            try:
+                os.remove(journal._path)
+            except OSError:
+                pass
+        journal._path = None
+
+
+def recover(directory=RECOVERY_DIR):
+    """
+    Rebuild the documents of journals left behind by an editor that did not
+    exit cleanly. Returns a list of dicts with the journal's 'meta', the
+    recovered 'text', or None when the file it was based on has changed
+    since, and the 'journal' path to pass to RecoveryJournal.forget().
+    Journals locked by a running editor are skipped.
+    """
+    recovered = []
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError:
+        return recovered
+    for name in names:
+        if not name.endswith('.journal'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            with open(path, 'rb') as f:
+                if fcntl:
+                    try:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue
+                data = f.read()
+            meta, text = _replay(data)
+        except (OSError, LookupError, ValueError):
+            continue
+        if meta is not None:
+            recovered.append({'meta': meta, 'text': text, 'journal': path})
+    return recovered
+
+
+def _replay(data):
+    """Return the (meta, text) a journal's records add up to."""
+    meta = None
+    buffer = None
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        kind, position, removed, length, crc = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        # A record cut short or garbled by the crash ends the journal
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            break
+        offset = start + length
+        payload = payload.decode('utf-8', 'surrogatepass')
+        if kind == META:
+            meta = json.loads(payload)
+        elif kind == TEXT:
+            buffer = bytearray(payload.encode('utf-16-le', 'surrogatepass'))
+        elif kind == FILE:
+            buffer = None
+            stamp = json.loads(payload)
+            if meta and stamp and file_stamp(meta['path']) == tuple(stamp):
+                with open_text(meta['path'], meta_format(meta)) as f:
+                    buffer = bytearray(f.read().encode('utf-16-le', 'surrogatepass'))
+        elif kind == EDIT and buffer is not None:
+            # Positions count UTF-16 code units, like QTextDocument's
+            buffer[2 * position:2 * (position + removed)] = payload.encode('utf-16-le', 'surrogatepass')
+    if buffer is None:
+        return meta, None
+    return meta, buffer.decode('utf-16-le', 'surrogatepass')
@@ -3,13 +3,40 @@ import sys
 import os
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QSplitter, QTabWidget, QFileDialog, 
-                             QMessageBox, QLabel)
+                             QMessageBox, QLabel, QProgressBar, QPushButton, QInputDialog)
 from PyQt6.QtCore import Qt, QSize
 from PyQt6.QtGui import QAction, QIcon
+from PyQt6 import QtCore, QtGui
 
 from styles import STYLESHEET
 from file_manager import FileExplorer
-from editor import CodeEditor
+from documents import DocumentRegistry
+from editor import CodeEditor, MappedFileViewer
+from file_io import (HexDump, MappedFile, MMAP_VIEW_MIN_BYTES, STREAM_LOAD_MIN_BYTES,
+                     file_stamp, open_text, sniff_file)
+from file_tasks import file_tasks
+
+
+# The file task classes for PyQt6
+FILE_TASKS = file_tasks(QtCore, QtGui)
+
+
+class FileLoader(FILE_TASKS.FileLoader):
+    """Streams a file into a CodeEditor, see file_tasks.FileLoader."""
+    def __init__(self, editor, path, parent=None):
+        super().__init__(editor, path, editor.fileFormat, parent)
+
+    def begin_loading(self):
+        self.editor.beginLoading(self)
+
+    def end_loading(self):
+        self.editor.endLoading()
+
+
+FileSaver = FILE_TASKS.FileSaver
+FileReloader = FILE_TASKS.FileReloader
+FileWatcher = FILE_TASKS.FileWatcher
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -42,6 +69,11 @@ class MainWindow(QMainWindow):
         self.tabs.setTabsClosable(True)
         self.tabs.tabCloseRequested.connect(self.close_tab)
         self.splitter.addWidget(self.tabs)
+        # The open files, looked up without walking the tabs
+        self.documents = DocumentRegistry()
+        # Reloads the open files when other programs change them
+        self.watcher = FileWatcher(self)
+        self.watcher.changed.connect(self.reload_changed_file)
         
         # Set initial splitter sizes (Sidebar: 250px, Editor: rest)
         self.splitter.setSizes([250, 950])
@@ -55,6 +87,18 @@ class MainWindow(QMainWindow):
         self.status_bar.showMessage("Ready")
         self.status_bar.setStyleSheet("background-color: #007acc; color: white;")
         
+        # Progress of files being loaded in the background
+        self.load_progress = QProgressBar()
+        self.load_progress.setMaximumWidth(150)
+        self.load_progress.setRange(0, 100)
+        self.load_progress.hide()
+        self.cancel_load_button = QPushButton("Cancel")
+        self.cancel_load_button.clicked.connect(self.cancel_loading)
+        self.cancel_load_button.hide()
+        self.status_bar.addPermanentWidget(self.load_progress)
+        self.status_bar.addPermanentWidget(self.cancel_load_button)
+        self.loaders = []
+        
     def create_menu_bar(self):
         menu_bar = self.menuBar()
         
@@ -80,6 +124,13 @@ class MainWindow(QMainWindow):
         toggle_sidebar.setShortcut("Ctrl+B")
         toggle_sidebar.triggered.connect(self.toggle_sidebar)
         view_menu.addAction(toggle_sidebar)
+        
+        # Go Menu
+        go_menu = menu_bar.addMenu("Go")
+        go_to_line = QAction("Go to Line...", self)
+        go_to_line.setShortcut("Ctrl+G")
+        go_to_line.triggered.connect(self.go_to_line)
+        go_menu.addAction(go_to_line)
 
     def open_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Open Folder")
@@ -93,29 +144,105 @@ class MainWindow(QMainWindow):
             self.open_file(path)
 
     def open_file(self, path):
-        # Check if file is already open
-        for i in range(self.tabs.count()):
-            if self.tabs.tabToolTip(i) == path:
-                self.tabs.setCurrentIndex(i)
-                return
+        # Check if file is already open, under this or another path
+        document = self.documents.find(path)
+        if document:
+            self.tabs.setCurrentIndex(self.tabs.indexOf(document.view))
+            return
         
-        # Open file
+        # Open file, large files are streamed in without blocking the window
+        # and files too large to edit are only viewed, straight from disk.
+        # Only the start of the file is read first, to find out how it is stored
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            file_format = sniff_file(path)
+            filename = os.path.basename(path)
+            if file_format.binary:
+                self.open_viewer(path, HexDump(path), f"{filename} is a binary file, opened read-only as hex")
+                return
+            if os.path.getsize(path) >= MMAP_VIEW_MIN_BYTES:
+                if file_format.ascii_compatible:
+                    self.open_viewer(path, MappedFile(path, file_format), f"{filename} is too large to edit, opened read-only")
+                else:
+                    # Lines are found by b'\n', which UTF-16 and UTF-32 do not use
+                    self.open_viewer(path, HexDump(path), f"{filename} is too large to edit, opened read-only as hex")
+                return
+            editor = CodeEditor()
+            editor.fileFormat = file_format
+            if os.path.getsize(path) >= STREAM_LOAD_MIN_BYTES:
+                loader = FileLoader(editor, path, self)
+                content = None
+            else:
+                with open_text(path, file_format) as f:
+                    content = f.read()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Could not open file: {e}")
             return
             
-        editor = CodeEditor()
-        editor.setPlainText(content)
+        if content is not None:
+            editor.setPlainText(content)
         
         # Add tab
-        filename = os.path.basename(path)
         index = self.tabs.addTab(editor, filename)
         self.tabs.setTabToolTip(index, path)
+        document = self.documents.add(editor, path)
+        editor.modificationChanged.connect(lambda modified: self.documents.set_modified(document, modified))
+        self.watcher.watch(path)
         self.tabs.setCurrentIndex(index)
-        self.status_bar.showMessage(f"Opened file: {filename}")
+        if content is not None:
+            self.status_bar.showMessage(f"Opened file: {filename} ({file_format.describe()})")
+        else:
+            self.start_loading(loader)
+
+    def open_viewer(self, path, mapped, message):
+        viewer = MappedFileViewer(mapped)
+        index = self.tabs.addTab(viewer, os.path.basename(path))
+        self.tabs.setTabToolTip(index, path)
+        self.documents.add(viewer, path)
+        self.watcher.watch(path)
+        self.tabs.setCurrentIndex(index)
+        mapped.start()
+        self.status_bar.showMessage(message)
+
+    def start_loading(self, loader):
+        loader.progress.connect(self.update_load_progress)
+        loader.finished.connect(lambda: self.finish_loading(loader))
+        loader.failed.connect(lambda message: self.fail_loading(loader, message))
+        self.loaders.append(loader)
+        loader.start()
+        self.update_load_progress()
+        self.status_bar.showMessage(f"Loading {os.path.basename(loader.path)}...")
+
+    def update_load_progress(self, *args):
+        # Show the combined progress of the files being loaded
+        self.loaders = [loader for loader in self.loaders if loader.editor.loader is loader]
+        if not self.loaders:
+            self.load_progress.hide()
+            self.cancel_load_button.hide()
+            return
+        self.load_progress.setValue(sum(loader.percent for loader in self.loaders) // len(self.loaders))
+        self.load_progress.show()
+        self.cancel_load_button.show()
+
+    def finish_loading(self, loader):
+        self.update_load_progress()
+        self.status_bar.showMessage(f"Opened file: {os.path.basename(loader.path)} ({loader.editor.fileFormat.describe()})")
+        # The file may have changed while it was read
+        self.reload_changed_file(loader.path)
+
+    def fail_loading(self, loader, message):
+        self.close_editor_tab(loader.editor)
+        QMessageBox.critical(self, "Error", f"Could not open file: {message}")
+
+    def cancel_loading(self):
+        for loader in list(self.loaders):
+            loader.cancel()
+            self.close_editor_tab(loader.editor)
+        self.status_bar.showMessage("Loading cancelled")
+
+    def close_editor_tab(self, editor):
+        index = self.tabs.indexOf(editor)
+        if index != -1:
+            self.close_tab(index)
 
     def save_current_file(self):
         current_index = self.tabs.currentIndex()
@@ -123,21 +250,128 @@ class MainWindow(QMainWindow):
             return
             
         editor = self.tabs.widget(current_index)
-        path = self.tabs.tabToolTip(current_index)
+        document = self.documents.get(editor)
+        path = document.path
+        
+        if isinstance(editor, MappedFileViewer):
+            self.status_bar.showMessage("The file is open read-only")
+            return
+        
+        if editor.loader or editor.reloader:
+            self.status_bar.showMessage("The file is still loading")
+            return
         
         if not path:
             # Save As (not implemented for simplicity for now, or just fallback)
             return
-            
-        try:
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(editor.toPlainText())
-            self.status_bar.showMessage(f"Saved: {os.path.basename(path)}")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Could not save file: {e}")
+        
+        # Written on a worker thread, saves of one editor in order
+        if editor.saver:
+            editor.saver.wait()
+        saver = FileSaver(editor, path, editor.fileFormat, self)
+        saver.progress.connect(lambda: self.status_bar.showMessage(
+            f"Saving {os.path.basename(path)}... {saver.percent}% ({saver.throughput() / 1e6:.1f} MB/s)"))
+        saver.finished.connect(lambda: self.finish_saving(saver, document))
+        saver.failed.connect(lambda message: QMessageBox.critical(self, "Error", f"Could not save file: {message}"))
+        saver.start()
+
+    def finish_saving(self, saver, document):
+        saver.editor.document().setModified(False)
+        # The save replaced the file, so its inode and stamp changed too
+        self.documents.set_path(document, saver.path)
+        self.status_bar.showMessage(
+            f"Saved: {document.name} ({saver.job.bytes_written / 1e6:.1f} MB, {saver.throughput() / 1e6:.1f} MB/s)")
 
     def close_tab(self, index):
+        editor = self.tabs.widget(index)
+        if isinstance(editor, MappedFileViewer):
+            editor.closeFile()
+        elif editor.loader:
+            editor.loader.cancel()
+        elif editor.saver:
+            # Let a running save finish before the editor goes away
+            editor.saver.wait()
+        elif editor.reloader:
+            editor.reloader.cancel()
+        document = self.documents.get(editor)
+        self.documents.remove(document)
+        self.watcher.unwatch(document.path)
         self.tabs.removeTab(index)
+        self.update_load_progress()
+
+    def reload_changed_file(self, path):
+        # Bring the tab of a file up to date after another program changed it:
+        # unmodified editors are reloaded in place, modified ones ask first
+        document = self.documents.find(path)
+        stamp = file_stamp(path)
+        # Our own saves have refreshed the stamp already
+        if not document or stamp == document.stamp:
+            return
+        widget = document.view
+        if not isinstance(widget, MappedFileViewer) and (widget.loader or widget.saver or widget.reloader):
+            # The change is looked at again once they are done
+            return
+        document.stamp = stamp
+
+        if stamp is None:
+            self.status_bar.showMessage(f"{document.name} was deleted from disk")
+            # Closing the tab must not lose the text without asking
+            if not isinstance(widget, MappedFileViewer):
+                widget.document().setModified(True)
+            return
+
+        if isinstance(widget, MappedFileViewer):
+            # Viewers map the old file, open it again in the same place
+            index = self.tabs.indexOf(widget)
+            self.close_tab(index)
+            count = self.tabs.count()
+            self.open_file(path)
+            if self.tabs.count() > count:
+                self.tabs.tabBar().moveTab(count, index)
+            return
+
+        if widget.document().isModified():
+            response = QMessageBox.warning(self, "File Changed",
+                                           f"File '{document.name}' has been changed by another program.\n"
+                                           f"Do you want to reload it and lose your changes?",
+                                           QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+            if response != QMessageBox.StandardButton.Yes:
+                return
+
+        reloader = FileReloader(widget, path, self)
+        reloader.finished.connect(lambda: self.finish_reloading(reloader, document))
+        reloader.failed.connect(lambda message: self.fail_reloading(reloader, message))
+        reloader.start()
+
+    def finish_reloading(self, reloader, document):
+        reloader.editor.fileFormat = reloader.job.file_format
+        reloader.editor.document().setModified(False)
+        document.stamp = reloader.job.stamp
+        self.status_bar.showMessage(f"Reloaded {document.name}, it was changed on disk")
+        # The file may have changed again while it was read
+        self.reload_changed_file(reloader.path)
+
+    def fail_reloading(self, reloader, message):
+        # The old text no longer matches the file
+        reloader.editor.document().setModified(True)
+        self.status_bar.showMessage(f"Could not reload {os.path.basename(reloader.path)}: {message}")
+
+    def go_to_line(self):
+        widget = self.tabs.currentWidget()
+        if widget is None:
+            return
+        if isinstance(widget, MappedFileViewer):
+            line_count = widget.mapped.line_count
+            current_line = widget.firstVisibleLine() + 1
+        else:
+            line_count = widget.lineCount()
+            current_line = widget.textCursor().blockNumber() + 1
+        
+        number, ok = QInputDialog.getInt(self, "Go to Line", f"Line number (1 - {line_count}):",
+                                         current_line, 1, line_count)
+        if ok:
+            widget.goToLine(number)
+            widget.setFocus()
 
     def toggle_sidebar(self):
         if self.file_explorer.isVisible():
@@ -145,6 +379,14 @@ class MainWindow(QMainWindow):
         else:
             self.file_explorer.show()
 
+    def closeEvent(self, event):
+        # Saves are fed from the event loop, so finish them while it runs
+        for document in self.documents:
+            editor = document.view
+            if not isinstance(editor, MappedFileViewer) and editor.saver:
+                editor.saver.wait()
+        event.accept()
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     
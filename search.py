@@ -0,0 +1,455 @@
+import array
+import bisect
+import collections
+import re
+import sys
+import threading
+
+
+# Characters searched at a time; re holds the GIL while it scans, so the
+# GUI thread gets a turn at least this often
+SEARCH_WINDOW_CHARS = 1024 * 1024
+# Characters a match may reach past the end of its window
+SEARCH_OVERLAP_CHARS = 4096
+# Matches queued together
+SEARCH_BATCH = 1000
+# Characters a search scans in about the time a narrowed search checks a
+# candidate; narrowing denser candidates than this is slower than a full search
+SEARCH_NARROW_CHARS = 16
+# Searches remembered per document
+SEARCH_CACHE_SIZE = 8
+# Separate edited stretches a remembered search is patched through before it is dropped
+SEARCH_CACHE_EDITS = 64
+
+# Characters outside the Basic Multilingual Plane, which take two UTF-16 code units
+_ASTRAL = re.compile('[\U00010000-\U0010ffff]')
+# End of a span reaching to the end of the text
+_END = sys.maxsize
+
+
+def compile_query(query, case_sensitive=False, whole_word=False, regex=False):
+    """
+    Return the compiled pattern for a search query. Without regex the query
+    is matched literally; whole_word only matches it between word
+    boundaries. Raises re.error for an invalid regular expression.
+    """
+    pattern = query if regex else re.escape(query)
+    if whole_word:
+        pattern = r'\b(?:%s)\b' % pattern
+    flags = re.MULTILINE
+    if not case_sensitive:
+        flags |= re.IGNORECASE
+    return re.compile(pattern, flags)
+
+
+def query_overlaps(query, case_sensitive=False):
+    """
+    Return whether two matches of a literal query could overlap, that is
+    whether the query starts with one of its own endings. The matches of a
+    query that cannot are all of its occurrences, whichever order they are
+    looked for in, so they can be narrowed down or patched piecemeal.
+    """
+    if not case_sensitive:
+        # Beyond ASCII, case folding may match characters lower() keeps apart
+        if not query.isascii():
+            return True
+        query = query.lower()
+    return any(query.startswith(query[-size:]) for size in range(1, len(query)))
+
+
+class SearchJob:
+    """
+    Finds every match of a compiled pattern in a snapshot of a document in
+    a background thread.
+
+    text should have '\\n' between blocks. Matches are queued in batches of
+    SEARCH_BATCH as (start, end) pairs in UTF-16 code units, the positions
+    QTextDocument uses, and collected from the GUI thread with
+    take_results(); once finished is set, everything found is queued.
+    Empty matches are skipped. A cancelled job stops at the end of the
+    window it is in. While the whole text is searched, scanned is the
+    position up to which the matches queued are complete.
+
+    The text is searched SEARCH_WINDOW_CHARS at a time, cut at line ends;
+    a match may run SEARCH_OVERLAP_CHARS into the next window, longer
+    matches across a window's end are not found.
+
+    Given the CachedSearch of the same query as base, only its spans are
+    searched and its other matches are taken as they are. With verify, base
+    is the search of a query the pattern's starts with instead: its matches
+    are the candidates, only those the pattern still matches at are kept.
+    Candidates closer than SEARCH_NARROW_CHARS apart on average are not
+    worth it, the whole text is searched instead.
+    """
+    def __init__(self, text, pattern, base=None, verify=False):
+        if verify and base and len(base.starts) * SEARCH_NARROW_CHARS > len(text):
+            base = None
+        self.text = text
+        self.pattern = pattern
+        # The cache replaces rather than changes these when the document is edited
+        self.base = (base.starts, base.ends, base.spans) if base else None
+        self.verify = verify
+        self.finished = False
+        self.count = 0
+        self.scanned = 0 if base is None else None
+        self._results = collections.deque()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="SearchJob", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def take_results(self):
+        """Return the matches queued since the last call, in order."""
+        results = []
+        while self._results:
+            results.extend(self._results.popleft())
+        return results
+
+    def _run(self):
+        self._find_astral()
+        if self.base is None:
+            batches = self._scan(0, len(self.text))
+        else:
+            batches = self._patch(*self.base)
+        for batch in batches:
+            if batch:
+                self.count += len(batch)
+                self._results.append(batch)
+            # What was found before the end of the window is complete
+            if self.scanned is not None:
+                self.scanned = self._scanned
+            if self._cancelled.is_set():
+                break
+        # Drop the snapshot, the results hold everything still needed
+        self.text = None
+        self.finished = True
+
+    def _find_astral(self):
+        """Finds the astral characters, to convert between string indexes and UTF-16 positions."""
+        text = self.text
+        self._astral = [match.start() for match in _ASTRAL.finditer(text)] if not text.isascii() else []
+        self._astral16 = [index + count for count, index in enumerate(self._astral)]
+        self._scanned = 0
+
+    def _position(self, index):
+        """UTF-16 position of a string index."""
+        return index + bisect.bisect_left(self._astral, index) if self._astral else index
+
+    def _index(self, position):
+        """String index of a UTF-16 position."""
+        return position - bisect.bisect_left(self._astral16, position) if self._astral else position
+
+    def _matches(self, start, stop, empty=False):
+        """
+        Yields the matches starting at string indexes from start up to stop,
+        a list per window. Empty matches are left out unless empty is set.
+        """
+        text = self.text
+        length = len(text)
+        # An empty match can be at the very end, where no window starts
+        tail = empty and stop == length
+        while (start < stop or tail) and not self._cancelled.is_set():
+            if start == length:
+                tail = False
+            # A window ends after a line end
+            end = text.find('\n', min(start + SEARCH_WINDOW_CHARS, length))
+            end = min(length if end == -1 else end + 1, stop)
+            overlap_end = text.find('\n', min(end + SEARCH_OVERLAP_CHARS, length))
+            if overlap_end == -1:
+                overlap_end = length
+            limit = end if start < length else length + 1
+            matches = []
+            for match in self.pattern.finditer(text, start, overlap_end):
+                first, last = match.span()
+                if first >= limit:
+                    break
+                if first != last or empty:
+                    matches.append(match)
+            # Do not find the rest of a match again in the next window
+            start = max(end, matches[-1].end()) if matches else end
+            self._scanned = self._position(start)
+            yield matches
+
+    def _scan(self, start, stop):
+        """Yields the (start, end) positions of the matches starting at string indexes from start up to stop, a list per window."""
+        for matches in self._matches(start, stop):
+            if self._astral:
+                yield [(self._position(match.start()), self._position(match.end())) for match in matches]
+            else:
+                yield [match.span() for match in matches]
+
+    def _patch(self, starts, ends, spans):
+        """
+        Yields the matches of the base search outside its spans, or those
+        still matching with verify, and the matches in its spans, a list at
+        a time.
+        """
+        # End of the last match, the next one may not overlap it
+        last = 0
+        index = 0
+        for first, stop in spans + [(_END, _END)]:
+            known = bisect.bisect_left(starts, first, index)
+            for chunk in range(index, known, SEARCH_BATCH):
+                chunk_end = min(chunk + SEARCH_BATCH, known)
+                if self.verify:
+                    matches = self._verified(starts[chunk:chunk_end], last)
+                else:
+                    matches = list(zip(starts[chunk:chunk_end], ends[chunk:chunk_end]))
+                if matches:
+                    last = matches[-1][1]
+                yield matches
+            index = known
+            if first == _END:
+                break
+            # Stops may fall inside a surrogate pair, which then counts as in the span
+            for matches in self._scan(self._index(max(first, last)), min(self._index(stop - 1) + 1, len(self.text))):
+                if matches:
+                    last = matches[-1][1]
+                yield matches
+
+    def _verified(self, starts, last):
+        """Returns the matches of the pattern at the candidate starts, but those overlapping the one before."""
+        text = self.text
+        match_at = self.pattern.match
+        matches = []
+        for start in starts:
+            if start < last:
+                continue
+            match = match_at(text, self._index(start) if self._astral else start)
+            if match and match.end() > match.start():
+                last = self._position(match.end()) if self._astral else match.end()
+                matches.append((start, last))
+        return matches
+
+
+class ReplaceJob(SearchJob):
+    """
+    Works out the text that replaces every match of a pattern in a snapshot
+    of a document, in a background thread.
+
+    The matches are the ones a SearchJob finds plus the empty ones, as
+    re.sub() replaces them, so ^ or $ put template on every line. Each is
+    replaced with template; with regex, template is expanded with
+    match.expand(), so \\1 and \\g<name> insert groups. Once finished,
+    replacement is the text from the start of the first match to the end of
+    the last with the replacements made, first and last are those positions
+    in UTF-16 code units, and count is the number of matches; replacement is
+    None if there were none. error is set instead if template refers to a
+    missing group.
+    """
+    def __init__(self, text, pattern, template, regex=False):
+        super().__init__(text, pattern)
+        self.template = template
+        self.regex = regex
+        self.replacement = None
+        self.first = self.last = 0
+        self.error = None
+
+    def _run(self):
+        self._find_astral()
+        text = self.text
+        pieces = []
+        first = last = None
+        # Match.expand() parses the template again for each match
+        expand = self.regex and '\\' in self.template
+        try:
+            for matches in self._matches(0, len(text), empty=True):
+                for match in matches:
+                    if first is None:
+                        first = match.start()
+                    else:
+                        pieces.append(text[last:match.start()])
+                    pieces.append(match.expand(self.template) if expand else self.template)
+                    last = match.end()
+                self.count += len(matches)
+        except (re.error, IndexError) as e:
+            self.error = e
+        else:
+            if first is not None:
+                self.replacement = ''.join(pieces)
+                self.first, self.last = self._position(first), self._position(last)
+        self.text = None
+        self.finished = True
+
+
+def string_index(text, position):
+    """Return the index in text of a UTF-16 position."""
+    index = position
+    for match in _ASTRAL.finditer(text, 0, position):
+        # Each astral character before it takes two positions
+        if match.start() >= index:
+            break
+        index -= 1
+    return index
+
+
+def expand_match(text, pattern, position, template, regex=False):
+    """
+    Return what the match of pattern at a UTF-16 position of text is
+    replaced with, as ReplaceJob would, or None if it does not match there
+    any more. Raises re.error or IndexError if template refers to a
+    missing group.
+    """
+    match = pattern.match(text, string_index(text, position))
+    if not match or match.end() == match.start():
+        return None
+    return match.expand(template) if regex else template
+
+
+class CachedSearch:
+    """
+    Matches of a search of one document, as sorted arrays of start and end
+    positions, kept in step with the document's edits.
+
+    spans are the (start, stop) ranges of positions where matches may start
+    that are still to be searched: the rest of the text if the search was
+    stopped early, and the stretches edited since. A literal query that
+    cannot overlap itself only depends on its own characters and the one
+    either side, so an edit only needs the stretch around it searched
+    again. The matches of other queries may depend on any of the text;
+    their searches are lost on the first edit.
+    """
+    def __init__(self, query, options, starts, ends, spans=()):
+        self.query = query
+        self.options = options
+        self.starts = starts
+        self.ends = ends
+        self.spans = list(spans)
+        # Positions a match reaches past its start, None if it cannot be patched
+        self.length = None
+        if not options['regex'] and not query_overlaps(query, options['case_sensitive']):
+            self.length = len(query.encode('utf-16-le', 'surrogatepass')) // 2
+        # Edited stretches not applied to the arrays yet, in order: the
+        # range of starts to drop, and the range to search in today's
+        # positions. Positions between them move by the difference of the
+        # ends of the stretch before.
+        self._damage = []
+
+    def edit(self, position, removed, added):
+        """Takes in that removed characters at position were replaced by added ones; False if the search is lost."""
+        if self.length is None or len(self._damage) >= SEARCH_CACHE_EDITS:
+            return False
+        # Starts of the matches the edit may have changed
+        low = max(0, position - self.length)
+        high = position + removed + 1
+        delta = added - removed
+        before = [stretch for stretch in self._damage if stretch[3] < low]
+        after = [stretch for stretch in self._damage if stretch[2] > high]
+        overlapped = self._damage[len(before):len(self._damage) - len(after)]
+        shift = before[-1][3] - before[-1][1] if before else 0
+        if overlapped and overlapped[0][2] <= low:
+            old_low, new_low = overlapped[0][0], overlapped[0][2]
+        else:
+            old_low, new_low = low - shift, low
+        if overlapped:
+            shift = overlapped[-1][3] - overlapped[-1][1]
+        if overlapped and overlapped[-1][3] >= high:
+            old_high, new_high = overlapped[-1][1], overlapped[-1][3]
+        else:
+            old_high, new_high = high - shift, high
+        self._damage = (before + [(old_low, old_high, new_low, new_high + delta)]
+                        + [(old_start, old_stop, start + delta, stop + delta) for old_start, old_stop, start, stop in after])
+        return True
+
+    def apply_edits(self):
+        """Drops the matches the edits may have changed, moves the others along and adds the edited stretches to spans."""
+        if not self._damage:
+            return
+        starts, ends = self.starts, self.ends
+        self.starts, self.ends = array.array('q'), array.array('q')
+        index = 0
+        shift = 0
+        for old_low, old_high, new_low, new_high in self._damage + [(_END, _END, _END, _END)]:
+            stop = bisect.bisect_left(starts, old_low, index)
+            for source, target in ((starts, self.starts), (ends, self.ends)):
+                piece = source[index:stop]
+                target.extend(array.array('q', [offset + shift for offset in piece]) if shift else piece)
+            if old_low == _END:
+                break
+            index = bisect.bisect_left(starts, old_high, stop)
+            shift = new_high - old_high
+        spans = [(self._map(start), stop if stop == _END else self._map(stop)) for start, stop in self.spans]
+        spans.extend((new_low, new_high) for old_low, old_high, new_low, new_high in self._damage)
+        self.spans = []
+        for start, stop in sorted(spans):
+            if self.spans and start <= self.spans[-1][1]:
+                self.spans[-1] = (self.spans[-1][0], max(self.spans[-1][1], stop))
+            else:
+                self.spans.append((start, stop))
+        self._damage = []
+
+    def _map(self, position):
+        """Today's position of a position from before the edits."""
+        shift = 0
+        for old_low, old_high, new_low, new_high in self._damage:
+            if position < old_low:
+                break
+            if position < old_high:
+                return new_low
+            shift = new_high - old_high
+        return position + shift
+
+
+class SearchCache:
+    """
+    The last SEARCH_CACHE_SIZE searches of one document, so going back to a
+    query, or typing on at the end of one, does not search the whole text
+    again. edit() is meant for QTextDocument.contentsChange: the searches
+    are patched through the edits instead of being thrown away.
+    """
+    def __init__(self):
+        self.searches = collections.OrderedDict()
+        # Counts the edits, so results for a text that changed meanwhile are not put in
+        self.version = 0
+
+    def edit(self, position, removed, added):
+        self.version += 1
+        for key, search in list(self.searches.items()):
+            if not search.edit(position, removed, added):
+                del self.searches[key]
+
+    def get(self, query, options):
+        """Return the CachedSearch of a query, or None."""
+        key = _key(query, options)
+        search = self.searches.get(key)
+        if search:
+            self.searches.move_to_end(key)
+            search.apply_edits()
+        return search
+
+    def narrowing(self, query, options):
+        """
+        Return the CachedSearch of the longest literal query that query
+        starts with, whose matches start every match of query, or None.
+        """
+        if options['regex']:
+            return None
+        best = None
+        for search in self.searches.values():
+            if (search.length is not None and not search.options['whole_word']
+                    and (options['case_sensitive'] or not search.options['case_sensitive'])
+                    and query.startswith(search.query)
+                    and (best is None or len(search.query) > len(best.query))):
+                best = search
+        if best:
+            best.apply_edits()
+        return best
+
+    def put(self, query, options, starts, ends, scanned=None):
+        """
+        Remembers the matches of a query. For a search stopped early,
+        scanned is the position up to which they are complete.
+        """
+        key = _key(query, options)
+        self.searches[key] = CachedSearch(query, options, starts, ends, () if scanned is None else [(scanned, _END)])
+        self.searches.move_to_end(key)
+        while len(self.searches) > SEARCH_CACHE_SIZE:
+            self.searches.popitem(last=False)
+
+
+def _key(query, options):
+    return query, options['case_sensitive'], options['whole_word'], options['regex']